@@ -0,0 +1,61 @@
+import logging
+import queue
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+
+class Alerta(NamedTuple):
+    """
+    Irregularidade detectada: classe, momento (time.time()), quadro anotado e o arquivo
+    da evidência (None enquanto não foi gravado).
+    """
+    classe: str
+    momento: float
+    frame: np.ndarray
+    arquivo: Optional[str] = None
+
+
+class FilaAlertas:
+    """
+    Fila de alertas entre a thread de detecção e a interface (Tk), sem bloquear quem publica.
+
+    `publicar` nunca espera: com a fila cheia, o alerta mais antigo ainda não exibido dá lugar ao
+    novo (e é contado em `descartados`). A interface retira tudo de uma vez com `retirar_todos`,
+    em um `after` do Tk, já que widgets só podem ser tocados pela thread do mainloop.
+    """
+
+    def __init__(self, tamanho: int = 16):
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho)
+
+        # Contadores para monitoramento
+        self.publicados = 0
+        self.descartados = 0
+
+    def publicar(self, classe: str, frame: np.ndarray, arquivo: Optional[str] = None) -> Alerta:
+        alerta = Alerta(classe, time.time(), frame, arquivo)
+        while True:
+            try:
+                self._fila.put_nowait(alerta)
+                break
+            except queue.Full:
+                try:
+                    antigo = self._fila.get_nowait()
+                    self.descartados += 1
+                    logging.warning(f"Fila de alertas cheia. Alerta de {antigo.classe} descartado.")
+                except queue.Empty:
+                    pass
+        self.publicados += 1
+        return alerta
+
+    def retirar_todos(self) -> List[Alerta]:
+        alertas = []
+        while True:
+            try:
+                alertas.append(self._fila.get_nowait())
+            except queue.Empty:
+                return alertas
+
+    def pendentes(self) -> int:
+        return self._fila.qsize()
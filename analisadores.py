@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+import cv2
+
+from alertas import FilaAlertas
+from captura import Quadro
+from clipes import BufferClipes
+from consumidor import Trabalho
+from deteccoes import Deteccoes
+from evidencias import GravadorEvidencias, GravadorLinhasJson
+from metricas import METRICAS
+from previa import desenhar_deteccoes
+from rastreio_defeitos import RastreadorDefeitos, RastroDefeito
+
+
+class Contexto(NamedTuple):
+    """
+    O que os analisadores sabem sobre o quadro além das detecções: o pedido ativo (lido uma vez
+    por quadro), o mapa rótulo → id do modelo e o item esperado, com o seu id já resolvido.
+    """
+    trabalho: Optional[Trabalho]
+    class_ids: Dict[str, int]
+    item_esperado: Optional[str]
+    cls_esperada: Optional[int]
+
+
+class Analisador:
+    """
+    Etapa plugável do motor de detecção (YOLOProcessor): recebe cada quadro inferido, com as
+    detecções em coordenadas do quadro rotacionado, na thread de detecção. Captura e inferência
+    são feitas uma única vez para todos os analisadores.
+
+    `analisar` deve ser rápido: gravações e codificações ficam em threads próprias.
+    Com `mostrar_todas`, a prévia desenha todas as detecções, e não só as do item esperado.
+    """
+    nome = ''
+    mostrar_todas = False
+
+    def analisar(self, quadro: Quadro, deteccoes: Deteccoes, contexto: Contexto) -> None:
+        raise NotImplementedError
+
+    def conclui(self, trabalho: Trabalho) -> bool:
+        """
+        Se o analisador encerra o pedido (`concluir_contagem`). Sem nenhum que encerre, o pedido é
+        concluído ao ser ativado, para a estação não esperar por um resultado que nunca virá.
+        """
+        return False
+
+    def encerrar(self) -> None:
+        pass
+
+
+class AnalisadorDefeitos(Analisador):
+    """
+    Inspeção de defeitos: qualquer classe diferente do item esperado é irregularidade.
+
+    As caixas de defeito passam pelo RastreadorDefeitos, e cada defeito físico confirmado gera um
+    único alerta: evidência anotada, clipe de antes/depois (BufferClipes), aviso em `alertas`
+    (se houver uma interface consumindo) e `on_alerta`. Ao terminar, cada defeito vira uma linha
+    em `<diretorio_base>/<data>/defeitos.jsonl`. Sem item esperado (nenhum pedido ativo), não há
+    o que inspecionar; a troca de item encerra os rastros do item anterior.
+    """
+    nome = 'defeitos'
+    mostrar_todas = True
+
+    def __init__(self, diretorio_base: str = 'logsdefeitos', rotacionar: bool = True,
+                 alertas: Optional[FilaAlertas] = None,
+                 on_alerta: Optional[Callable[[RastroDefeito], None]] = None,
+                 rotulos: Optional[Dict[str, str]] = None):
+        self.rotacionar = rotacionar
+        self.alertas = alertas
+        self.on_alerta = on_alerta
+        self.evidencias = GravadorEvidencias(diretorio_base, formato='jpg', politica='descartar_antigo')
+        # Últimos segundos de vídeo em memória, para o clipe antes/depois de cada defeito
+        self.clipes = BufferClipes(diretorio_base, rotacionar=rotacionar)
+        self.registros = GravadorLinhasJson(self.evidencias.diretorio, 'defeitos.jsonl')
+        self.rastreador = RastreadorDefeitos(on_encerrado=self.registrar)
+        self.item_atual: Optional[str] = None
+
+        METRICAS.contador('gde_defeitos_alertas_total', 'Defeitos físicos que geraram alerta', rotulos,
+                          funcao=lambda: self.rastreador.alertas)
+        METRICAS.contador('gde_defeitos_agrupados_total', 'Defeitos agrupados a um alerta anterior (cooldown)',
+                          rotulos, funcao=lambda: self.rastreador.agrupados)
+        METRICAS.contador('gde_clipes_gravados_total', 'Clipes de defeito gravados', rotulos,
+                          funcao=lambda: self.clipes.clipes_gravados)
+
+    def analisar(self, quadro: Quadro, deteccoes: Deteccoes, contexto: Contexto) -> None:
+        if contexto.item_esperado != self.item_atual:
+            self.rastreador.encerrar()
+            self.item_atual = contexto.item_esperado
+        if contexto.item_esperado is None:
+            return
+
+        momento = time.time()
+        # O slot do buffer de captura é reutilizado: o buffer de clipes guarda uma cópia
+        self.clipes.adicionar(quadro.frame, deteccoes, momento, copiar=True)
+
+        if contexto.cls_esperada is None:
+            defeitos = deteccoes
+        else:
+            defeitos = deteccoes.filtrar(deteccoes.cls != contexto.cls_esperada)
+        # Um alerta por defeito físico confirmado (não por quadro nem por caixa)
+        for rastro in self.rastreador.atualizar(defeitos, momento):
+            self.alertar(quadro, deteccoes, rastro, momento)
+
+    def alertar(self, quadro: Quadro, deteccoes: Deteccoes, rastro: RastroDefeito, momento: float) -> None:
+        # Desenho só no alerta, em um quadro novo (o original segue com a captura e o buffer de clipes)
+        if self.rotacionar:
+            anotado = cv2.rotate(quadro.frame, cv2.ROTATE_180)
+        else:
+            anotado = quadro.frame.copy()
+        desenhar_deteccoes(anotado, deteccoes)
+
+        nome = f"{time.strftime('%Y%m%d-%H%M%S')}_{rastro.classe}_{rastro.numero}"
+        rastro.arquivo = os.path.join(self.evidencias.diretorio(), f"{nome}.{self.evidencias.formato}")
+        self.evidencias.salvar(nome, anotado)
+        self.clipes.disparar(nome, momento)
+        if self.alertas is not None:
+            self.alertas.publicar(rastro.classe, anotado, rastro.arquivo)
+        logging.warning(f"Irregularidade detectada: {rastro.classe} (defeito {rastro.numero}). "
+                        f"Evidência em {rastro.arquivo}")
+        if self.on_alerta is not None:
+            self.on_alerta(rastro)
+
+    def registrar(self, rastro: RastroDefeito) -> None:
+        """
+        Registro consolidado de um defeito encerrado (uma linha por defeito físico) em defeitos.jsonl,
+        gravado fora da thread de detecção.
+        """
+        self.registros.registrar(rastro.resumo())
+
+    def encerrar(self) -> None:
+        self.rastreador.encerrar()
+        self.registros.aguardar()
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def criar_detector_aruco() -> cv2.aruco.ArucoDetector:
+    """
+    Detector ArUco (DICT_6X6_250) com os parâmetros ajustados para as etiquetas dos blisters.
+    """
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
+    aruco_parameters = cv2.aruco.DetectorParameters()
+    aruco_parameters.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
+    aruco_parameters.adaptiveThreshWinSizeMin = 3
+    aruco_parameters.adaptiveThreshWinSizeMax = 23
+    aruco_parameters.adaptiveThreshWinSizeStep = 10
+    aruco_parameters.adaptiveThreshConstant = 9
+    aruco_parameters.minMarkerPerimeterRate = 0.03
+    aruco_parameters.maxMarkerPerimeterRate = 4.0
+    aruco_parameters.minCornerDistanceRate = 0.05
+    aruco_parameters.minDistanceToBorder = 3
+    aruco_parameters.minMarkerDistanceRate = 0.05
+    aruco_parameters.polygonalApproxAccuracyRate = 0.03
+    aruco_parameters.errorCorrectionRate = 0.62
+    return cv2.aruco.ArucoDetector(aruco_dict, aruco_parameters)
+
+
+class LeitorAruco:
+    """
+    Leitura de ArUco como estágio próprio do pipeline, em uma thread de trabalho.
+
+    `submeter` nunca bloqueia: se o worker estiver livre, só copia o quadro para um buffer
+    pré-alocado (senão o quadro é ignorado); a conversão para cinza, a redução e a leitura ficam
+    no worker. O marcador só é considerado confirmado após `confirmacoes` leituras seguidas do
+    mesmo ID, e o último ID confirmado fica em cache por item até `limpar`. Cada `limpar` inicia
+    uma nova geração: leituras de quadros submetidos antes dele são descartadas. A leitura
+    dispensa a rotação de 180°, já que o ID do ArUco independe da orientação.
+    """
+
+    def __init__(self, escala: float = 0.5, confirmacoes: int = 2):
+        self.escala = escala
+        self.confirmacoes = confirmacoes
+        self.detector = criar_detector_aruco()
+
+        self._quadro: Optional[np.ndarray] = None
+        self._cinza: Optional[np.ndarray] = None
+        self._reduzido: Optional[np.ndarray] = None
+        self._item: Optional[str] = None
+        self._geracao = 0
+        self._geracao_submetida = 0
+        self._ocupado = False
+        self._cond = threading.Condition()
+
+        self._codigos: Dict[str, Tuple[int, float]] = {}
+        self._candidato: Dict[str, Tuple[int, int]] = {}
+
+        # Contadores para monitoramento
+        self.quadros_lidos = 0
+        self.quadros_ignorados = 0
+
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submeter(self, frame: np.ndarray, item_id: str) -> bool:
+        """
+        Entrega o quadro para leitura se o worker estiver livre. Retorna False se o quadro foi ignorado.
+        """
+        with self._cond:
+            if self._ocupado:
+                self.quadros_ignorados += 1
+                return False
+            # O quadro pode ser um slot reutilizado do buffer de captura: só a cópia fica nesta thread
+            if self._quadro is None or self._quadro.shape != frame.shape:
+                self._quadro = np.empty_like(frame)
+            np.copyto(self._quadro, frame)
+            self._item = item_id
+            self._geracao_submetida = self._geracao
+            self._ocupado = True
+            self._cond.notify()
+            return True
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ocupado)
+                item_id = self._item
+                geracao = self._geracao_submetida
+            try:
+                corners, ids, rejected = self.detector.detectMarkers(self._reduzir(self._quadro))
+                self.quadros_lidos += 1
+                if ids is not None and len(ids) > 0:
+                    self._registrar(item_id, int(np.asarray(ids).ravel()[0]), geracao)
+            except Exception:
+                logging.exception("Erro ao ler ArUco")
+            finally:
+                with self._cond:
+                    self._ocupado = False
+
+    def _reduzir(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Cinza e redução por `escala`, em buffers pré-alocados (executado no worker).
+        """
+        altura, largura = frame.shape[:2]
+        tamanho = (max(1, int(largura * self.escala)), max(1, int(altura * self.escala)))
+        if self._cinza is None or self._cinza.shape[:2] != (altura, largura):
+            self._cinza = np.empty((altura, largura), dtype=np.uint8)
+            self._reduzido = np.empty((tamanho[1], tamanho[0]), dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._cinza)
+        cv2.resize(self._cinza, tamanho, dst=self._reduzido, interpolation=cv2.INTER_AREA)
+        return self._reduzido
+
+    def _registrar(self, item_id: str, id_marker: int, geracao: int) -> None:
+        with self._cond:
+            if geracao != self._geracao:
+                # Quadro submetido antes de `limpar`: pertence ao pedido anterior
+                return
+            anterior, vezes = self._candidato.get(item_id, (None, 0))
+            vezes = vezes + 1 if anterior == id_marker else 1
+            self._candidato[item_id] = (id_marker, vezes)
+            if vezes < self.confirmacoes or self._codigos.get(item_id, (None,))[0] == id_marker:
+                return
+            self._codigos[item_id] = (id_marker, time.monotonic())
+        logging.info(f"Código decimal do ArUco confirmado para {item_id}: {id_marker}")
+
+    def codigo(self, item_id: str) -> Optional[int]:
+        """
+        Último ID de ArUco confirmado para o item, ou None.
+        """
+        registro = self._codigos.get(item_id)
+        return registro[0] if registro else None
+
+    def limpar(self, item_id: str) -> None:
+        with self._cond:
+            self._geracao += 1
+            self._codigos.pop(item_id, None)
+            self._candidato.pop(item_id, None)
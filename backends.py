@@ -0,0 +1,177 @@
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, Type
+
+import numpy as np
+from ultralytics import YOLO
+
+from modelos import ler_configuracao_modelo
+
+# Backend de inferência selecionado por variável de ambiente: cuda, cpu, onnx ou openvino
+YOLO_BACKEND = os.getenv('YOLO_BACKEND', 'cuda')
+
+# Threads usadas pelos backends de CPU
+YOLO_CPU_THREADS = int(os.getenv('YOLO_CPU_THREADS', str(os.cpu_count() or 4)))
+
+# Resolução de entrada usada na exportação dos modelos sem `imgsz` no JSON ao lado do .pt
+# (por padrão, a mesma YOLO_IMG_SIZE usada no pré-processamento)
+YOLO_EXPORT_IMG_SIZE = int(os.getenv('YOLO_EXPORT_IMG_SIZE', os.getenv('YOLO_IMG_SIZE', '704')))
+
+# Executa um predict em imagem vazia logo após carregar o modelo (no pré-carregamento, fora da detecção)
+YOLO_AQUECER = os.getenv('YOLO_AQUECER', '1') == '1'
+
+
+def imgsz_do_modelo(model: YOLO, model_path: str) -> int:
+    """
+    Resolução de entrada do modelo: a do grafo exportado, o `imgsz` do JSON ao lado do `.pt`
+    ou YOLO_EXPORT_IMG_SIZE.
+    """
+    return getattr(model, 'imgsz_exportado', None) or \
+        int(ler_configuracao_modelo(model_path).get('imgsz', YOLO_EXPORT_IMG_SIZE))
+
+
+class BackendInferencia:
+    """
+    Interface comum dos backends de inferência: carrega um `.pt` e executa o predict no dispositivo certo.
+    """
+    nome = ''
+    device = None
+
+    def carregar(self, model_path: str) -> YOLO:
+        raise NotImplementedError
+
+    def predict(self, model: YOLO, source, **kwargs):
+        kwargs.setdefault('verbose', False)
+        return model.predict(source=source, device=self.device, **kwargs)
+
+    def carregar_aquecido(self, model_path: str) -> YOLO:
+        """
+        Carrega o modelo e faz um predict em uma imagem vazia do tamanho de entrada do modelo, para que
+        a criação do predictor, a alocação de memória e a escolha de kernels aconteçam no pré-carregamento
+        e não no primeiro quadro do item.
+        """
+        model = self.carregar(model_path)
+        if YOLO_AQUECER:
+            imgsz = imgsz_do_modelo(model, model_path)
+            try:
+                self.predict(model, np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz)
+            except Exception:
+                logging.exception(f"Erro ao aquecer o modelo {model_path}")
+        return model
+
+
+class BackendCuda(BackendInferencia):
+    nome = 'cuda'
+    device = 'cuda'
+
+    def carregar(self, model_path: str) -> YOLO:
+        return YOLO(model_path).to('cuda')
+
+
+class BackendCpu(BackendInferencia):
+    """
+    PyTorch em CPU, com o número de threads limitado a YOLO_CPU_THREADS.
+    """
+    nome = 'cpu'
+    device = 'cpu'
+
+    def __init__(self, threads: int = YOLO_CPU_THREADS):
+        self.threads = threads
+        # OMP_NUM_THREADS já não teria efeito aqui (o torch foi importado pelo ultralytics);
+        # set_num_threads limita o pool de threads do torch em tempo de execução
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    def carregar(self, model_path: str) -> YOLO:
+        return YOLO(model_path)
+
+
+class BackendExportado(BackendCpu):
+    """
+    Grafo exportado e otimizado para CPU (ONNX Runtime ou OpenVINO).
+
+    Cada `.pt` é convertido uma única vez, na resolução do modelo (`imgsz` do JSON ao lado do
+    `.pt`, ou `imgsz` do backend), e guardado em `<pasta do modelo>/.cache/<formato>/` com o mtime
+    do `.pt` e a resolução no nome; se o modelo for retreinado, a exportação é refeita.
+    O grafo exportado tem entrada fixa: um predict em outra resolução é um erro.
+    """
+    formato = ''
+    sufixo = ''
+
+    def __init__(self, threads: int = YOLO_CPU_THREADS, imgsz: int = YOLO_EXPORT_IMG_SIZE):
+        super().__init__(threads)
+        self.imgsz = imgsz
+        self._lock = threading.Lock()
+
+    def imgsz_modelo(self, model_path: str) -> int:
+        return int(ler_configuracao_modelo(model_path).get('imgsz', self.imgsz))
+
+    def caminho_exportado(self, model_path: str, imgsz: int) -> str:
+        pasta = os.path.join(os.path.dirname(model_path), '.cache', self.formato)
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        mtime = int(os.path.getmtime(model_path))
+        return os.path.join(pasta, f'{stem}_{mtime}_{imgsz}{self.sufixo}')
+
+    def exportar(self, model_path: str, imgsz: int) -> str:
+        destino = self.caminho_exportado(model_path, imgsz)
+        with self._lock:
+            if os.path.exists(destino):
+                return destino
+
+            logging.info(f"Exportando {model_path} para {self.formato} (imgsz={imgsz})...")
+            exportado = YOLO(model_path).export(format=self.formato, imgsz=imgsz, half=False,
+                                                dynamic=False, device='cpu')
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            shutil.move(str(exportado), destino)
+            logging.info(f"Modelo exportado e armazenado em cache: {destino}")
+            return destino
+
+    def carregar(self, model_path: str) -> YOLO:
+        imgsz = self.imgsz_modelo(model_path)
+        model = YOLO(self.exportar(model_path, imgsz), task='detect')
+        # Resolução fixa do grafo, conferida em cada predict
+        model.imgsz_exportado = imgsz
+        return model
+
+    def predict(self, model: YOLO, source, **kwargs):
+        exportado = getattr(model, 'imgsz_exportado', self.imgsz)
+        imgsz = kwargs.setdefault('imgsz', exportado)
+        if imgsz != exportado:
+            raise ValueError(f"Modelo {self.formato} exportado com imgsz={exportado}, "
+                             f"mas o predict pediu imgsz={imgsz}. Ajuste o imgsz do modelo e exporte de novo.")
+        return super().predict(model, source, **kwargs)
+
+
+class BackendOnnx(BackendExportado):
+    nome = 'onnx'
+    formato = 'onnx'
+    sufixo = '.onnx'
+
+
+class BackendOpenVino(BackendExportado):
+    nome = 'openvino'
+    formato = 'openvino'
+    sufixo = '_openvino_model'
+
+
+BACKENDS: Dict[str, Type[BackendInferencia]] = {
+    'cuda': BackendCuda,
+    'cpu': BackendCpu,
+    'onnx': BackendOnnx,
+    'openvino': BackendOpenVino,
+}
+
+
+def criar_backend(nome: str = YOLO_BACKEND) -> BackendInferencia:
+    """
+    Cria o backend de inferência pelo nome (por padrão, o definido em YOLO_BACKEND).
+    """
+    try:
+        return BACKENDS[nome.lower()]()
+    except KeyError:
+        raise ValueError(f"Backend de inferência desconhecido: {nome}. Opções: {', '.join(BACKENDS)}")
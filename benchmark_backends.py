@@ -0,0 +1,98 @@
+import argparse
+import glob
+import os
+import time
+
+import cv2
+
+from backends import BACKENDS, criar_backend, imgsz_do_modelo
+
+FPS_ALVO = 15
+
+
+def carregar_quadros(origem: str, limite: int):
+    """
+    Carrega um conjunto fixo de quadros gravados (pasta de imagens ou arquivo de vídeo).
+    """
+    quadros = []
+    if os.path.isdir(origem):
+        arquivos = sorted(glob.glob(os.path.join(origem, '*.jpg')) + glob.glob(os.path.join(origem, '*.png')))
+        for arquivo in arquivos[:limite]:
+            frame = cv2.imread(arquivo)
+            if frame is not None:
+                quadros.append(frame)
+    else:
+        cap = cv2.VideoCapture(origem)
+        while len(quadros) < limite:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            quadros.append(frame)
+        cap.release()
+    if not quadros:
+        raise IOError(f"Nenhum quadro encontrado em {origem}.")
+    return quadros
+
+
+def medir_backend(nome: str, model_path: str, quadros, aquecimento: int, repeticoes: int) -> dict:
+    backend = criar_backend(nome)
+
+    inicio = time.monotonic()
+    model = backend.carregar(model_path)
+    tempo_carga = time.monotonic() - inicio
+    # Mesma resolução de entrada em todos os backends (a usada na detecção), para comparar o mesmo trabalho
+    imgsz = imgsz_do_modelo(model, model_path)
+
+    for frame in quadros[:aquecimento]:
+        backend.predict(model, frame, conf=0.70, imgsz=imgsz)
+
+    total = 0
+    inicio = time.monotonic()
+    for _ in range(repeticoes):
+        for frame in quadros:
+            backend.predict(model, frame, conf=0.70, imgsz=imgsz)
+            total += 1
+    duracao = time.monotonic() - inicio
+
+    fps = total / duracao if duracao > 0 else 0.0
+    return {
+        'backend': nome,
+        'imgsz': imgsz,
+        'carga_s': tempo_carga,
+        'quadros': total,
+        'fps': fps,
+        'ms_por_quadro': 1000.0 / fps if fps else float('inf'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o FPS de cada backend de inferência em quadros gravados.")
+    parser.add_argument('modelo', help="Caminho do arquivo .pt (ex.: modelostreinados/ITEM.pt)")
+    parser.add_argument('origem', help="Pasta com imagens .jpg/.png ou arquivo de vídeo gravado")
+    parser.add_argument('--backends', default='cuda,cpu,onnx,openvino',
+                        help=f"Backends a medir, separados por vírgula ({', '.join(BACKENDS)})")
+    parser.add_argument('--quadros', type=int, default=100, help="Quantidade máxima de quadros carregados")
+    parser.add_argument('--aquecimento', type=int, default=5, help="Quadros de aquecimento antes da medição")
+    parser.add_argument('--repeticoes', type=int, default=1, help="Quantas vezes percorrer o conjunto de quadros")
+    args = parser.parse_args()
+
+    quadros = carregar_quadros(args.origem, args.quadros)
+    print(f"{len(quadros)} quadros carregados de {args.origem}.")
+
+    resultados = []
+    for nome in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        try:
+            resultados.append(medir_backend(nome, args.modelo, quadros, args.aquecimento, args.repeticoes))
+        except Exception as e:
+            print(f"Backend {nome} indisponível: {e}")
+
+    print(f"\n{'backend':<10} {'imgsz':>6} {'carga (s)':>10} {'quadros':>8} {'FPS':>8} {'ms/quadro':>10}  "
+          f"alvo {FPS_ALVO} FPS")
+    for r in resultados:
+        status = 'OK' if r['fps'] >= FPS_ALVO else 'abaixo'
+        print(f"{r['backend']:<10} {r['imgsz']:>6} {r['carga_s']:>10.2f} {r['quadros']:>8} {r['fps']:>8.1f} "
+              f"{r['ms_por_quadro']:>10.1f}  {status}")
+
+
+if __name__ == '__main__':
+    main()
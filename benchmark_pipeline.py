@@ -0,0 +1,131 @@
+"""
+Benchmark do pipeline completo do core_back em CPU, sobre gravações (ver replay.py).
+
+Cada configuração roda o replay em um processo separado, já que as configurações do core_back
+vêm de variáveis de ambiente lidas na importação. O arquivo de configurações é uma lista JSON:
+
+    [{"nome": "cpu", "env": {"YOLO_BACKEND": "cpu"}},
+     {"nome": "onnx-roi", "env": {"YOLO_BACKEND": "onnx", "ROI_AUTO": "1"}}]
+
+Sem arquivo, mede um backend por configuração (--backends). Com --referencia (um --saida de uma
+execução anterior), falha se o FPS cair mais que --tolerancia ou se alguma mensagem sair errada,
+para comparar otimizações no CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+REPLAY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replay.py')
+
+
+def executar_configuracao(configuracao: Dict, origem: str, roteiro: str, ritmo: str, limite: int,
+                          timeout: float) -> Optional[Dict]:
+    env = dict(os.environ)
+    env.update({chave: str(valor) for chave, valor in configuracao.get('env', {}).items()})
+    with tempfile.TemporaryDirectory() as pasta:
+        saida = os.path.join(pasta, 'relatorio.json')
+        comando = [sys.executable, REPLAY, origem, roteiro, '--ritmo', ritmo, '--timeout', str(timeout),
+                   '--limite', str(limite), '--json', saida]
+        processo = subprocess.run(comando, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if not os.path.exists(saida):
+            print(f"Configuração {configuracao['nome']} falhou (código {processo.returncode}):")
+            print(processo.stdout[-2000:])
+            return None
+        with open(saida) as arquivo:
+            relatorio = json.load(arquivo)
+    relatorio['nome'] = configuracao['nome']
+    relatorio['env'] = configuracao.get('env', {})
+    return relatorio
+
+
+def _ms(resumo: Dict, campo: str) -> str:
+    return f"{resumo[campo]:.1f}" if resumo.get('n') else '-'
+
+
+def imprimir_tabela(relatorios: List[Dict]) -> None:
+    print(f"\n{'configuração':<16} {'FPS':>7} {'predict p50/p99 ms':>19} {'ponta p99 ms':>13} "
+          f"{'decisão p50/p99 ms':>19} {'pico MB':>8} {'mensagens':>10}")
+    for r in relatorios:
+        predict = r['etapas'].get('predict', {})
+        ponta = r['etapas'].get('ponta_a_ponta', {})
+        decisao = r['latencia_decisao']
+        mensagens = f"{r['mensagens']['corretos']}/{r['mensagens']['pedidos']}"
+        print(f"{r['nome']:<16} {r['fps']:>7.1f} {_ms(predict, 'p50_ms') + '/' + _ms(predict, 'p99_ms'):>19} "
+              f"{_ms(ponta, 'p99_ms'):>13} {_ms(decisao, 'p50_ms') + '/' + _ms(decisao, 'p99_ms'):>19} "
+              f"{r['memoria']['pico_rss_mb']:>8.0f} {mensagens:>10}")
+
+
+def comparar(relatorios: List[Dict], referencia: List[Dict], tolerancia: float) -> List[str]:
+    """
+    Regressões em relação à referência: FPS abaixo de (1 - tolerancia) ou menos mensagens corretas.
+    """
+    anteriores = {r['nome']: r for r in referencia}
+    problemas = []
+    for r in relatorios:
+        anterior = anteriores.get(r['nome'])
+        if anterior is None:
+            continue
+        if r['fps'] < anterior['fps'] * (1.0 - tolerancia):
+            problemas.append(f"{r['nome']}: FPS {r['fps']:.1f} < {anterior['fps']:.1f} "
+                             f"(tolerância {tolerancia:.0%})")
+        if r['mensagens']['corretos'] < anterior['mensagens']['corretos']:
+            problemas.append(f"{r['nome']}: {r['mensagens']['corretos']} mensagens corretas "
+                             f"(antes {anterior['mensagens']['corretos']})")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do core_back (replay em CPU).")
+    parser.add_argument('origem', help="Vídeo gravado ou pasta com imagens .jpg/.png")
+    parser.add_argument('roteiro', help="Mensagens da fila_recebimento em JSON lines (ver replay.py)")
+    parser.add_argument('--configuracoes', help="Arquivo JSON com a lista de configurações")
+    parser.add_argument('--backends', default='cpu,onnx,openvino',
+                        help="Sem --configuracoes, uma configuração por backend")
+    parser.add_argument('--ritmo', default='sincronizado', choices=('tempo-real', 'sincronizado', 'maximo'))
+    parser.add_argument('--limite', type=int, default=0, help="Máximo de quadros lidos da origem (0 = todos)")
+    parser.add_argument('--timeout', type=float, default=600.0, help="Timeout de cada configuração (s)")
+    parser.add_argument('--saida', help="Grava os relatórios completos neste arquivo JSON")
+    parser.add_argument('--referencia', help="Relatórios de uma execução anterior (--saida) para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="Queda de FPS aceita frente à referência")
+    args = parser.parse_args()
+
+    if args.configuracoes:
+        with open(args.configuracoes) as arquivo:
+            configuracoes = json.load(arquivo)
+    else:
+        configuracoes = [{'nome': b.strip(), 'env': {'YOLO_BACKEND': b.strip()}}
+                         for b in args.backends.split(',') if b.strip()]
+
+    relatorios = []
+    falhas = 0
+    for configuracao in configuracoes:
+        print(f"Executando {configuracao['nome']}...", flush=True)
+        relatorio = executar_configuracao(configuracao, args.origem, args.roteiro, args.ritmo, args.limite,
+                                          args.timeout)
+        if relatorio is None:
+            falhas += 1
+            continue
+        relatorios.append(relatorio)
+
+    imprimir_tabela(relatorios)
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorios, arquivo, indent=2, ensure_ascii=False)
+
+    problemas = []
+    if args.referencia:
+        with open(args.referencia) as arquivo:
+            problemas = comparar(relatorios, json.load(arquivo), args.tolerancia)
+    problemas += [f"{r['nome']}: {r['mensagens']['corretos']}/{r['mensagens']['pedidos']} mensagens corretas"
+                  for r in relatorios if r['mensagens']['corretos'] < r['mensagens']['pedidos']]
+    for problema in problemas:
+        print(f"FALHA: {problema}")
+    sys.exit(1 if problemas or falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import threading
+from collections import defaultdict, deque
+from typing import Dict, List
+
+from pika.exceptions import AMQPConnectionError, StreamLostError
+
+
+class BrokerMemoria:
+    """
+    Substituto em memória do RabbitMQ para testes e execução offline.
+
+    `conexao` tem a mesma assinatura de `pika.BlockingConnection` e pode ser passado como
+    `connection_factory` ao `PublicadorRabbitMQ`. `derrubar()` simula a queda do broker e
+    `disponivel` controla se novas conexões são aceitas.
+    """
+
+    def __init__(self):
+        self.filas: Dict[str, deque] = defaultdict(deque)
+        self.lock = threading.Condition()
+        self.disponivel = True
+        self.conexoes: List['ConexaoMemoria'] = []
+
+    def conexao(self, parameters=None) -> 'ConexaoMemoria':
+        if not self.disponivel:
+            raise AMQPConnectionError("Broker em memória indisponível")
+        conexao = ConexaoMemoria(self)
+        self.conexoes.append(conexao)
+        return conexao
+
+    def derrubar(self) -> None:
+        for conexao in self.conexoes:
+            conexao.is_open = False
+        self.conexoes.clear()
+
+    def mensagens(self, fila: str) -> List[bytes]:
+        with self.lock:
+            return list(self.filas[fila])
+
+    def aguardar(self, fila: str, quantidade: int, timeout: float = 5.0) -> bool:
+        """
+        Aguarda até que a fila tenha pelo menos `quantidade` mensagens.
+        """
+        with self.lock:
+            return self.lock.wait_for(lambda: len(self.filas[fila]) >= quantidade, timeout=timeout)
+
+
+class ConexaoMemoria:
+    def __init__(self, broker: BrokerMemoria):
+        self.broker = broker
+        self.is_open = True
+
+    def channel(self) -> 'CanalMemoria':
+        self._verificar()
+        return CanalMemoria(self)
+
+    def process_data_events(self, time_limit=0):
+        self._verificar()
+
+    def close(self):
+        self.is_open = False
+
+    def _verificar(self):
+        if not self.is_open:
+            raise StreamLostError("Conexão em memória encerrada.")
+
+
+class CanalMemoria:
+    def __init__(self, conexao: ConexaoMemoria):
+        self.conexao = conexao
+        self.confirmando = False
+
+    def confirm_delivery(self):
+        self.confirmando = True
+
+    def queue_declare(self, queue, durable=False, **kwargs):
+        self.conexao._verificar()
+        with self.conexao.broker.lock:
+            self.conexao.broker.filas[queue]
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.conexao._verificar()
+        broker = self.conexao.broker
+        with broker.lock:
+            broker.filas[routing_key].append(body.encode() if isinstance(body, str) else body)
+            broker.lock.notify_all()
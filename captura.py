@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class Quadro(NamedTuple):
+    """
+    Quadro entregue pelo buffer: imagem, instante de captura (time.monotonic) e número de sequência.
+    """
+    frame: np.ndarray
+    timestamp: float
+    seq: int
+
+
+class FrameRingBuffer:
+    """
+    Buffer circular pré-alocado que mantém apenas os quadros mais recentes.
+
+    Uma única thread de captura escreve e uma única thread de inferência lê. O slot
+    entregue ao leitor fica reservado até a próxima leitura, então o escritor nunca
+    sobrescreve um quadro que ainda está sendo processado. Quadros publicados e nunca
+    lidos são contabilizados em `dropped`.
+    """
+
+    def __init__(self, capacidade: int = 3, shape=(1080, 1920, 3), dtype=np.uint8):
+        if capacidade < 3:
+            raise ValueError("O buffer precisa de pelo menos 3 slots (escrita, último e leitura).")
+        self._slots = [np.empty(shape, dtype=dtype) for _ in range(capacidade)]
+        self._timestamps = [0.0] * capacidade
+        self._seqs = [0] * capacidade
+        self._cond = threading.Condition()
+        self._ultimo = -1      # slot com o quadro mais recente publicado
+        self._reservado = -1   # slot em uso pelo leitor
+        self._seq = 0
+        self._seq_lido = 0
+        self.capturados = 0
+        self.dropped = 0
+
+    def slot_escrita(self) -> int:
+        """
+        Retorna o índice de um slot livre para a próxima escrita.
+        """
+        with self._cond:
+            for i in range(len(self._slots)):
+                if i != self._ultimo and i != self._reservado:
+                    return i
+        raise RuntimeError("Nenhum slot livre no buffer.")
+
+    def buffer(self, indice: int) -> np.ndarray:
+        return self._slots[indice]
+
+    def publicar(self, indice: int, frame: Optional[np.ndarray] = None, timestamp: Optional[float] = None) -> None:
+        """
+        Publica o slot `indice` como quadro mais recente.
+        Se `frame` não for o próprio buffer do slot (ex.: resolução mudou), o slot é substituído.
+        """
+        with self._cond:
+            if frame is not None and frame is not self._slots[indice]:
+                self._slots[indice] = frame
+            self._seq += 1
+            if self._ultimo != -1 and self._seqs[self._ultimo] > self._seq_lido:
+                self.dropped += 1
+            self._timestamps[indice] = time.monotonic() if timestamp is None else timestamp
+            self._seqs[indice] = self._seq
+            self._ultimo = indice
+            self.capturados += 1
+            self._cond.notify_all()
+
+    def escrever(self, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        Copia `frame` para um slot livre e o publica.
+        """
+        indice = self.slot_escrita()
+        destino = self._slots[indice]
+        if destino.shape == frame.shape and destino.dtype == frame.dtype:
+            np.copyto(destino, frame)
+            self.publicar(indice, timestamp=timestamp)
+        else:
+            self.publicar(indice, frame.copy(), timestamp)
+
+    def ler_mais_recente(self, timeout: Optional[float] = None) -> Optional[Quadro]:
+        """
+        Aguarda um quadro mais novo que o último lido e o reserva para o leitor.
+        Retorna None se nenhum quadro novo chegar dentro do timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ultimo != -1 and self._seqs[self._ultimo] > self._seq_lido,
+                                       timeout=timeout):
+                return None
+            indice = self._ultimo
+            self._reservado = indice
+            self._seq_lido = self._seqs[indice]
+            self._cond.notify_all()
+            return Quadro(self._slots[indice], self._timestamps[indice], self._seqs[indice])
+
+    def aguardar_leitura(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda o leitor pegar o último quadro publicado (replay sincronizado, sem descartes).
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq_lido >= self._seq, timeout=timeout)
+
+    def limpar(self) -> None:
+        """
+        Descarta o quadro pendente (ex.: após desconexão da câmera).
+        """
+        with self._cond:
+            if self._ultimo != -1:
+                self._seq_lido = self._seqs[self._ultimo]
+
+
+class EstatisticasLatencia:
+    """
+    Janela deslizante de latências (em segundos) com resumo em milissegundos.
+    """
+
+    def __init__(self, tamanho: int = 200):
+        self._valores = np.zeros(tamanho, dtype=np.float64)
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, valor: float) -> None:
+        with self._lock:
+            self._valores[self._n % len(self._valores)] = valor
+            self._n += 1
+
+    def resumo(self) -> dict:
+        with self._lock:
+            n = min(self._n, len(self._valores))
+            if n == 0:
+                return {'n': 0}
+            amostra = self._valores[:n] * 1000.0
+            return {
+                'n': self._n,
+                'media_ms': round(float(amostra.mean()), 1),
+                'p50_ms': round(float(np.percentile(amostra, 50)), 1),
+                'p99_ms': round(float(np.percentile(amostra, 99)), 1),
+            }
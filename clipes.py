@@ -0,0 +1,261 @@
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from deteccoes import Deteccoes
+
+# Configuração dos clipes de defeito
+CLIPE_PRE_S = float(os.getenv('CLIPE_PRE_S', '5'))              # segundos antes do defeito
+CLIPE_POS_S = float(os.getenv('CLIPE_POS_S', '3'))              # segundos depois do defeito
+CLIPE_FPS = float(os.getenv('CLIPE_FPS', '10'))                 # quadros por segundo guardados no buffer
+CLIPE_MEMORIA_MB = int(os.getenv('CLIPE_MEMORIA_MB', '64'))     # memória do buffer (alocada uma vez)
+CLIPE_QUALIDADE = int(os.getenv('CLIPE_QUALIDADE', '75'))       # qualidade JPEG dos quadros guardados
+CLIPE_FORMATO = os.getenv('CLIPE_FORMATO', 'mp4')               # mp4 (mp4v) ou mjpeg (JPEGs concatenados)
+
+FORMATOS = ('mp4', 'mjpeg')
+
+
+class Evento(NamedTuple):
+    nome: str
+    momento: float
+    fim: float
+
+
+class BufferClipes:
+    """
+    Buffer circular dos últimos segundos de vídeo, em JPEG, para gerar clipes dos defeitos.
+
+    A memória é alocada uma vez (`memoria_mb`) e dividida em `capacidade` posições de tamanho
+    fixo, o bastante para `pre_s + pos_s` segundos a `fps` quadros por segundo. A thread de
+    detecção só chama `adicionar`, que descarta quadros acima de `fps` e entrega o restante a uma
+    thread de compressão; se ela estiver atrasada, o quadro é descartado em vez de esperar.
+
+    `disparar` marca um defeito: quando chegam os quadros até `pos_s` depois dele, a janela
+    [momento - pre_s, momento + pos_s] é copiada do buffer e gravada por uma thread de
+    codificação em `<diretorio_base>/<data>/<nome>.mp4` (ou `.mjpeg`), com as detecções de cada
+    quadro em `<nome>.json`.
+    """
+
+    def __init__(self, diretorio_base: str, pre_s: float = CLIPE_PRE_S, pos_s: float = CLIPE_POS_S,
+                 fps: float = CLIPE_FPS, memoria_mb: int = CLIPE_MEMORIA_MB,
+                 qualidade: int = CLIPE_QUALIDADE, formato: str = CLIPE_FORMATO,
+                 desenhar: bool = True, rotacionar: bool = False):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de clipe não suportado: {formato}. Opções: {', '.join(FORMATOS)}")
+        self.diretorio_base = diretorio_base
+        self.pre_s = pre_s
+        self.pos_s = pos_s
+        self.fps = fps
+        self.intervalo = 1.0 / fps
+        self.parametros = [cv2.IMWRITE_JPEG_QUALITY, qualidade]
+        self.formato = formato
+        self.desenhar = desenhar
+        # Quadros da câmera chegam de cabeça para baixo; a rotação fica na thread de compressão
+        self.rotacionar = rotacionar
+
+        self.capacidade = math.ceil((pre_s + pos_s) * fps) + 1
+        self.tamanho_posicao = memoria_mb * 1024 * 1024 // self.capacidade
+        self._memoria = np.empty(self.capacidade * self.tamanho_posicao, dtype=np.uint8)
+        self._tamanhos = np.zeros(self.capacidade, dtype=np.int64)
+        self._momentos = np.full(self.capacidade, -np.inf)
+        self._deteccoes: List[Optional[Deteccoes]] = [None] * self.capacidade
+        self._escritos = 0
+        self._lock = threading.Lock()
+
+        self._proximo = 0.0
+        self._entrada: queue.Queue = queue.Queue(maxsize=4)
+        self._eventos: List[Evento] = []
+        self._clipes: queue.Queue = queue.Queue(maxsize=4)
+
+        # Contadores para monitoramento
+        self.quadros = 0
+        self.descartados = 0
+        self.grandes = 0
+        self.clipes_gravados = 0
+        self.clipes_descartados = 0
+
+        self.thread_compressao = threading.Thread(target=self._comprimir, name='clipes_compressao', daemon=True)
+        self.thread_compressao.start()
+        self.thread_codificacao = threading.Thread(target=self._codificar, name='clipes_codificacao', daemon=True)
+        self.thread_codificacao.start()
+
+    def adicionar(self, frame: np.ndarray, deteccoes: Optional[Deteccoes] = None,
+                  momento: Optional[float] = None, copiar: bool = False) -> None:
+        """
+        Oferece um quadro ao buffer. Use `copiar=True` se o array puder ser reutilizado por quem chama
+        (ex.: slot do FrameRingBuffer); a cópia só acontece nos quadros aceitos (até `fps` por segundo).
+        """
+        momento = time.time() if momento is None else momento
+        if momento < self._proximo:
+            return
+        self._proximo = momento + self.intervalo
+        if self._entrada.full():
+            self.descartados += 1
+            return
+        try:
+            self._entrada.put_nowait((momento, frame.copy() if copiar else frame, deteccoes))
+        except queue.Full:
+            self.descartados += 1
+
+    def disparar(self, nome: str, momento: Optional[float] = None) -> None:
+        """
+        Pede o clipe de um defeito ocorrido em `momento` (agora, por padrão).
+        """
+        momento = time.time() if momento is None else momento
+        with self._lock:
+            self._eventos.append(Evento(nome, momento, momento + self.pos_s))
+
+    def _comprimir(self) -> None:
+        while True:
+            try:
+                momento, frame, deteccoes = self._entrada.get(timeout=0.5)
+            except queue.Empty:
+                # Sem quadros (ex.: câmera desconectada): fecha os clipes vencidos com o que houver
+                self._fechar_eventos(time.time() - 1.0)
+                continue
+            try:
+                if self.rotacionar:
+                    frame = cv2.rotate(frame, cv2.ROTATE_180)
+                ok, jpeg = cv2.imencode('.jpg', frame, self.parametros)
+                if not ok:
+                    raise IOError("cv2.imencode falhou")
+                self._guardar(momento, jpeg.reshape(-1), deteccoes)
+                self._fechar_eventos(momento)
+            except Exception:
+                logging.exception("Erro ao guardar quadro no buffer de clipes")
+
+    def _guardar(self, momento: float, jpeg: np.ndarray, deteccoes: Optional[Deteccoes]) -> None:
+        if len(jpeg) > self.tamanho_posicao:
+            self.grandes += 1
+            logging.warning(f"Quadro de {len(jpeg)} bytes não cabe no buffer de clipes "
+                            f"({self.tamanho_posicao} por quadro). Aumente CLIPE_MEMORIA_MB.")
+            return
+        with self._lock:
+            posicao = self._escritos % self.capacidade
+            inicio = posicao * self.tamanho_posicao
+            self._memoria[inicio:inicio + len(jpeg)] = jpeg
+            self._tamanhos[posicao] = len(jpeg)
+            self._momentos[posicao] = momento
+            self._deteccoes[posicao] = deteccoes
+            self._escritos += 1
+        self.quadros += 1
+
+    def _fechar_eventos(self, agora: float) -> None:
+        with self._lock:
+            vencidos = [evento for evento in self._eventos if evento.fim <= agora]
+            if not vencidos:
+                return
+            self._eventos = [evento for evento in self._eventos if evento.fim > agora]
+            clipes = [(evento, self._copiar(evento.momento - self.pre_s, evento.fim)) for evento in vencidos]
+        for evento, quadros in clipes:
+            try:
+                self._clipes.put_nowait((evento, quadros))
+            except queue.Full:
+                self.clipes_descartados += 1
+                logging.error(f"Fila de clipes cheia. Clipe descartado: {evento.nome}")
+
+    def _copiar(self, inicio: float, fim: float) -> List[tuple]:
+        """
+        Cópia (em ordem de tempo) dos quadros entre `inicio` e `fim`. Chamar com o lock.
+        """
+        posicoes = np.nonzero((self._momentos >= inicio) & (self._momentos <= fim))[0]
+        posicoes = posicoes[np.argsort(self._momentos[posicoes])]
+        quadros = []
+        for posicao in posicoes:
+            deslocamento = posicao * self.tamanho_posicao
+            jpeg = self._memoria[deslocamento:deslocamento + self._tamanhos[posicao]].copy()
+            quadros.append((float(self._momentos[posicao]), jpeg, self._deteccoes[posicao]))
+        return quadros
+
+    def diretorio(self) -> str:
+        diretorio = os.path.join(self.diretorio_base, datetime.now().strftime('%Y-%m-%d'))
+        os.makedirs(diretorio, exist_ok=True)
+        return diretorio
+
+    def _codificar(self) -> None:
+        while True:
+            evento, quadros = self._clipes.get()
+            try:
+                if not quadros:
+                    logging.warning(f"Nenhum quadro no buffer para o clipe {evento.nome}.")
+                    continue
+                caminho = self._gravar_video(evento, quadros)
+                self._gravar_metadados(evento, quadros, caminho)
+                self.clipes_gravados += 1
+                logging.info(f"Clipe do defeito salvo em {caminho} ({len(quadros)} quadros).")
+            except Exception:
+                logging.exception(f"Erro ao gravar o clipe {evento.nome}")
+
+    def _gravar_video(self, evento: Evento, quadros: List[tuple]) -> str:
+        base = os.path.join(self.diretorio(), evento.nome)
+        if self.formato == 'mjpeg' and not self.desenhar:
+            # Os quadros já estão em JPEG: o MJPEG é só a concatenação, sem recodificar
+            caminho = base + '.mjpeg'
+            with open(caminho, 'wb') as arquivo:
+                for _, jpeg, _ in quadros:
+                    arquivo.write(jpeg.tobytes())
+            return caminho
+
+        from previa import desenhar_deteccoes
+
+        caminho = base + ('.mp4' if self.formato == 'mp4' else '.mjpeg')
+        escritor = None
+        arquivo = None
+        try:
+            for _, jpeg, deteccoes in quadros:
+                frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+                if self.desenhar and deteccoes is not None:
+                    desenhar_deteccoes(frame, deteccoes)
+                if self.formato == 'mjpeg':
+                    if arquivo is None:
+                        arquivo = open(caminho, 'wb')
+                    ok, saida = cv2.imencode('.jpg', frame, self.parametros)
+                    arquivo.write(saida.tobytes())
+                    continue
+                if escritor is None:
+                    altura, largura = frame.shape[:2]
+                    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'mp4v'), self._fps_real(quadros),
+                                               (largura, altura))
+                    if not escritor.isOpened():
+                        raise IOError(f"cv2.VideoWriter não abriu {caminho}")
+                escritor.write(frame)
+        finally:
+            if escritor is not None:
+                escritor.release()
+            if arquivo is not None:
+                arquivo.close()
+        return caminho
+
+    def _fps_real(self, quadros: List[tuple]) -> float:
+        """
+        Taxa efetiva dos quadros guardados (menor que `fps` se a câmera entregou menos quadros).
+        """
+        duracao = quadros[-1][0] - quadros[0][0]
+        if len(quadros) < 2 or duracao <= 0:
+            return self.fps
+        return min(self.fps, (len(quadros) - 1) / duracao)
+
+    def _gravar_metadados(self, evento: Evento, quadros: List[tuple], caminho: str) -> None:
+        metadados: Dict = {
+            'nome': evento.nome,
+            'video': os.path.basename(caminho),
+            'momento': evento.momento,
+            'inicio': quadros[0][0],
+            'fim': quadros[-1][0],
+            'fps': self._fps_real(quadros),
+            'quadros': [
+                {'indice': indice, 'momento': momento, 'deteccoes': deteccoes.lista if deteccoes is not None else []}
+                for indice, (momento, _, deteccoes) in enumerate(quadros)
+            ],
+        }
+        with open(os.path.splitext(caminho)[0] + '.json', 'w') as arquivo:
+            json.dump(metadados, arquivo, ensure_ascii=False)
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.exceptions import AMQPConnectionError
+
+
+class Pedido(NamedTuple):
+    """
+    Pedido recebido da fila: item esperado, quantidade, modelo e arquivo de evidência (opcionais),
+    a mensagem original e a entrega (geração da conexão, delivery tag) usada no ack.
+    """
+    item_id: str
+    quantidade: int
+    modelo: Optional[str]
+    arquivo: Optional[str]
+    mensagem: Dict
+    entrega: Optional[Tuple[int, int]] = None
+
+
+class Trabalho(NamedTuple):
+    """
+    Pedido ativo de uma estação, imutável. É publicado trocando a referência inteira, então a
+    thread de detecção lê todos os campos de uma vez, sem lock e sem misturar pedidos. `seq`
+    cresce a cada pedido ativado e vai nas mensagens de resultado, para que o consumidor do
+    resultado possa descartar respostas de um pedido já substituído.
+    """
+    seq: int
+    item_id: str
+    quantidade: int
+    arquivo: Optional[str] = None
+    modelo: Optional[str] = None
+    enviado: bool = False
+
+
+def ler_pedido(body: bytes, entrega: Optional[Tuple[int, int]] = None) -> Pedido:
+    """
+    Valida a mensagem da fila de recebimento. Levanta ValueError se não for um pedido válido.
+    """
+    try:
+        mensagem = json.loads(body.decode())
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Mensagem recebida não é um JSON válido.")
+    if not isinstance(mensagem, dict):
+        raise ValueError("Dados inválidos recebidos na mensagem.")
+    item_id = mensagem.get('itemId')
+    quantidade = mensagem.get('quantity')
+    if not isinstance(item_id, str) or not isinstance(quantidade, int):
+        raise ValueError("Dados inválidos recebidos na mensagem.")
+    # bool é subclasse de int: `true` no JSON não é uma quantidade
+    if isinstance(quantidade, bool) or quantidade <= 0:
+        raise ValueError(f"Quantidade inválida na mensagem: {quantidade!r}.")
+    return Pedido(item_id.lower(), quantidade, mensagem.get('model'), mensagem.get('fileName'), mensagem, entrega)
+
+
+class FilaPedidos:
+    """
+    Fila local de pedidos na ordem de chegada, com aviso do modelo de cada pedido a `on_previsto`
+    (pré-carregamento). Sozinha, serve de substituto do RabbitMQ em replays e testes: os pedidos
+    entram por `entregar`, e `on_confirmado` é avisado quando a estação confirma (ativou) um pedido.
+    """
+
+    def __init__(self, on_previsto: Optional[Callable[[str], None]] = None,
+                 on_confirmado: Optional[Callable[[Pedido], None]] = None):
+        self.on_previsto = on_previsto
+        self.on_confirmado = on_confirmado
+        self._pedidos: deque = deque()
+        self._cond = threading.Condition()
+        self._parado = False
+        self.recebidos = 0
+        self.confirmados = 0
+
+    def entregar(self, pedido: Pedido) -> None:
+        """
+        Coloca o pedido na fila local e agenda o pré-carregamento do seu modelo.
+        """
+        with self._cond:
+            self._pedidos.append(pedido)
+            self.recebidos += 1
+            self._cond.notify_all()
+        if pedido.modelo and self.on_previsto:
+            try:
+                self.on_previsto(pedido.modelo)
+            except Exception:
+                logging.exception(f"Erro ao pré-carregar o modelo {pedido.modelo}")
+
+    def obter(self, timeout: Optional[float] = None) -> Optional[Pedido]:
+        """
+        Retira o próximo pedido, na ordem de chegada. Retorna None no timeout ou se a fila foi parada.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pedidos or self._parado, timeout=timeout):
+                return None
+            return self._pedidos.popleft() if self._pedidos else None
+
+    def proximos(self) -> Tuple[Pedido, ...]:
+        with self._cond:
+            return tuple(self._pedidos)
+
+    def pendentes(self) -> int:
+        return len(self._pedidos)
+
+    def confirmar(self, pedido: Pedido) -> None:
+        self.confirmados += 1
+        if self.on_confirmado:
+            self.on_confirmado(pedido)
+
+    def parar(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._parado = True
+            self._cond.notify_all()
+
+
+class ConsumidorPedidos(FilaPedidos):
+    """
+    Consumidor assíncrono da fila de recebimento (pika AsyncioConnection em um loop asyncio próprio).
+
+    Mantém uma janela de até `prefetch` pedidos ainda não confirmados: cada pedido recebido entra
+    em uma fila local e seu modelo é passado a `on_previsto` (pré-carregamento), enquanto o pedido
+    atual ainda está sendo contado. Quem processa retira os pedidos com `obter` e chama `confirmar`
+    ao ativá-los; só então o broker libera o próximo da janela.
+
+    A conexão é refeita com backoff exponencial. Pedidos não confirmados de uma conexão que caiu
+    são descartados da fila local, pois o broker os entrega de novo, na mesma ordem.
+    """
+
+    def __init__(self, host: str, user: str, password: str, fila: str, prefetch: int = 4,
+                 on_previsto: Optional[Callable[[str], None]] = None,
+                 backoff_inicial: float = 0.5, backoff_maximo: float = 30.0):
+        super().__init__(on_previsto)
+        credentials = pika.PlainCredentials(user, password)
+        self.parameters = pika.ConnectionParameters(host=host, credentials=credentials, heartbeat=600)
+        self.host = host
+        self.fila = fila
+        self.prefetch = prefetch
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+
+        self._geracao = 0
+        self._canal = None
+        self._conexao: Optional[AsyncioConnection] = None
+
+        # Contadores para monitoramento
+        self.invalidos = 0
+        self.conexoes = 0
+        self.reconexoes = 0
+
+        self._loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._executar, name=f'consumidor_{fila}', daemon=True)
+        self.thread.start()
+
+    def confirmar(self, pedido: Pedido) -> None:
+        """
+        Confirma (ack) o pedido no broker, a partir de qualquer thread.
+        """
+        super().confirmar(pedido)
+        if pedido.entrega is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._ack, *pedido.entrega)
+
+    def _ack(self, geracao: int, tag: int) -> None:
+        if geracao != self._geracao or self._canal is None or not self._canal.is_open:
+            # A conexão da entrega caiu: o broker reentrega a mensagem
+            logging.warning(f"Ack do pedido {tag} perdido com a conexão anterior; será reentregue.")
+            return
+        self._canal.basic_ack(delivery_tag=tag)
+
+    def _on_message(self, canal, method, properties, body) -> None:
+        try:
+            pedido = ler_pedido(body, (self._geracao, method.delivery_tag))
+        except ValueError as e:
+            self.invalidos += 1
+            logging.error(f"{e} ({body[:200]!r})")
+            canal.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        self.entregar(pedido)
+
+    def _executar(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._consumir())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _consumir(self) -> None:
+        espera = self.backoff_inicial
+        while not self._parado:
+            try:
+                await self._sessao()
+                espera = self.backoff_inicial
+            except AMQPConnectionError as e:
+                logging.error(f"Erro de conexão com o RabbitMQ: {e}. Nova tentativa em {espera:.1f}s.")
+            except Exception:
+                logging.exception("Erro no consumidor da fila de recebimento")
+            self._descartar_nao_confirmados()
+            if self._parado:
+                break
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, self.backoff_maximo)
+
+    async def _sessao(self) -> None:
+        """
+        Uma conexão completa: abre, declara a fila, consome e retorna quando a conexão fecha.
+        """
+        loop = self._loop
+        aberta = loop.create_future()
+        fechada = loop.create_future()
+
+        def resolver(future, valor=None, erro=None):
+            if future.done():
+                return
+            if erro is not None:
+                future.set_exception(erro)
+            else:
+                future.set_result(valor)
+
+        def on_close(_conexao, motivo):
+            resolver(aberta, erro=AMQPConnectionError(repr(motivo)))
+            resolver(fechada, motivo)
+
+        conexao = AsyncioConnection(
+            self.parameters,
+            on_open_callback=lambda c: resolver(aberta, c),
+            on_open_error_callback=lambda c, e: resolver(aberta, erro=AMQPConnectionError(repr(e))),
+            on_close_callback=on_close,
+            custom_ioloop=loop
+        )
+        self._conexao = conexao
+        try:
+            await aberta
+
+            canal_aberto = loop.create_future()
+            conexao.channel(on_open_callback=lambda canal: resolver(canal_aberto, canal))
+            canal = await canal_aberto
+            # Canal fechado pelo broker (ex.: erro de protocolo) derruba a sessão inteira
+            canal.add_on_close_callback(lambda c, motivo: conexao.is_open and conexao.close())
+
+            declarada = loop.create_future()
+            canal.queue_declare(queue=self.fila, durable=True, callback=lambda frame: resolver(declarada))
+            await declarada
+            qos = loop.create_future()
+            canal.basic_qos(prefetch_count=self.prefetch, callback=lambda frame: resolver(qos))
+            await qos
+
+            self._geracao += 1
+            self._canal = canal
+            canal.basic_consume(self.fila, self._on_message, auto_ack=False)
+            if self.conexoes:
+                self.reconexoes += 1
+            self.conexoes += 1
+            logging.info(f"Aguardando mensagens na fila {self.fila} (prefetch {self.prefetch}).")
+
+            motivo = await fechada
+            if not self._parado:
+                logging.error(f"Conexão do consumidor com o RabbitMQ em {self.host} encerrada: {motivo}")
+        finally:
+            self._canal = None
+            self._conexao = None
+            if conexao.is_open:
+                conexao.close()
+
+    def _descartar_nao_confirmados(self) -> None:
+        geracao = self._geracao
+        with self._cond:
+            restantes = [p for p in self._pedidos if p.entrega is None or p.entrega[0] != geracao]
+            descartados = len(self._pedidos) - len(restantes)
+            self._pedidos = deque(restantes)
+        if descartados:
+            logging.info(f"{descartados} pedido(s) não confirmado(s) descartado(s); o broker vai reentregá-los.")
+
+    def parar(self, timeout: float = 2.0) -> None:
+        super().parar()
+        if not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._fechar)
+            except RuntimeError:
+                pass
+        self.thread.join(timeout)
+
+    def _fechar(self) -> None:
+        conexao = self._conexao
+        if conexao is not None and conexao.is_open:
+            conexao.close()
+        else:
+            for tarefa in asyncio.all_tasks(self._loop):
+                tarefa.cancel()
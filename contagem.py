@@ -0,0 +1,214 @@
+import json
+import os
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Parâmetros da estabilização temporal da contagem
+CONTAGEM_JANELA = int(os.getenv('CONTAGEM_JANELA', '9'))            # quadros na janela deslizante
+CONTAGEM_MIN_QUADROS = int(os.getenv('CONTAGEM_MIN_QUADROS', '3'))  # quadros concordantes para confirmar a quantidade esperada
+CONTAGEM_IOU = float(os.getenv('CONTAGEM_IOU', '0.3'))              # IoU mínimo para associar caixas entre quadros
+CONTAGEM_MAX_FALHAS = int(os.getenv('CONTAGEM_MAX_FALHAS', '2'))    # quadros sem detecção antes de remover um rastro
+
+
+def iou_matriz(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    IoU entre todas as caixas de `a` (N x 4) e `b` (M x 4), no formato xyxy.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class RastreadorIoU:
+    """
+    Rastreamento leve por IoU: associa gulosamente as caixas do quadro atual aos rastros anteriores.
+
+    Um rastro conta como objeto depois de `min_acertos` quadros e continua contando por até
+    `max_falhas` quadros sem detecção, o que absorve caixas que piscam de um quadro para outro.
+    """
+
+    def __init__(self, iou_minimo: float = CONTAGEM_IOU, max_falhas: int = CONTAGEM_MAX_FALHAS,
+                 min_acertos: int = 2):
+        self.iou_minimo = iou_minimo
+        self.max_falhas = max_falhas
+        self.min_acertos = min_acertos
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        self.caixas = np.empty((0, 4), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.acertos = np.empty(0, dtype=np.int64)
+        self.falhas = np.empty(0, dtype=np.int64)
+        self._proximo_id = 0
+
+    def atualizar(self, xyxy: np.ndarray) -> np.ndarray:
+        """
+        Atualiza os rastros com as caixas do quadro e retorna o id de rastro de cada caixa.
+        """
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        ids_caixas = np.full(len(xyxy), -1, dtype=np.int64)
+        associado = np.zeros(len(self.caixas), dtype=bool)
+
+        iou = iou_matriz(self.caixas, xyxy)
+        if iou.size:
+            # Associação gulosa, do maior IoU para o menor
+            for indice in np.argsort(iou, axis=None)[::-1]:
+                r, c = divmod(int(indice), iou.shape[1])
+                if iou[r, c] < self.iou_minimo:
+                    break
+                if associado[r] or ids_caixas[c] != -1:
+                    continue
+                associado[r] = True
+                ids_caixas[c] = self.ids[r]
+                self.caixas[r] = xyxy[c]
+
+        self.acertos[associado] += 1
+        self.falhas[associado] = 0
+        self.falhas[~associado] += 1
+
+        novas = ids_caixas == -1
+        quantidade_novas = int(np.count_nonzero(novas))
+        if quantidade_novas:
+            novos_ids = np.arange(self._proximo_id, self._proximo_id + quantidade_novas)
+            self._proximo_id += quantidade_novas
+            ids_caixas[novas] = novos_ids
+            self.caixas = np.concatenate([self.caixas, xyxy[novas]])
+            self.ids = np.concatenate([self.ids, novos_ids])
+            self.acertos = np.concatenate([self.acertos, np.ones(quantidade_novas, dtype=np.int64)])
+            self.falhas = np.concatenate([self.falhas, np.zeros(quantidade_novas, dtype=np.int64)])
+
+        vivos = self.falhas <= self.max_falhas
+        self.caixas, self.ids = self.caixas[vivos], self.ids[vivos]
+        self.acertos, self.falhas = self.acertos[vivos], self.falhas[vivos]
+        return ids_caixas
+
+    def contar(self) -> int:
+        """
+        Quantidade de rastros confirmados ainda ativos.
+        """
+        return int(np.count_nonzero(self.acertos >= self.min_acertos))
+
+
+class EstimadorContagem:
+    """
+    Estimador de contagem em fluxo: janela deslizante das contagens rastreadas por quadro.
+
+    - Se `min_quadros_esperado` quadros seguidos concordam com a quantidade esperada, decide na hora.
+    - Outra quantidade nunca encerra a contagem antes do limite, mesmo estável: no início do pedido
+      a bandeja costuma estar vazia ou incompleta.
+    - No limite de quadros, `forcar_decisao` devolve a moda da janela.
+    """
+
+    def __init__(self, janela: int = CONTAGEM_JANELA, min_quadros_esperado: int = CONTAGEM_MIN_QUADROS,
+                 rastreador: Optional[RastreadorIoU] = None):
+        self.janela = janela
+        self.min_quadros_esperado = min_quadros_esperado
+        self.rastreador = rastreador or RastreadorIoU()
+        self.contagens: deque = deque(maxlen=janela)
+        self.quadros = 0
+
+    def reiniciar(self) -> None:
+        self.rastreador.reiniciar()
+        self.contagens.clear()
+        self.quadros = 0
+
+    def adicionar(self, xyxy: np.ndarray) -> int:
+        """
+        Registra as caixas da classe esperada de um quadro e retorna a contagem rastreada.
+        """
+        self.rastreador.atualizar(xyxy)
+        contagem = self.rastreador.contar()
+        # Antes de os rastros serem confirmados, usa a contagem bruta do quadro
+        if self.quadros < self.rastreador.min_acertos:
+            contagem = len(xyxy)
+        self.contagens.append(contagem)
+        self.quadros += 1
+        return contagem
+
+    def moda(self) -> Optional[int]:
+        if not self.contagens:
+            return None
+        return Counter(self.contagens).most_common(1)[0][0]
+
+    def decidir(self, esperado: Optional[int]) -> Optional[int]:
+        """
+        Retorna a quantidade esperada se ela está estável, ou None (continua contando).
+        """
+        if esperado is not None and len(self.contagens) >= self.min_quadros_esperado:
+            ultimas = list(self.contagens)[-self.min_quadros_esperado:]
+            if all(c == esperado for c in ultimas):
+                return esperado
+        return None
+
+    def forcar_decisao(self) -> int:
+        moda = self.moda()
+        return 0 if moda is None else moda
+
+
+class GravadorSessao:
+    """
+    Grava as detecções da classe esperada quadro a quadro em JSON lines, para replay offline
+    (ver replay_contagem.py). A primeira linha descreve o pedido; `finalizar` registra a decisão.
+    """
+
+    def __init__(self, diretorio: str, item_id: str, quantidade: int):
+        os.makedirs(diretorio, exist_ok=True)
+        nome = f"{time.strftime('%Y%m%d-%H%M%S')}_{item_id.replace(' ', '_')}.jsonl"
+        self.caminho = os.path.join(diretorio, nome)
+        self._arquivo = open(self.caminho, 'w')
+        self._escrever({'itemId': item_id, 'quantity': quantidade})
+
+    def _escrever(self, registro: Dict) -> None:
+        self._arquivo.write(json.dumps(registro) + '\n')
+
+    def quadro(self, timestamp: float, xyxy: np.ndarray, conf: np.ndarray) -> None:
+        self._escrever({'t': timestamp, 'xyxy': np.round(xyxy, 1).tolist(), 'conf': np.round(conf, 3).tolist()})
+
+    def finalizar(self, contagem: int) -> None:
+        self._escrever({'decisao': contagem})
+        self._arquivo.close()
+
+
+def ler_sessao(caminho: str) -> Dict:
+    """
+    Lê uma sessão gravada. Uma linha {'real': N} pode ser acrescentada à mão com a contagem verdadeira.
+    """
+    sessao: Dict = {'quadros': [], 'decisao': None, 'real': None}
+    with open(caminho) as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            if 't' in registro:
+                sessao['quadros'].append(registro)
+            elif 'itemId' in registro:
+                sessao.update(registro)
+            else:
+                sessao.update({k: v for k, v in registro.items() if k in ('decisao', 'real')})
+    return sessao
+
+
+def replay(sessao: Dict, estimador: EstimadorContagem, limite_quadros: int) -> Dict:
+    """
+    Reexecuta uma sessão gravada no estimador e devolve a decisão, em qual quadro e após quanto tempo.
+    """
+    estimador.reiniciar()
+    quadros: List[Dict] = sessao['quadros']
+    esperado = sessao.get('quantity')
+    for i, quadro in enumerate(quadros):
+        estimador.adicionar(np.asarray(quadro['xyxy'], dtype=np.float32).reshape(-1, 4))
+        decisao = estimador.decidir(esperado)
+        if decisao is None and i + 1 >= limite_quadros:
+            decisao = estimador.forcar_decisao()
+        if decisao is not None:
+            return {'contagem': decisao, 'quadro': i + 1, 'latencia_s': quadro['t'] - quadros[0]['t']}
+    return {'contagem': estimador.forcar_decisao() if quadros else None, 'quadro': len(quadros),
+            'latencia_s': quadros[-1]['t'] - quadros[0]['t'] if quadros else 0.0}
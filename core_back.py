@@ -1,24 +1,44 @@
+import itertools
 import os
-import json
+import queue
 import time
 import logging
 import threading
-from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import subprocess
+import signal
 import sys
-import numpy as np
+import tempfile
 
-from pika.exceptions import AMQPConnectionError
-import pika
 import cv2
-from ultralytics import YOLO
+
+from captura import FrameRingBuffer, EstatisticasLatencia, Quadro
+from publicador import PublicadorRabbitMQ
+from consumidor import ConsumidorPedidos, FilaPedidos, Pedido, Trabalho
+from modelos import RegistroModelos, ler_configuracao_modelo
+from backends import criar_backend, YOLO_BACKEND
+from deteccoes import Deteccoes, ids_das_classes
+from contagem import EstimadorContagem, GravadorSessao
+from roi import PreprocessadorROI, YOLO_IMG_SIZE, ROI, ROI_AUTO, ler_roi
+from aruco import LeitorAruco
+from analisadores import Analisador, AnalisadorDefeitos, Contexto
+from evidencias import GravadorEvidencias
+from registro import configurar_logging
+from metricas import METRICAS, iniciar_servidor_metricas
+from previa import SAIR, criar_previa, desenhar_deteccoes
+from dispositivo import GerenciadorDispositivo, reiniciar_servidor_adb
+from recuperacao import CAPTURA_TIMEOUT_LEITURA_MS, RecuperacaoEscalonada, aguardar_primeiro_quadro
+from supervisor_scrcpy import SupervisorScrcpy, CapturaDireta, SCRCPY_INGESTAO, criar_fifo
+from saude_captura import MonitorSaudeCaptura
 
 # Configurações do RabbitMQ a partir das variáveis de ambiente
 RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'localhost')  # Default para 'localhost' se não definido
 RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'admin')     # Default para 'admin'
 RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'admin')     # Default para 'admin'
 
+# Tamanho máximo da fila de saída do publicador
+RABBITMQ_OUTBOUND_QUEUE_SIZE = int(os.getenv('RABBITMQ_OUTBOUND_QUEUE_SIZE', '1000'))
+
 # Nomes das filas
 QUEUE_SEND = 'fila_envio'
 QUEUE_RECEIVE = 'fila_recebimento'
@@ -26,560 +46,639 @@ QUEUE_RECEIVE = 'fila_recebimento'
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
 # Caminho base do modelo YOLO a partir das variáveis de ambiente
+# (o backend de inferência é escolhido por YOLO_BACKEND: cuda, cpu, onnx ou openvino)
 YOLO_MODEL_BASE_PATH = os.getenv('YOLO_MODEL_BASE_PATH', f'{BASE_PATH}/modelostreinados/')
 
+# Orçamento de memória do cache de modelos e quantas mensagens da fila são lidas adiante para pré-carregamento
+YOLO_MODEL_CACHE_MB = int(os.getenv('YOLO_MODEL_CACHE_MB', '2048'))
+MODEL_PRELOAD_PREFETCH = int(os.getenv('MODEL_PRELOAD_PREFETCH', '4'))
+
 IP_OCULOS = "192.168.1.92"
+VIDEO_DEVICE = "/dev/video2"
+SCRCPY_CAMERA_SIZE = "1920x1080"
 
 FPS = 15
 PROCESSING_LIMIT_SECONDS = 5
 PROCESSING_LIMIT_FRAMES = FPS * PROCESSING_LIMIT_SECONDS
 
-# Configuração de logging
-def configurar_logging():
-    """
-    Configura o logging para armazenar logs em uma pasta com a data atual.
-    """
-    now = datetime.now()
-    data_atual = now.strftime('%Y-%m-%d')
-
-    # Definir o diretório de logs baseado na data
-    diretorio_logs = os.path.join('logs', data_atual)
-    os.makedirs(diretorio_logs, exist_ok=True)
-
-    # Definir o caminho do arquivo de log com a data no nome
-    log_file = os.path.join(diretorio_logs, f'rabbitmq_logs_{data_atual}.log')
-
-    # Configurar o logging
-    logging.basicConfig(
-        filename=log_file,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-        level=logging.ERROR
-    )
-
-    # Adicionar handler para console (opcional)
-    console = logging.StreamHandler()
-    console.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    console.setFormatter(formatter)
-    logging.getLogger('').addHandler(console)
-
-class OpenCVWarningMonitor:
-    """
-    Monitor de mensagens de warning do OpenCV para reagir a eventos específicos.
-    """
-    def __init__(self, processor):
-        self.processor = processor
-        self.original_stderr = sys.stderr
-        self.pipe_r, self.pipe_w = os.pipe()
-        self.pipe_reader = os.fdopen(self.pipe_r)
-        sys.stderr = os.fdopen(self.pipe_w, 'w')
-
-        self.stop_event = threading.Event()
-        self.thread = threading.Thread(target=self.monitor)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def monitor(self):
-        while not self.stop_event.is_set():
-            line = self.pipe_reader.readline()
-            if not line:
-                break
-            if "tryIoctl VIDEOIO(V4L2:/dev/video2): select() timeout" in line:
-                print("Aviso detectado: Reconectando dispositivo.")
-                self.processor.handle_disconnection()
-            if "open VIDEOIO(V4L2:/dev/video2): can't open camera by index" in line:
-                print("Aviso detectado: Reconectando dispositivo.")
-                self.processor.handle_disconnection()
-
-    def stop(self):
-        self.stop_event.set()
-        sys.stderr = self.original_stderr
-        self.pipe_reader.close()
+# Tempo máximo aguardando o ArUco de um blister depois que a contagem é decidida, e escala usada na leitura
+ARUCO_TIMEOUT_SECONDS = 5
+ARUCO_ESCALA = float(os.getenv('ARUCO_ESCALA', '0.5'))
+
+# Pasta onde gravar as detecções de cada pedido para replay (replay_contagem.py); vazio desabilita
+CONTAGEM_GRAVAR_SESSOES = os.getenv('CONTAGEM_GRAVAR_SESSOES', '')
+
+# Tempo máximo de cada etapa da recuperação da captura até o primeiro quadro (s)
+RECUPERACAO_TIMEOUT_V4L2 = 2
+RECUPERACAO_TIMEOUT_SCRCPY = 8
+RECUPERACAO_TIMEOUT_ADB = 20
+RECUPERACAO_TIMEOUT_SERVIDOR_ADB = 30
+
+# Etapas do pipeline medidas no histograma gde_etapa_segundos
+ETAPAS_PIPELINE = ('captura', 'preprocessamento', 'predict', 'resultados', 'previa', 'rotacao', 'aruco',
+                   'publicacao', 'ponta_a_ponta')
+
+# Quantidade de slots do buffer circular de quadros (escrita, último publicado e leitura)
+FRAME_BUFFER_SLOTS = int(os.getenv('FRAME_BUFFER_SLOTS', '3'))
+
+# Analisadores executados sobre cada quadro inferido, separados por vírgula: contagem e/ou defeitos
+ANALISADORES = os.getenv('ANALISADORES', 'contagem')
 
 class YOLOProcessor:
     """
     Classe responsável por processar imagens usando o modelo YOLO e interagir com o RabbitMQ.
     """
 
-    def __init__(self):
-        # Variáveis compartilhadas
-        # Inicializa o dicionário e o detector ArUco
-        self.aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
-        self.aruco_parameters = cv2.aruco.DetectorParameters()
-        self.aruco_parameters.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
-        self.aruco_parameters.adaptiveThreshWinSizeMin = 3
-        self.aruco_parameters.adaptiveThreshWinSizeMax = 23
-        self.aruco_parameters.adaptiveThreshWinSizeStep = 10
-        self.aruco_parameters.adaptiveThreshConstant = 9
-        self.aruco_parameters.minMarkerPerimeterRate = 0.03
-        self.aruco_parameters.maxMarkerPerimeterRate = 4.0
-        self.aruco_parameters.minCornerDistanceRate = 0.05
-        self.aruco_parameters.minDistanceToBorder = 3
-        self.aruco_parameters.minMarkerDistanceRate = 0.05
-        self.aruco_parameters.polygonalApproxAccuracyRate = 0.03
-        self.aruco_parameters.errorCorrectionRate = 0.62
-        self.aruco_detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.aruco_parameters)
+    def __init__(self, janela: str = 'GDE EMBALAGEM', video_device: str = VIDEO_DEVICE, ip_oculos: str = IP_OCULOS,
+                 fila_envio: str = QUEUE_SEND, fila_recebimento: str = QUEUE_RECEIVE,
+                 modelos: Optional[RegistroModelos] = None, backend=None,
+                 fonte: Optional[Callable] = None, connection_factory: Optional[Callable] = None,
+                 consumidor: Optional[FilaPedidos] = None, analisadores: Optional[List[Analisador]] = None):
+        """
+        Os parâmetros permitem várias estações no mesmo processo (ver multiestacao.py), cada uma com
+        seu dispositivo de vídeo, óculos e filas, compartilhando o backend e o cache de modelos.
+        `video_device` também pode ser um arquivo de vídeo, reproduzido em loop no lugar da câmera.
+
+        Cada quadro é capturado e inferido uma vez e entregue a todos os `analisadores` (por padrão,
+        os de ANALISADORES): contagem dos pedidos, inspeção de defeitos ou os dois sobre a mesma câmera.
+
+        Para execução offline (ver replay.py): `fonte` abre a captura no lugar da câmera,
+        `connection_factory` substitui a conexão do publicador e `consumidor` a fila de recebimento.
+        """
+        self.janela = janela
+        self.video_device = video_device
+        self.fonte = fonte
+        self.fonte_arquivo = fonte is not None or os.path.isfile(video_device)
+        self.connection_factory = connection_factory
+        self.ip_oculos = ip_oculos
+        self.fila_envio = fila_envio
+        self.fila_recebimento = fila_recebimento
 
+        # Variáveis compartilhadas
+        # A captura só é lida, liberada e reaberta pela thread de captura; as outras threads pedem
+        # (device_connected_event e pedidos_captura)
         self.cap = None
-        self.expected_object: Optional[str] = None
-        self.expected_quantity: Optional[int] = None
-        self.expected_filename: Optional[str] = None
-        self.sent_flag: bool = False
-        self.model: Optional[YOLO] = None
+        self.pedidos_captura: queue.Queue = queue.Queue()
+        # Pedido ativo e modelo atual: objetos imutáveis trocados por atribuição (leitura sem lock por quadro);
+        # os locks só serializam quem escreve
+        self.trabalho: Optional[Trabalho] = None
+        self.trabalho_lock = threading.Lock()
+        # Começa no instante atual em ms, para continuar crescendo entre reinícios do processo
+        self.sequencia_trabalho = itertools.count(int(time.time() * 1000))
+        self.modelo_atual = (None, {}, None)
+        self.preprocessadores: Dict[str, PreprocessadorROI] = {}
         self.model_lock = threading.Lock()
-        self.expected_object_lock = threading.Lock()
-        self.expected_filename_lock = threading.Lock()
-        self.frame_count: int = 0
+        self.backend = backend or criar_backend(YOLO_BACKEND)
+        self.modelos = modelos or RegistroModelos(YOLO_MODEL_BASE_PATH, YOLO_MODEL_CACHE_MB * 1024 * 1024,
+                                                  self.backend.carregar_aquecido)
+
+        # Buffer de quadros compartilhado entre a thread de captura e a de inferência
+        self.frame_buffer = FrameRingBuffer(FRAME_BUFFER_SLOTS)
+        self.latencia_decisao = EstatisticasLatencia()
+        self.latencia_inferencia = EstatisticasLatencia()
+        self.quadros_processados = 0
+
+        # Gravação assíncrona dos quadros de evidência em logs/<data>/
+        self.evidencias = GravadorEvidencias('logs', on_salvo=self.evidencia_salva)
+
+        # Publicadores RabbitMQ persistentes, um por host
+        self.publicadores: Dict[str, PublicadorRabbitMQ] = {}
+        self.publicadores_lock = threading.Lock()
 
         # Flag para indicar se um modelo foi carregado
         self.model_loaded: bool = False
 
+        # Conexão ADB com o óculos, criada em connect_oculos
+        self.dispositivo: Optional[GerenciadorDispositivo] = None
+
+        # Processo do scrcpy supervisionado e, na ingestão direta, o FIFO com o vídeo gravado por ele
+        env_scrcpy = os.environ.copy()
+        env_scrcpy['SCRCPY_SERVER_PATH'] = os.path.abspath("scrcpy-server")
+        self.scrcpy = SupervisorScrcpy(f'scrcpy ({janela})', env=env_scrcpy)
+        self.ingestao_direta = SCRCPY_INGESTAO == 'direta' and not self.fonte_arquivo
+        self.fifo_scrcpy = os.path.join(tempfile.gettempdir(), f'gde_{os.path.basename(video_device)}.mkv')
+
+        # Recuperação da captura, da etapa mais barata para a mais cara
+        self.recuperacao = RecuperacaoEscalonada([
+            ('reabrir_v4l2', self.reabrir_v4l2, RECUPERACAO_TIMEOUT_V4L2),
+            ('reiniciar_scrcpy', self.reiniciar_scrcpy, RECUPERACAO_TIMEOUT_SCRCPY),
+            ('reconectar_adb', self.reconectar_adb, RECUPERACAO_TIMEOUT_ADB),
+            ('reiniciar_servidor_adb', self.reiniciar_servidor_adb, RECUPERACAO_TIMEOUT_SERVIDOR_ADB),
+        ], on_concluida=self.recuperacao_concluida)
+
         # Eventos para sincronização
         self.device_connected_event = threading.Event()
         self.new_message_event = threading.Event()
+        # Livre para ativar o próximo pedido (nenhum item em contagem)
+        self.item_concluido = threading.Event()
+        self.item_concluido.set()
+        self.consumidor: Optional[FilaPedidos] = consumidor
 
         # Configurar logging
         configurar_logging()
 
-        # Iniciar monitoramento de warnings do OpenCV
-        self.opencv_warning_monitor = OpenCVWarningMonitor(self)
+        # Saúde da captura: quadros parados, repetidos ou pretos disparam a reconexão
+        self.saude_captura = MonitorSaudeCaptura(self.falha_captura)
+
+        self.registrar_metricas()
+
+        self.analisadores = analisadores if analisadores is not None else self.criar_analisadores(ANALISADORES)
+        self.mostrar_todas = any(analisador.mostrar_todas for analisador in self.analisadores)
+        self.tempo_analisadores = {
+            analisador.nome: METRICAS.histograma('gde_analisador_segundos', 'Duração de cada analisador por quadro',
+                                                 {'estacao': janela, 'analisador': analisador.nome})
+            for analisador in self.analisadores
+        }
+
+        # Prévia anotada (janela e/ou MJPEG) fora da thread de detecção; None em headless puro
+        self.previa = criar_previa(janela)
+
+    def registrar_metricas(self) -> None:
+        """
+        Métricas da estação no registro do processo (endpoint /metrics com METRICAS_PORTA).
+        """
+        rotulos = {'estacao': self.janela}
+        self.etapas = {etapa: METRICAS.histograma('gde_etapa_segundos', 'Duração de cada etapa do pipeline de detecção',
+                                                  dict(rotulos, etapa=etapa))
+                       for etapa in ETAPAS_PIPELINE}
+        self.tempo_carregamento_modelo = METRICAS.histograma('gde_modelo_carregamento_segundos',
+                                                             'Tempo para obter o modelo (cache ou disco)', rotulos)
+        self.contador_quadros = METRICAS.contador('gde_quadros_processados_total', 'Quadros inferidos', rotulos)
+        self.contador_decisoes = METRICAS.contador('gde_decisoes_total', 'Contagens enviadas', rotulos)
+        METRICAS.contador('gde_quadros_capturados_total', 'Quadros publicados pela captura', rotulos,
+                          funcao=lambda: self.frame_buffer.capturados)
+        METRICAS.contador('gde_quadros_descartados_total', 'Quadros substituídos antes da inferência', rotulos,
+                          funcao=lambda: self.frame_buffer.dropped)
+        METRICAS.contador('gde_reconexoes_total', 'Conexões ADB estabelecidas com o óculos', rotulos,
+                          funcao=lambda: self.dispositivo.conexoes if self.dispositivo else 0)
+        METRICAS.contador('gde_falhas_captura_total', 'Travamentos detectados pelo monitor de saúde', rotulos,
+                          funcao=lambda: self.saude_captura.falhas)
+        METRICAS.contador('gde_scrcpy_reinicios_total', 'Reinícios automáticos do scrcpy', rotulos,
+                          funcao=lambda: self.scrcpy.reinicios)
+        METRICAS.medidor('gde_fila_publicacao', 'Mensagens aguardando envio ao RabbitMQ', rotulos,
+                         funcao=lambda: sum(p.pendentes() for p in list(self.publicadores.values())))
+        METRICAS.medidor('gde_pedidos_previstos', 'Pedidos recebidos aguardando o item atual terminar', rotulos,
+                         funcao=lambda: self.consumidor.pendentes() if self.consumidor else 0)
+        METRICAS.medidor('gde_fila_evidencias', 'Quadros aguardando gravação', rotulos,
+                         funcao=self.evidencias.pendentes)
+        METRICAS.medidor('gde_cache_modelos_bytes', 'Memória estimada dos modelos em cache', rotulos,
+                         funcao=lambda: self.modelos.estatisticas().get('bytes', 0))
+
+    def criar_analisadores(self, nomes: str) -> List[Analisador]:
+        analisadores = []
+        for nome in (n.strip() for n in nomes.split(',') if n.strip()):
+            fabrica = FABRICAS_ANALISADORES.get(nome)
+            if fabrica is None:
+                raise ValueError(f"Analisador desconhecido: {nome}. Opções: {', '.join(FABRICAS_ANALISADORES)}")
+            analisadores.append(fabrica(self))
+        return analisadores
 
     def inicializar_camera(self) -> cv2.VideoCapture:
         """
-        Inicializa a captura de vídeo em /dev/video2.
+        Inicializa a captura de vídeo no dispositivo da estação (por padrão, /dev/video2).
         """
-        cap = cv2.VideoCapture("/dev/video2")
+        cap = self.abrir_captura()
         if not cap.isOpened():
-            logging.error("Não foi possível acessar a câmera em /dev/video2.")
+            logging.error(f"Não foi possível acessar a câmera em {self.video_device}.")
             raise IOError("Falha ao abrir a câmera.")
         return cap
 
-    def log_message(self, ip: str, queue: str, message: Dict, status: str) -> None:
-        try:
-            message_json = json.dumps(message)
-        except TypeError:
-            message_json = str(message)
+    def abrir_captura(self):
+        if self.fonte is not None:
+            return self.fonte()
+        if self.ingestao_direta:
+            return CapturaDireta(self.fifo_scrcpy, FPS)
+        return cv2.VideoCapture(self.video_device)
 
-        log_entry = f"{ip} - {queue} - {message_json} - {status}"
-        logging.info(log_entry)
-        print(f"Log registrado: {log_entry}")
+    def log_message(self, ip: str, queue: str, message: Dict, status: str) -> None:
+        """
+        Registro estruturado (JSON lines, ver registro.py). Só enfileira: a formatação e a escrita
+        acontecem na thread do listener de logging.
+        """
+        dados = dict(message)
+        logging.info('%s - %s - %s - %s', ip, queue, dados, status,
+                     extra={'ip': ip, 'queue': queue, 'status': status, 'dados': dados})
 
     def enviar_mensagem(self, ip: str, queue: str, message: Dict) -> None:
         """
-        Envia uma mensagem para a fila especificada.
+        Enfileira uma mensagem para a fila especificada no publicador persistente do host.
+        O envio acontece em segundo plano; o log "ENVIADA" é registrado após a confirmação do broker.
         """
-        try:
-            credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS)
-            parameters = pika.ConnectionParameters(host=ip, credentials=credentials, heartbeat=600)
-
-            with pika.BlockingConnection(parameters) as connection:
-                channel = connection.channel()
-                channel.queue_declare(queue=queue, durable=True)
-                channel.basic_publish(
-                    exchange='',
-                    routing_key=queue,
-                    body=json.dumps(message),
-                    properties=pika.BasicProperties(delivery_mode=2,)
+        with self.publicadores_lock:
+            publicador = self.publicadores.get(ip)
+            if publicador is None:
+                publicador = PublicadorRabbitMQ(
+                    ip, RABBITMQ_USER, RABBITMQ_PASS,
+                    tamanho_fila=RABBITMQ_OUTBOUND_QUEUE_SIZE,
+                    on_enviada=lambda fila, mensagem: self.log_message(ip, fila, mensagem, "ENVIADA"),
+                    connection_factory=self.connection_factory
                 )
+                self.publicadores[ip] = publicador
 
-            self.log_message(ip, queue, message, "ENVIADA")
-        except AMQPConnectionError as e:
-            logging.error(f"Erro de conexão com o RabbitMQ: {e}")
-        except Exception as e:
-            logging.exception("Erro ao enviar mensagem")
+        if not publicador.publicar(queue, message):
+            self.log_message(ip, queue, message, "DESCARTADA")
 
     def carregar_modelo(self, model_name: str) -> None:
         """
-        Carrega o modelo YOLO especificado.
+        Carrega o modelo YOLO especificado a partir do cache de modelos e o troca atomicamente.
+        O carregamento do disco (em caso de miss) acontece fora do model_lock, então a thread
+        de detecção continua usando o modelo anterior enquanto isso.
         """
-        with self.model_lock:
-            try:
-                model_path = os.path.join(YOLO_MODEL_BASE_PATH, f'{model_name}.pt')
-                print(f"Carregando modelo YOLO de: {model_path}")
-
-                if not os.path.isfile(model_path):
-                    logging.error(f"Arquivo do modelo não encontrado: {model_path}")
-                    print(f"Erro: Arquivo do modelo não encontrado: {model_path}")
-                    self.model_loaded = False
-                    return
+        try:
+            model_path = self.modelos.caminho(model_name)
+            logging.info(f"Carregando modelo YOLO de: {model_path}")
 
-                self.model = YOLO(model_path).to('cuda')
+            if not os.path.isfile(model_path):
+                logging.error(f"Arquivo do modelo não encontrado: {model_path}")
+                self.model_loaded = False
+                return
+
+            with self.tempo_carregamento_modelo.medir():
+                model = self.modelos.obter(model_name)
+            class_ids = ids_das_classes(model.names)
+            preprocessador = self.obter_preprocessador(model_name, model_path)
+            with self.model_lock:
+                self.modelo_atual = (model, class_ids, preprocessador)
                 self.model_loaded = True
-                print("Modelo YOLO carregado com sucesso.")
+            logging.info("Modelo YOLO carregado com sucesso.")
 
-                self.log_message(RABBITMQ_HOST, 'YOLO', {'model': model_name}, "MODELO_CARREGADO")
-            except Exception as e:
-                logging.exception("Erro ao carregar modelo")
-                self.model_loaded = False
+            self.log_message(RABBITMQ_HOST, 'YOLO', {'model': model_name, 'backend': self.backend.nome,
+                                                     'cache': self.modelos.estatisticas()},
+                             "MODELO_CARREGADO")
+        except Exception as e:
+            logging.exception("Erro ao carregar modelo")
+            self.model_loaded = False
 
-    def receber_mensagens(self) -> None:
+    def obter_preprocessador(self, model_name: str, model_path: str) -> PreprocessadorROI:
         """
-        Recebe mensagens da fila de recebimento e atualiza o objeto esperado e o modelo.
+        Retorna o pré-processador (ROI e resolução de entrada) do modelo, mantendo a ROI aprendida entre trocas.
+        A configuração por modelo vem do JSON ao lado do .pt; na ausência, usa YOLO_IMG_SIZE, ROI e ROI_AUTO.
         """
-        try:
-            credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS)
-            parameters = pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials, heartbeat=600)
+        preprocessador = self.preprocessadores.get(model_name)
+        if preprocessador is None:
+            config = ler_configuracao_modelo(model_path)
+            roi = config.get('roi') or ler_roi(ROI)
+            preprocessador = PreprocessadorROI(int(config.get('imgsz', YOLO_IMG_SIZE)), roi,
+                                               bool(config.get('roi_auto', ROI_AUTO)))
+            self.preprocessadores[model_name] = preprocessador
+        return preprocessador
+
+    def receber_mensagens(self) -> None:
+        """
+        Ativa os pedidos da fila de recebimento, um de cada vez e na ordem de chegada.
 
-            connection = pika.BlockingConnection(parameters)
-            channel = connection.channel()
-            channel.queue_declare(queue=QUEUE_RECEIVE, durable=True)
-            channel.basic_qos(prefetch_count=1)
+        O consumidor assíncrono (consumidor.py) lê adiante até MODEL_PRELOAD_PREFETCH pedidos e
+        pré-carrega os seus modelos enquanto o item atual é contado; o objeto esperado só muda
+        quando o item atual termina (`item_concluido`), com o modelo do próximo já em memória.
+        """
+        if self.consumidor is None:
+            self.consumidor = ConsumidorPedidos(RABBITMQ_HOST, RABBITMQ_USER, RABBITMQ_PASS, self.fila_recebimento,
+                                                MODEL_PRELOAD_PREFETCH, on_previsto=self.modelos.preload)
+        while True:
+            self.item_concluido.wait()
+            pedido = self.consumidor.obter()
+            if pedido is None:
+                # Consumidor encerrado
+                return
+            try:
+                self.ativar_pedido(pedido)
+            except Exception:
+                logging.exception("Erro ao processar mensagem recebida")
+            finally:
+                self.consumidor.confirmar(pedido)
 
-            print(' [*] Aguardando mensagens na fila_recebimento. Para sair, pressione CTRL+C')
+    def ativar_pedido(self, pedido: Pedido) -> None:
+        """
+        Troca o modelo (se o pedido indicar um) e só então o objeto esperado.
+        """
+        logging.debug(pedido.mensagem)
+        self.log_message(RABBITMQ_HOST, self.fila_recebimento, pedido.mensagem, "RECEBIDA")
+
+        if pedido.modelo:
+            self.carregar_modelo(pedido.modelo)
+            if not self.model_loaded:
+                logging.error(f"Pedido {pedido.item_id} ignorado: modelo {pedido.modelo} não carregado.")
+                return
+        elif not self.model_loaded:
+            logging.error("Primeira mensagem sem especificação de modelo. Modelo é obrigatório.")
+            return
+        else:
+            logging.info("Mensagem sem modelo. Usando modelo anterior.")
+
+        self.item_concluido.clear()
+        trabalho = Trabalho(next(self.sequencia_trabalho), pedido.item_id, pedido.quantidade, pedido.arquivo,
+                            pedido.modelo)
+        with self.trabalho_lock:
+            self.trabalho = trabalho
+        self.new_message_event.set()
+        if not any(analisador.conclui(trabalho) for analisador in self.analisadores):
+            # Nenhum analisador publica resultado deste pedido: libera o próximo já
+            logging.info(f"Pedido {pedido.item_id} sem contagem. Inspeção segue até o próximo pedido.")
+            self.item_concluido.set()
+
+    def capturar_quadros(self) -> None:
+        """
+        Thread dedicada à captura: lê /dev/video2 continuamente e mantém apenas o quadro mais recente
+        no buffer circular, evitando que quadros se acumulem no driver enquanto a inferência roda.
+        """
+        cap_vigiada = None
+        while True:
+            if not self.device_connected_event.is_set():
+                # Desconectado (liberar_captura): a captura é liberada aqui, nunca durante um cap.read
+                self.saude_captura.desarmar()
+                cap_vigiada = None
+                if self.cap is not None:
+                    self.cap.release()
+                    self.cap = None
+                try:
+                    limite, resposta = self.pedidos_captura.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                resposta.put(self.reabrir_captura(limite))
+                continue
 
-            def callback(ch, method, properties, body):
+            if self.cap is None:
                 try:
-                    print(body)
-                    mensagem = json.loads(body.decode())
-                        item_id = mensagem.get('itemId').lower()
-                    quantity = mensagem.get('quantity')
-                    model_name = mensagem.get('model')  # Campo opcional
-                    filename = mensagem.get('fileName')  # Campo opcional
-
-                    if isinstance(item_id, str) and isinstance(quantity, int):
-                        print(f" [x] Recebido itemId: {item_id}, quantity: {quantity}")
-
-                        with self.expected_object_lock:
-                            self.expected_object = item_id
-                            self.expected_quantity = quantity
-                            self.expected_filename = filename
-                            self.sent_flag = False
-                        self.log_message(RABBITMQ_HOST, QUEUE_RECEIVE, mensagem, "RECEBIDA")
-
-                        if model_name:
-                            self.carregar_modelo(model_name)
-                            if self.model_loaded:
-                                self.new_message_event.set()
-                        else:
-                            if not self.model_loaded:
-                                logging.error("Primeira mensagem sem especificação de modelo. Modelo é obrigatório.")
-                                print("Erro: Primeira mensagem sem especificação de modelo. Modelo é obrigatório.")
-                                ch.basic_ack(delivery_tag=method.delivery_tag)
-                                return
-                            else:
-                                logging.info("Mensagem sem modelo. Usando modelo anterior.")
-                                self.new_message_event.set()
-
-                        ch.basic_ack(delivery_tag=method.delivery_tag)
-                    else:
-                        logging.error("Dados inválidos recebidos na mensagem.")
-                        ch.basic_ack(delivery_tag=method.delivery_tag)
-                except json.JSONDecodeError:
-                    logging.error("Mensagem recebida não é um JSON válido.")
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
-                except Exception as e:
-                    logging.exception("Erro ao processar mensagem recebida")
-                    # ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-
-            channel.basic_consume(queue=QUEUE_RECEIVE, on_message_callback=callback, auto_ack=False)
-            channel.start_consuming()
-
-        except AMQPConnectionError as e:
-            logging.error(f"Erro de conexão com o RabbitMQ: {e}")
-        except Exception as e:
-            logging.exception("Erro ao receber mensagens")
+                    self.cap = self.inicializar_camera()
+                except IOError:
+                    logging.error("Não foi possível inicializar a câmera.")
+                    self.device_connected_event.clear()
+                    continue
+
+            cap = self.cap
+            if cap is not cap_vigiada and not self.fonte_arquivo:
+                # Câmera (re)aberta: o prazo de travamento começa a contar agora
+                self.saude_captura.armar()
+                cap_vigiada = cap
+            indice = self.frame_buffer.slot_escrita()
+            self.saude_captura.inicio_leitura()
+            inicio = time.perf_counter()
+            ret, frame = cap.read(self.frame_buffer.buffer(indice))
+            timestamp = time.monotonic()
+            self.etapas['captura'].observar(time.perf_counter() - inicio)
+            valido = self.saude_captura.registrar(ret, frame)
+            if not ret:
+                if self.fonte_arquivo:
+                    # Arquivo de vídeo no lugar da câmera: volta ao início
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                logging.error("Falha ao capturar o quadro.")
+                time.sleep(0.01)
+                continue
+            if not valido and not self.fonte_arquivo:
+                # Quadro repetido ou preto: não há nada novo para inferir
+                continue
+
+            self.frame_buffer.publicar(indice, frame, timestamp)
+
+            if self.fonte_arquivo and self.fonte is None:
+                # Mantém o ritmo do vídeo, como uma câmera real
+                time.sleep(1.0 / (cap.get(cv2.CAP_PROP_FPS) or FPS))
+
+    def registrar_decisao(self, quadro: Quadro) -> None:
+        """
+        Registra a latência entre a captura do quadro e a decisão de contagem.
+        """
+        latencia = time.monotonic() - quadro.timestamp
+        self.latencia_decisao.registrar(latencia)
+        self.log_message(RABBITMQ_HOST, 'YOLO', {
+            'latencia_ms': round(latencia * 1000.0, 1),
+            'latencia': self.latencia_decisao.resumo(),
+            'quadros_capturados': self.frame_buffer.capturados,
+            'quadros_descartados': self.frame_buffer.dropped
+        }, "DECISAO")
+
+    def concluir_contagem(self, trabalho: Trabalho, quadro: Quadro, mensagem: Dict) -> None:
+        """
+        Marca o pedido como enviado e publica o resultado, com o `seq` do pedido.
+        """
+        with self.trabalho_lock:
+            # Só marca se o pedido ainda for o ativo (nunca sobrescreve um pedido mais novo)
+            if self.trabalho is trabalho:
+                self.trabalho = trabalho._replace(enviado=True)
+        mensagem['seq'] = trabalho.seq
+
+        self.registrar_decisao(quadro)
+        self.contador_decisoes.incrementar()
+        with self.etapas['publicacao'].medir():
+            self.enviar_mensagem(RABBITMQ_HOST, self.fila_envio, mensagem)
+        logging.info("Análise completa. Aguardando novo item.")
+        self.new_message_event.clear()
+        self.item_concluido.set()
+
+    def estado_modelo(self):
+        """
+        Retorna, de forma consistente e sem lock, o modelo atual, o mapa rótulo → id e o pré-processador.
+        """
+        return self.modelo_atual
 
     def processar_imagem(self) -> None:
         """
-        Captura vídeo, detecta objetos usando YOLO e envia mensagens quando a contagem esperada é alcançada.
+        Detecta objetos usando YOLO sempre no quadro mais recente do buffer e envia mensagens
+        quando a contagem esperada é alcançada.
         """
         try:
-            default_image = np.zeros((480, 640, 3), dtype=np.uint8)
-
-            while True:
+            while not SAIR.is_set():
                 # Verifica se a câmera está conectada
                 if self.device_connected_event.is_set():
-                    if self.cap is None:
-                        try:
-                            self.cap = self.inicializar_camera()
-                        except IOError:
-                            logging.error("Não foi possível inicializar a câmera.")
-                            self.device_connected_event.clear()
-                            continue
-
-                    ret, frame = self.cap.read()
-                    if not ret:
-                        logging.error("Falha ao capturar o quadro. Usando imagem padrão.")
-                        frame = default_image.copy()
+                    quadro = self.frame_buffer.ler_mais_recente(timeout=0.5)
+                    if quadro is None:
+                        logging.error("Nenhum quadro novo recebido da captura.")
+                        continue
+
+                    current_model, current_class_ids, current_preprocessador = self.estado_modelo()
+
+                    # Só processa se o modelo estiver carregado
+                    if current_model is not None:
+                        # Recorte da ROI, redimensionamento e rotação em um único passo para a entrada do modelo
+                        inicio = time.perf_counter()
+                        entrada = current_preprocessador.preparar(quadro.frame)
+                        preparado = time.perf_counter()
+                        results = self.backend.predict(current_model, entrada, conf=0.70,
+                                                       imgsz=current_preprocessador.imgsz)
+                        self.etapas['preprocessamento'].observar(preparado - inicio)
+                        self.etapas['predict'].observar(time.perf_counter() - preparado)
+                        if not self.avaliar_resultados(quadro, results, current_model, current_class_ids,
+                                                       current_preprocessador):
+                            break
                     else:
-                        # Rotaciona 180 graus, caso seja necessário
-                        frame = cv2.rotate(frame, cv2.ROTATE_180)
-
-                        with self.model_lock:
-                            current_model = self.model
-
-                        # Só processa se o modelo estiver carregado
-                        if current_model is not None:
-                            results = current_model.predict(source=frame, conf=0.70, verbose=False, device='cuda')
-                            detections = self.processar_resultados(results, current_model)
-
-                            with self.expected_object_lock:
-                                current_expected_object = self.expected_object
-                                current_expected_quantity = self.expected_quantity
-                                current_expected_filename = self.expected_filename
-                                current_sent_flag = self.sent_flag
-
-                            # Desenha no frame
-                            if current_expected_object:
-                                deteccoes_esperadas = [d for d in detections if d['label'] == current_expected_object]
-                            else:
-                                deteccoes_esperadas = []
-
-                            for d in deteccoes_esperadas:
-                                label = d['label']
-                                confidence = d['confidence']
-                                x1, y1, x2, y2 = map(int, d['bbox'])
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                                cv2.putText(frame, f'{label} {confidence:.2f}',
-                                            (x1, y1 - 10),
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-                            cv2.imshow('GDE EMBALAGEM', frame)
-                            if cv2.waitKey(1) & 0xFF == ord('q'):
-                                break
-
-                            # Verifica contagem
-                            if current_expected_object and current_expected_quantity and not current_sent_flag:
-                                detected_count = len(deteccoes_esperadas)
-                                print(f"Objeto esperado (itemId: {current_expected_object}) detectado {detected_count} vezes.")
-
-                                if detected_count == current_expected_quantity:
-                                    mensagem = {
-                                        'itemId': current_expected_object.upper(),
-                                        'count': detected_count
-                                    }
-
-                                    # Se tiver 'blister' no nome, tenta ler o ArUco
-                                    if 'blister' in current_expected_object.lower():
-                                        start_time = time.time()
-                                        id_marker = None
-                                        while time.time() - start_time < 5:
-                                            ret2, frame2 = self.cap.read()
-                                            if not ret2:
-                                                logging.error("Falha ao capturar quadro ao procurar ArUco.")
-                                                continue
-
-                                            frame2 = cv2.rotate(frame2, cv2.ROTATE_180)
-
-                                            corners, ids, rejected = self.aruco_detector.detectMarkers(frame2)
-                                            if ids is not None and len(ids) > 0:
-                                                cv2.aruco.drawDetectedMarkers(frame2, corners, ids)
-                                                id_marker = int(ids[0][0])
-                                                print('Código decimal do ArUco:', id_marker)
-                                                cv2.imshow('GDE EMBALAGEM', frame2)
-                                                cv2.waitKey(1)
-                                                time.sleep(1)
-                                                break
-                                            else:
-                                                cv2.imshow('GDE EMBALAGEM', frame2)
-                                                if cv2.waitKey(1) & 0xFF == ord('q'):
-                                                    break
-                                            time.sleep(0.05)
-
-                                        if id_marker is not None:
-                                            mensagem['code'] = str(id_marker)
-                                        else:
-                                            print("Nenhum ArUco detectado após 5 segundos.")
-
-                                    if current_expected_filename is not None:
-                                        self.salvar_frame_com_desenho(current_expected_filename, frame,
-                                                                      detections, current_expected_object)
-
-                                    self.frame_count = 0
-                                    with self.expected_object_lock:
-                                        self.sent_flag = True
-
-                                    time.sleep(0.3)
-                                    self.enviar_mensagem(RABBITMQ_HOST, QUEUE_SEND, mensagem)
-                                    print("Análise completa. Aguardando novo item.")
-                                    self.new_message_event.clear()
-                                else:
-                                    self.frame_count += 1
-                                    if self.frame_count >= PROCESSING_LIMIT_FRAMES and not current_sent_flag:
-                                        mensagem = {
-                                            'itemId': current_expected_object.upper(),
-                                            'count': detected_count
-                                        }
-                                        # Caso especial para 'CAIXA 520X320X170 TRIPLEX'
-                                        if current_expected_object.upper() == 'CAIXA 520X320X170 TRIPLEX':
-                                            mensagem['count'] = 1
-
-                                        self.frame_count = 0
-                                        with self.expected_object_lock:
-                                            self.sent_flag = True
-
-                                        time.sleep(0.3)
-                                        self.enviar_mensagem(RABBITMQ_HOST, QUEUE_SEND, mensagem)
-                                        print("Análise completa. Aguardando novo item.")
-                                        self.new_message_event.clear()
-                        else:
-                            logging.warning("Modelo não carregado. Aguardando...")
-                            self.new_message_event.clear()
-                            if cv2.waitKey(1) & 0xFF == ord('q'):
-                                break
+                        logging.warning("Modelo não carregado. Aguardando...")
+                        self.new_message_event.clear()
+                        time.sleep(0.01)
                 else:
                     # Se não estiver conectado, mostra tela padrão
-                    frame = default_image.copy()
-                    cv2.putText(frame, 'INICIANDO....',
-                                (50, default_image.shape[0] // 2),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                    cv2.imshow('GDE EMBALAGEM', frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
-                    if self.cap:
-                        self.cap.release()
-                        self.cap = None
-
-                time.sleep(0.01)
+                    self.frame_buffer.limpar()
+                    if self.previa is not None:
+                        self.previa.mensagem('INICIANDO....')
+                    time.sleep(0.01)
 
-            cv2.destroyAllWindows()
+            if self.previa is not None:
+                self.previa.fechar()
 
         except Exception as e:
             logging.exception("Erro ao processar imagem")
 
-    def processar_resultados(self, results, current_model) -> List[Dict]:
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                cls = int(box.cls[0])
-                label = current_model.names[cls]
-                confidence = float(box.conf[0])
-                bbox = box.xyxy[0].tolist()
-                detections.append({
-                    'label': label,
-                    'cls': cls,
-                    'confidence': confidence,
-                    'bbox': bbox
-                })
+    def avaliar_resultados(self, quadro: Quadro, results, current_model, current_class_ids: Dict[str, int],
+                           current_preprocessador: PreprocessadorROI) -> bool:
+        """
+        Converte as detecções de um quadro já inferido, oferece a prévia e entrega o quadro aos analisadores.
+        Retorna False se o operador pediu para sair ('q').
+        """
+        etapas = self.etapas
+        inicio = time.perf_counter()
+        detections = self.processar_resultados(results, current_model, current_preprocessador)
+        self.quadros_processados += 1
+        self.contador_quadros.incrementar()
+        self.latencia_inferencia.registrar(time.monotonic() - quadro.timestamp)
+        altura, largura = quadro.frame.shape[:2]
+        current_preprocessador.aprender(detections.xyxy, largura, altura)
+
+        etapas['resultados'].observar(time.perf_counter() - inicio)
+
+        # Uma única leitura da referência: todos os campos vêm do mesmo pedido
+        trabalho = self.trabalho
+        item_esperado = trabalho.item_id if trabalho is not None else None
+        contexto = Contexto(trabalho, current_class_ids, item_esperado,
+                            current_class_ids.get(item_esperado) if item_esperado is not None else None)
+
+        # Desenho e janela ficam na thread da prévia (miniatura a PREVIA_FPS); em headless, nada é desenhado
+        if self.previa is not None:
+            inicio = time.perf_counter()
+            self.previa.oferecer(quadro.frame, detections if self.mostrar_todas
+                                 else detections.da_classe(contexto.cls_esperada))
+            etapas['previa'].observar(time.perf_counter() - inicio)
+        etapas['ponta_a_ponta'].observar(time.monotonic() - quadro.timestamp)
+        if SAIR.is_set():
+            return False
+
+        for analisador in self.analisadores:
+            try:
+                with self.tempo_analisadores[analisador.nome].medir():
+                    analisador.analisar(quadro, detections, contexto)
+            except Exception:
+                logging.exception(f"Erro no analisador {analisador.nome}")
+        return True
+
+    def processar_resultados(self, results, current_model,
+                             preprocessador: Optional[PreprocessadorROI] = None) -> Deteccoes:
+        """
+        Converte os resultados do YOLO em detecções colunares (uma transferência por quadro),
+        com as caixas em coordenadas do quadro rotacionado completo.
+        """
+        detections = Deteccoes.de_resultados(results, current_model.names)
+        if preprocessador is not None:
+            detections.xyxy = preprocessador.para_quadro(detections.xyxy)
         return detections
 
-    def salvar_frame_com_desenho(self, current_filename, frame, detections: List[Dict], expected_object_id: str) -> None:
-        try:
-            frame_com_desenho = frame.copy()
-            deteccoes_esperadas = [d for d in detections if d['label'] == expected_object_id]
-
-            for d in deteccoes_esperadas:
-                label = d['label']
-                confidence = d['confidence']
-                bbox = d['bbox']
-                x1, y1, x2, y2 = map(int, bbox)
-                cv2.rectangle(frame_com_desenho, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame_com_desenho, f'{label} {confidence:.2f}', (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-            self.salvar_frame(current_filename, frame_com_desenho)
-        except Exception as e:
-            logging.exception("Erro ao desenhar e salvar frame")
-
-    def salvar_frame(self, current_filename, frame) -> None:
-        try:
-            now = datetime.now()
-            data_atual = now.strftime('%Y-%m-%d')
-            timestamp = now.strftime('%Y-%m-%d_%H-%M-%S')
+    def desenhar_deteccoes(self, frame, deteccoes: Deteccoes) -> None:
+        desenhar_deteccoes(frame, deteccoes)
 
-            diretorio_logs = os.path.join('logs', data_atual)
-            os.makedirs(diretorio_logs, exist_ok=True)
+    def salvar_frame_com_desenho(self, current_filename, frame, deteccoes_esperadas: Deteccoes) -> None:
+        """
+        Enfileira o quadro para ser desenhado e salvo pelo gravador de evidências, fora da thread de detecção.
+        O quadro passa a pertencer ao gravador; quem chama não deve reutilizá-lo.
+        """
+        self.evidencias.salvar(current_filename, frame,
+                               lambda f: self.desenhar_deteccoes(f, deteccoes_esperadas))
 
-            nome_arquivo = f'{current_filename}.jpg'
-            caminho_arquivo = os.path.join(diretorio_logs, nome_arquivo)
+    def salvar_frame(self, current_filename, frame) -> None:
+        self.evidencias.salvar(current_filename, frame, copiar=True)
 
-            cv2.imwrite(caminho_arquivo, frame)
-            print(f"Frame salvo em: {caminho_arquivo}")
-            self.log_message(RABBITMQ_HOST, 'SALVAR_FRAME', {'file': nome_arquivo}, "SALVO")
-        except Exception as e:
-            logging.exception("Erro ao salvar frame")
+    def evidencia_salva(self, nome_arquivo: str, caminho_arquivo: str) -> None:
+        self.log_message(RABBITMQ_HOST, 'SALVAR_FRAME', {'file': nome_arquivo, 'path': caminho_arquivo}, "SALVO")
 
-    def is_device_connected(self, ip_address):
+    def connect_oculos(self):
         """
-        Verifica via 'adb devices' se o dispositivo está conectado como 'device'.
+        Mantém a conexão com o dispositivo (ver dispositivo.py).
+        Ao conectar, inicia scrcpy + camera; ao desconectar, libera a captura.
         """
-        result = subprocess.run(["adb", "devices"], capture_output=True, text=True)
-        devices_output = result.stdout.strip().splitlines()
-        for line in devices_output[1:]:
-            if '\t' in line:
-                device, status = line.strip().split('\t')
-                if status == 'device':
-                    return True
-                elif status == 'offline':
-                    subprocess.run(["adb", "disconnect", ip_address],
-                                   stdout=subprocess.DEVNULL,
-                                   stderr=subprocess.DEVNULL)
-        return False
-
-    def try_connect(self, port):
+        self.dispositivo = GerenciadorDispositivo(self.ip_oculos,
+                                                  on_conectado=self.dispositivo_conectado,
+                                                  on_desconectado=self.dispositivo_desconectado)
+        self.dispositivo.executar()
+
+    def dispositivo_conectado(self):
+        self.log_message(self.ip_oculos, 'ADB', self.dispositivo.estatisticas(), "CONECTADO")
+        if not self.reiniciar_scrcpy(RECUPERACAO_TIMEOUT_SCRCPY):
+            logging.error("Nenhum quadro recebido do scrcpy após a conexão.")
+            # Fora da thread do GerenciadorDispositivo, que precisa continuar livre para reconectar
+            threading.Thread(target=self.handle_disconnection, daemon=True).start()
+
+    def dispositivo_desconectado(self):
+        self.liberar_captura()
+        self.parar_scrcpy()
+
+    def liberar_captura(self):
         """
-        Tenta conectar ao óculos em determinada porta.
+        Pede à thread de captura que libere o dispositivo de vídeo assim que o `cap.read` atual retornar.
         """
-        subprocess.run(["adb", "connect", f"{IP_OCULOS}:{port}"],
-                       stdout=subprocess.DEVNULL,
-                       stderr=subprocess.DEVNULL,
-                       timeout=2)
+        self.device_connected_event.clear()
 
-    def connect(self):
+    def aguardar_captura(self, timeout: float) -> bool:
         """
-        Verifica as portas abertas com nmap e tenta conectar via adb.
+        Pede à thread de captura que reabra o dispositivo de vídeo e espera o primeiro quadro
+        (em vez de uma espera fixa). Retorna False se não chegou em `timeout`.
         """
-        ret = subprocess.run(["nmap", "-p", "37000-44000", IP_OCULOS],
-                             capture_output=True, text=True)
-        outputs = ret.stdout.strip().split("\n")
-        for line in outputs:
-            if "/tcp" in line and "open" in line:
-                port = line.split("/")[0].strip()
-                if port.isdigit():
-                    print(f"Tentando conectar na porta {port}")
-                    self.try_connect(port)
+        limite = time.monotonic() + timeout
+        resposta: queue.Queue = queue.Queue(maxsize=1)
+        self.pedidos_captura.put((limite, resposta))
+        try:
+            # Folga para a thread de captura sair de uma leitura bloqueada (CAPTURA_TIMEOUT_LEITURA_MS)
+            return resposta.get(timeout=timeout + CAPTURA_TIMEOUT_LEITURA_MS / 1000.0)
+        except queue.Empty:
+            logging.warning("A thread de captura não atendeu o pedido de reabertura a tempo.")
+            return False
 
-    def connect_oculos(self):
+    def reabrir_captura(self, limite: float) -> bool:
         """
-        Loop para manter a conexão com o dispositivo.
-        Se conectado, inicia scrcpy + camera.
+        Executado na thread de captura: abre o dispositivo e espera o primeiro quadro até `limite`.
         """
-        previous_connected_state = False
-        while True:
-            connected = self.is_device_connected(IP_OCULOS)
-
-            if connected and not previous_connected_state:
-                print("Dispositivo conectado!")
-                self.start_camera()
-                # Aguarda alguns segundos para o scrcpy criar o /dev/video2
-                time.sleep(5)
-
-                try:
-                    self.cap = self.inicializar_camera()
-                    self.device_connected_event.set()
-                except IOError:
-                    self.device_connected_event.clear()
-
-            elif not connected and previous_connected_state:
-                print("Dispositivo desconectado!")
-                self.handle_disconnection()
-
-            previous_connected_state = connected
-
-            if not connected:
-                print("Tentando conectar no óculos...")
-                self.connect()
-
-            time.sleep(1)
-
-    def restart_adb_server(self):
+        timeout = limite - time.monotonic()
+        if timeout <= 0:
+            # Quem pediu já desistiu
+            return False
+        cap = aguardar_primeiro_quadro(self.video_device, timeout, FPS,
+                                       abrir=self.abrir_captura if self.ingestao_direta else None)
+        if cap is None:
+            return False
+        self.cap = cap
+        self.device_connected_event.set()
+        return True
+
+    def reabrir_v4l2(self, timeout: float) -> bool:
+        self.liberar_captura()
+        return self.aguardar_captura(timeout)
+
+    def reiniciar_scrcpy(self, timeout: float) -> bool:
+        self.liberar_captura()
+        self.parar_scrcpy()
+        self.start_camera()
+        return self.aguardar_captura(timeout)
+
+    def reconectar_adb(self, timeout: float) -> bool:
         """
-        Reinicia o servidor adb.
+        Derruba a conexão ADB; o GerenciadorDispositivo reconecta e reinicia o scrcpy.
         """
-        result = subprocess.run(["adb", "kill.py-server"], capture_output=True)
-        if result.returncode == 0:
-            print("Servidor ADB finalizado com sucesso.")
-        else:
-            print("Aviso: Não foi possível finalizar o servidor ADB. Talvez não estivesse em execução.")
-
-        result = subprocess.run(["adb", "start-server"], capture_output=True)
-        if result.returncode == 0:
-            print("Servidor ADB iniciado com sucesso.")
-        else:
-            print("Erro: Não foi possível iniciar o servidor ADB.")
-            exit(1)
+        if self.dispositivo is None:
+            return False
+        self.dispositivo_desconectado()
+        self.dispositivo.reconectar()
+        return self.device_connected_event.wait(timeout)
+
+    def reiniciar_servidor_adb(self, timeout: float) -> bool:
+        if self.dispositivo is None:
+            return False
+        self.dispositivo_desconectado()
+        reiniciar_servidor_adb()
+        return self.device_connected_event.wait(timeout)
+
+    def recuperacao_concluida(self, etapa: Optional[str], total: float, duracoes: Dict[str, float]) -> None:
+        self.log_message(self.ip_oculos, 'CAPTURA', {
+            'etapa': etapa,
+            'tempo_s': round(total, 3),
+            'etapas': duracoes,
+            'mttr': self.recuperacao.tempo_total.resumo()
+        }, "RECUPERADA" if etapa else "FALHA_RECUPERACAO")
 
     def configure_v4l2loopback(self):
         """
@@ -589,84 +688,248 @@ class YOLOProcessor:
         try:
             result = subprocess.run(["lsmod"], capture_output=True, text=True)
             if "v4l2loopback" in result.stdout:
-                print("v4l2loopback já está carregado.")
+                logging.info("v4l2loopback já está carregado.")
             else:
-                print("Carregando v4l2loopback...")
+                logging.info("Carregando v4l2loopback...")
                 result = subprocess.run(["sudo", "modprobe", "v4l2loopback", "exclusive_caps=1"])
                 if result.returncode != 0:
-                    print("Erro ao configurar v4l2loopback.")
+                    logging.error("Erro ao configurar v4l2loopback.")
                 else:
-                    print("v4l2loopback configurado com sucesso.")
+                    logging.info("v4l2loopback configurado com sucesso.")
         except Exception as e:
-            print(f"Erro ao configurar v4l2loopback: {e}")
+            logging.error(f"Erro ao configurar v4l2loopback: {e}")
 
     def start_camera(self):
         """
-        Inicia o scrcpy direcionando a saída de vídeo para /dev/video2.
+        Inicia o scrcpy (via supervisor) direcionando o vídeo para o dispositivo da estação (/dev/video2)
+        ou, com SCRCPY_INGESTAO=direta, para o FIFO lido por CapturaDireta.
         """
         if not os.path.isfile("scrcpy-server"):
-            print("Arquivo 'scrcpy-server' não encontrado (dependendo da versão do scrcpy, isso pode ser opcional).")
+            logging.warning("Arquivo 'scrcpy-server' não encontrado (dependendo da versão do scrcpy, isso pode ser opcional).")
 
-        self.configure_v4l2loopback()
+        if self.ingestao_direta:
+            destino = [f"--record={criar_fifo(self.fifo_scrcpy)}", "--record-format=mkv", "--no-playback"]
+        else:
+            self.configure_v4l2loopback()
 
-        # Só para debug, verificar se /dev/video2 existe após v4l2loopback
-        result = subprocess.run(["v4l2-ctl", "--list-devices"], capture_output=True, text=True)
-        print(result.stdout)
+            # Só para debug, verificar se /dev/video2 existe após v4l2loopback
+            result = subprocess.run(["v4l2-ctl", "--list-devices"], capture_output=True, text=True)
+            logging.debug(result.stdout)
+            destino = [f"--v4l2-sink={self.video_device}"]
 
         try:
-            env = os.environ.copy()
-            env['SCRCPY_SERVER_PATH'] = os.path.abspath("scrcpy-server")
-
-            subprocess.Popen(
-                [
-                    "scrcpy",
-                    "--video-source=camera",
-                    "--camera-facing=back",
-                    "--camera-size=1920x1080",
-                    "--v4l2-sink=/dev/video2",
-                    "--no-audio",
-                    "--no-window",
-                    "-e"
-                ],
-                env=env
-            )
-            print("Iniciando captura de vídeo (scrcpy) com parâmetros ajustados...")
+            self.scrcpy.iniciar([
+                "--video-source=camera",
+                "--camera-facing=back",
+                f"--camera-size={SCRCPY_CAMERA_SIZE}",
+                *destino,
+                "--no-audio",
+                "--no-window",
+                f"--serial={self.dispositivo.serial}" if self.dispositivo and self.dispositivo.serial else "-e"
+            ])
+            logging.info("Iniciando captura de vídeo (scrcpy) com parâmetros ajustados...")
         except Exception as e:
-            print(f"Erro ao iniciar a câmera via scrcpy: {e}")
+            logging.error(f"Erro ao iniciar a câmera via scrcpy: {e}")
+
+    def parar_scrcpy(self):
+        self.scrcpy.parar()
+
+    def falha_captura(self, motivo: str) -> None:
+        """
+        Chamado pelo monitor de saúde quando a captura trava, repete ou escurece além dos limites.
+        """
+        self.log_message(self.ip_oculos, 'CAPTURA', {'motivo': motivo, **self.saude_captura.estatisticas()}, "TRAVADA")
+        # O monitor só sinaliza: a recuperação roda em outra thread e a captura é liberada pela sua própria
+        threading.Thread(target=self.handle_disconnection, name='recuperacao', daemon=True).start()
 
     def handle_disconnection(self):
         """
-        Trata desconexão do dispositivo.
+        Trata falha da captura com recuperação escalonada: reabrir o v4l2, reiniciar o scrcpy,
+        reconectar o ADB e, por último, reiniciar o servidor ADB.
         """
-        self.device_connected_event.clear()
-        self.restart_adb_server()
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        self.recuperacao.recuperar()
+
+    def iniciar_threads(self, processar: bool = True) -> List[threading.Thread]:
+        """
+        Inicia as threads de conexão, recebimento de mensagens, captura e (opcionalmente) processamento.
+        Com um arquivo de vídeo como fonte, não há óculos para conectar.
+        """
+        alvos = [self.receber_mensagens, self.capturar_quadros]
+        if processar:
+            alvos.append(self.processar_imagem)
+        if self.fonte_arquivo:
+            self.device_connected_event.set()
+        else:
+            alvos.insert(0, self.connect_oculos)
+
+        threads = [threading.Thread(target=alvo, daemon=True) for alvo in alvos]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def encerrar(self) -> None:
+        self.device_connected_event.set()
+        self.new_message_event.set()
+        self.item_concluido.set()
+        if self.consumidor is not None:
+            self.consumidor.parar()
+        self.saude_captura.desarmar()
+        self.recuperacao.parar()
+        self.parar_scrcpy()
+        for analisador in self.analisadores:
+            analisador.encerrar()
+        for publicador in self.publicadores.values():
+            publicador.parar()
 
     def run(self) -> None:
         """
         Inicia as threads de recebimento de mensagens e processamento de imagens.
         """
-        thread_receber = threading.Thread(target=self.receber_mensagens, daemon=True)
-        thread_processar = threading.Thread(target=self.processar_imagem, daemon=True)
-        thread_conectar = threading.Thread(target=self.connect_oculos, daemon=True)
-
-        thread_conectar.start()
-        thread_receber.start()
-        thread_processar.start()
+        threads = self.iniciar_threads()
+        iniciar_servidor_metricas()
 
+        # SIGTERM (ex.: stop_core_back) encerra como o Ctrl+C, parando o scrcpy supervisionado
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
         try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("Encerrando a aplicação.")
-            self.device_connected_event.set()
-            self.new_message_event.set()
-            self.opencv_warning_monitor.stop()
-            thread_processar.join()
-            thread_receber.join()
-            thread_conectar.join()
+            # Também encerra com 'q' na janela de prévia
+            SAIR.wait()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        logging.info("Encerrando a aplicação.")
+        self.encerrar()
+        for thread in threads:
+            thread.join(timeout=1)
+
+
+class AnalisadorContagem(Analisador):
+    """
+    Contagem do pedido ativo: estabiliza a quantidade do item esperado entre quadros (EstimadorContagem),
+    lê o ArUco dos blisters em paralelo e, quando decidido, grava a evidência e publica o resultado
+    pela estação (`concluir_contagem`).
+    """
+    nome = 'contagem'
+
+    def __init__(self, estacao: 'YOLOProcessor'):
+        self.estacao = estacao
+        # Leitor de ArUco (blisters), executado em paralelo à contagem
+        self.leitor_aruco = LeitorAruco(ARUCO_ESCALA)
+        self.aguardando_aruco_desde: Optional[float] = None
+        self.frame_count: int = 0
+
+        # Estabilização temporal da contagem do pedido atual
+        self.estimador = EstimadorContagem()
+        self.seq_em_contagem: Optional[int] = None
+        self.decisao_pendente: Optional[int] = None
+        self.sessao_gravada: Optional[GravadorSessao] = None
+
+    def iniciar_contagem(self, trabalho: Trabalho) -> None:
+        """
+        Reinicia o estimador de contagem para um novo pedido (e abre a gravação da sessão, se habilitada).
+        """
+        self.estimador.reiniciar()
+        self.frame_count = 0
+        self.seq_em_contagem = trabalho.seq
+        self.decisao_pendente = None
+        self.aguardando_aruco_desde = None
+        self.leitor_aruco.limpar(trabalho.item_id)
+        if CONTAGEM_GRAVAR_SESSOES:
+            self.sessao_gravada = GravadorSessao(CONTAGEM_GRAVAR_SESSOES, trabalho.item_id, trabalho.quantidade)
+
+    def codigo_aruco_pronto(self, item_id: str, mensagem: Dict) -> bool:
+        """
+        Verifica se o código ArUco do item já foi confirmado e, nesse caso, o adiciona à mensagem.
+        Retorna False enquanto ainda vale a pena aguardar o código (até ARUCO_TIMEOUT_SECONDS).
+        """
+        id_marker = self.leitor_aruco.codigo(item_id)
+        if id_marker is not None:
+            mensagem['code'] = str(id_marker)
+            return True
+
+        if self.aguardando_aruco_desde is None:
+            self.aguardando_aruco_desde = time.monotonic()
+        if time.monotonic() - self.aguardando_aruco_desde < ARUCO_TIMEOUT_SECONDS:
+            return False
+
+        logging.warning(f"Nenhum ArUco detectado após {ARUCO_TIMEOUT_SECONDS} segundos.")
+        return True
+
+    def concluir(self, trabalho: Trabalho, quadro: Quadro, mensagem: Dict) -> None:
+        self.frame_count = 0
+        self.seq_em_contagem = None
+        self.decisao_pendente = None
+        self.aguardando_aruco_desde = None
+        if self.sessao_gravada is not None:
+            self.sessao_gravada.finalizar(mensagem['count'])
+            self.sessao_gravada = None
+        self.estacao.concluir_contagem(trabalho, quadro, mensagem)
+
+    def conclui(self, trabalho: Trabalho) -> bool:
+        return trabalho.quantidade > 0
+
+    def analisar(self, quadro: Quadro, deteccoes: Deteccoes, contexto: Contexto) -> None:
+        trabalho = contexto.trabalho
+        if trabalho is None or not self.conclui(trabalho) or trabalho.enviado:
+            return
+        etapas = self.estacao.etapas
+        deteccoes_esperadas = deteccoes.da_classe(contexto.cls_esperada)
+
+        if trabalho.seq != self.seq_em_contagem:
+            self.iniciar_contagem(trabalho)
+
+        # ArUco dos blisters é lido em paralelo, enquanto a contagem estabiliza
+        blister = 'blister' in trabalho.item_id
+        if blister:
+            with etapas['aruco'].medir():
+                self.leitor_aruco.submeter(quadro.frame, trabalho.item_id)
+
+        detected_count = self.estimador.adicionar(deteccoes_esperadas.xyxy)
+        if self.sessao_gravada is not None:
+            self.sessao_gravada.quadro(quadro.timestamp, deteccoes_esperadas.xyxy,
+                                       deteccoes_esperadas.conf)
+        logging.debug("Objeto esperado (itemId: %s) detectado %d vezes.", trabalho.item_id, detected_count)
+
+        self.frame_count += 1
+        decisao = self.decisao_pendente
+        if decisao is None:
+            decisao = self.estimador.decidir(trabalho.quantidade)
+            if decisao is None and self.frame_count >= PROCESSING_LIMIT_FRAMES:
+                decisao = self.estimador.forcar_decisao()
+
+        if decisao == trabalho.quantidade:
+            mensagem = {
+                'itemId': trabalho.item_id.upper(),
+                'count': decisao
+            }
+
+            # Se tiver 'blister' no nome, envia assim que o ArUco for conhecido (ou após o timeout)
+            if blister and not self.codigo_aruco_pronto(trabalho.item_id, mensagem):
+                self.decisao_pendente = decisao
+                return
+
+            if trabalho.arquivo is not None:
+                # Quadro completo rotacionado 180 graus só quando há evidência a gravar
+                with etapas['rotacao'].medir():
+                    frame = cv2.rotate(quadro.frame, cv2.ROTATE_180)
+                self.estacao.salvar_frame_com_desenho(trabalho.arquivo, frame, deteccoes_esperadas)
+
+            self.concluir(trabalho, quadro, mensagem)
+        elif decisao is not None:
+            mensagem = {
+                'itemId': trabalho.item_id.upper(),
+                'count': decisao
+            }
+            # Caso especial para 'CAIXA 520X320X170 TRIPLEX'
+            if trabalho.item_id.upper() == 'CAIXA 520X320X170 TRIPLEX':
+                mensagem['count'] = 1
+
+            self.concluir(trabalho, quadro, mensagem)
+
+
+# Analisadores disponíveis em ANALISADORES, criados para cada estação
+FABRICAS_ANALISADORES: Dict[str, Callable[[YOLOProcessor], Analisador]] = {
+    'contagem': AnalisadorContagem,
+    'defeitos': lambda estacao: AnalisadorDefeitos(rotulos={'estacao': estacao.janela}),
+}
 
 if __name__ == '__main__':
     processor = YOLOProcessor()
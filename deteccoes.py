@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_VAZIO_XYXY = np.empty((0, 4), dtype=np.float32)
+_VAZIO = np.empty(0, dtype=np.float32)
+
+
+class Deteccoes:
+    """
+    Detecções de um quadro em formato colunar (arrays NumPy de xyxy, conf e cls).
+
+    É montada com uma única transferência dispositivo→host por resultado (`boxes.data`),
+    e os filtros por classe usam máscaras em vez de comparar rótulos caixa a caixa.
+    A visão em lista de dicionários (`lista`) é construída só quando alguém a pede.
+    """
+
+    __slots__ = ('xyxy', 'conf', 'cls', 'names', '_lista')
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray, names: Dict[int, str]):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+        self._lista: Optional[List[Dict]] = None
+
+    @classmethod
+    def vazia(cls, names: Dict[int, str]) -> 'Deteccoes':
+        return cls(_VAZIO_XYXY, _VAZIO, _VAZIO.astype(np.int64), names)
+
+    @classmethod
+    def de_resultados(cls, results, names: Dict[int, str]) -> 'Deteccoes':
+        # boxes.data: [x1, y1, x2, y2, (track_id), conf, cls]
+        blocos = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is not None and len(boxes):
+                data = boxes.data
+                blocos.append(data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data))
+        if not blocos:
+            return cls.vazia(names)
+        data = blocos[0] if len(blocos) == 1 else np.concatenate(blocos)
+        return cls(data[:, :4], data[:, -2], data[:, -1].astype(np.int64), names)
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+    def filtrar(self, mascara: np.ndarray) -> 'Deteccoes':
+        return Deteccoes(self.xyxy[mascara], self.conf[mascara], self.cls[mascara], self.names)
+
+    def da_classe(self, cls_id: Optional[int]) -> 'Deteccoes':
+        """
+        Retorna apenas as detecções da classe `cls_id` (nenhuma se `cls_id` for None).
+        """
+        if cls_id is None:
+            return Deteccoes.vazia(self.names)
+        return self.filtrar(self.cls == cls_id)
+
+    def contar(self, cls_id: Optional[int]) -> int:
+        if cls_id is None:
+            return 0
+        return int(np.count_nonzero(self.cls == cls_id))
+
+    @property
+    def lista(self) -> List[Dict]:
+        """
+        Visão compatível com o formato antigo: lista de dicts com label, cls, confidence e bbox.
+        """
+        if self._lista is None:
+            self._lista = [
+                {
+                    'label': self.names[int(c)],
+                    'cls': int(c),
+                    'confidence': float(conf),
+                    'bbox': bbox.tolist()
+                }
+                for c, conf, bbox in zip(self.cls, self.conf, self.xyxy)
+            ]
+        return self._lista
+
+    def __iter__(self):
+        return iter(self.lista)
+
+
+def ids_das_classes(names: Dict[int, str]) -> Dict[str, int]:
+    """
+    Mapeamento rótulo → id de classe, calculado uma vez quando o modelo é carregado.
+    """
+    return {nome: int(cls_id) for cls_id, nome in names.items()}
@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from captura import EstatisticasLatencia
+
+# Faixa de portas usada pela depuração sem fio do Android
+ADB_PORTA_MIN = int(os.getenv('ADB_PORTA_MIN', '37000'))
+ADB_PORTA_MAX = int(os.getenv('ADB_PORTA_MAX', '44000'))
+
+# Timeout de cada sondagem TCP (s) e quantas portas são sondadas ao mesmo tempo
+ADB_TIMEOUT_PORTA = float(os.getenv('ADB_TIMEOUT_PORTA', '0.3'))
+ADB_SONDAGENS_SIMULTANEAS = int(os.getenv('ADB_SONDAGENS_SIMULTANEAS', '512'))
+
+# Arquivo com a última porta que funcionou para cada IP
+ADB_CACHE_PORTAS = os.getenv('ADB_CACHE_PORTAS',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), '.adb_portas.json'))
+
+# Tentativas de conexão seguidas sem sucesso antes de reiniciar o servidor ADB (0 = nunca).
+# Desligado por padrão: o servidor é compartilhado por todas as estações do host, e o seu
+# reinício já é o último degrau da recuperação escalonada (recuperacao.py).
+ADB_REINICIAR_APOS_FALHAS = int(os.getenv('ADB_REINICIAR_APOS_FALHAS', '0'))
+
+
+class EstadoDispositivo:
+    DESCONECTADO = 'DESCONECTADO'
+    PROCURANDO = 'PROCURANDO'
+    AGUARDANDO = 'AGUARDANDO'
+    CONECTADO = 'CONECTADO'
+
+
+def ler_cache_portas(caminho: str = ADB_CACHE_PORTAS) -> Dict[str, int]:
+    try:
+        with open(caminho) as arquivo:
+            return {ip: int(porta) for ip, porta in json.load(arquivo).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def gravar_porta(ip: str, porta: int, caminho: str = ADB_CACHE_PORTAS) -> None:
+    portas = ler_cache_portas(caminho)
+    portas[ip] = porta
+    try:
+        with open(caminho, 'w') as arquivo:
+            json.dump(portas, arquivo)
+    except OSError:
+        logging.warning(f"Não foi possível gravar o cache de portas em {caminho}")
+
+
+def reiniciar_servidor_adb() -> bool:
+    """
+    Reinicia o servidor ADB (último recurso: derruba todas as conexões do host).
+    """
+    result = subprocess.run(["adb", "kill-server"], capture_output=True)
+    if result.returncode == 0:
+        logging.info("Servidor ADB finalizado com sucesso.")
+    else:
+        logging.warning("Não foi possível finalizar o servidor ADB. Talvez não estivesse em execução.")
+
+    result = subprocess.run(["adb", "start-server"], capture_output=True)
+    if result.returncode != 0:
+        logging.error("Não foi possível iniciar o servidor ADB.")
+        return False
+    logging.info("Servidor ADB iniciado com sucesso.")
+    return True
+
+
+async def _porta_aberta(ip: str, porta: int, timeout: float, limite: asyncio.Semaphore) -> Optional[int]:
+    async with limite:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, porta), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        writer.close()
+        return porta
+
+
+async def sondar_portas(ip: str, portas, timeout: float = ADB_TIMEOUT_PORTA,
+                        simultaneas: int = ADB_SONDAGENS_SIMULTANEAS) -> List[int]:
+    """
+    Sonda as portas TCP em paralelo e retorna as que aceitaram conexão, em ordem.
+    """
+    limite = asyncio.Semaphore(simultaneas)
+    resultados = await asyncio.gather(*(_porta_aberta(ip, p, timeout, limite) for p in portas))
+    return [p for p in resultados if p is not None]
+
+
+async def adb_connect(ip: str, porta: int, timeout: float = 2.0) -> bool:
+    try:
+        processo = await asyncio.create_subprocess_exec(
+            "adb", "connect", f"{ip}:{porta}",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    except OSError:
+        logging.exception("Não foi possível executar o adb")
+        return False
+    try:
+        saida, _ = await asyncio.wait_for(processo.communicate(), timeout)
+    except asyncio.TimeoutError:
+        processo.kill()
+        return False
+    texto = saida.decode(errors='replace').lower()
+    return 'connected to' in texto and 'cannot' not in texto
+
+
+class GerenciadorDispositivo:
+    """
+    Mantém a conexão ADB sem fio com um óculos RealWear.
+
+    O estado dos dispositivos vem de `adb track-devices`, que notifica cada mudança, em vez
+    de rodar `adb devices` a cada segundo. Ao perder o óculos, a última porta que funcionou
+    (guardada em ADB_CACHE_PORTAS) é tentada primeiro; se falhar, a faixa
+    ADB_PORTA_MIN–ADB_PORTA_MAX é sondada com asyncio e o `adb connect` é tentado em todas as
+    portas abertas ao mesmo tempo. Tentativas sem sucesso esperam um backoff exponencial; só com
+    ADB_REINICIAR_APOS_FALHAS > 0 o servidor ADB é reiniciado após essa quantidade de falhas seguidas.
+
+    Estados: DESCONECTADO → PROCURANDO → CONECTADO, ou PROCURANDO → AGUARDANDO → PROCURANDO.
+    `on_conectado` e `on_desconectado` são chamados na thread de `executar`.
+    """
+
+    def __init__(self, ip: str,
+                 on_conectado: Optional[Callable[[], None]] = None,
+                 on_desconectado: Optional[Callable[[], None]] = None,
+                 backoff_inicial: float = 0.5,
+                 backoff_maximo: float = 30.0,
+                 cache_portas: str = ADB_CACHE_PORTAS):
+        self.ip = ip
+        self.on_conectado = on_conectado
+        self.on_desconectado = on_desconectado
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.cache_portas = cache_portas
+
+        self.estado = EstadoDispositivo.DESCONECTADO
+        self.serial: Optional[str] = None
+        self.porta: Optional[int] = ler_cache_portas(cache_portas).get(ip)
+        self._backoff = backoff_inicial
+        self._falhas_seguidas = 0
+
+        self._dispositivos: Dict[str, str] = {}
+        self._mudou = threading.Event()
+        self._lock = threading.Lock()
+
+        # Métricas de reconexão
+        self.tempo_reconexao = EstatisticasLatencia(100)
+        self.desconectado_em: Optional[float] = time.monotonic()
+        self.conexoes = 0
+        self.tentativas = 0
+        self.falhas = 0
+
+        self.thread_monitor = threading.Thread(target=self._monitorar, daemon=True)
+        self.thread_monitor.start()
+
+    def _monitorar(self) -> None:
+        """
+        Acompanha `adb track-devices`, reabrindo o processo se o servidor ADB for reiniciado.
+        """
+        while True:
+            try:
+                processo = subprocess.Popen(["adb", "track-devices"], stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+            except OSError:
+                logging.exception("Não foi possível executar 'adb track-devices'")
+                time.sleep(self.backoff_maximo)
+                continue
+            try:
+                while True:
+                    tamanho = processo.stdout.read(4)
+                    if len(tamanho) < 4:
+                        break
+                    conteudo = processo.stdout.read(int(tamanho, 16)).decode(errors='replace')
+                    dispositivos = {}
+                    for linha in conteudo.splitlines():
+                        if '\t' in linha:
+                            serial, status = linha.strip().split('\t', 1)
+                            dispositivos[serial] = status
+                    with self._lock:
+                        self._dispositivos = dispositivos
+                    self._mudou.set()
+            except ValueError:
+                logging.exception("Saída inesperada de 'adb track-devices'")
+            finally:
+                processo.kill()
+                processo.wait()
+            # Servidor ADB encerrado: o estado dos dispositivos é desconhecido até reabrir
+            with self._lock:
+                self._dispositivos = {}
+            self._mudou.set()
+            time.sleep(self.backoff_inicial)
+
+    def _serial_conectado(self) -> Optional[str]:
+        with self._lock:
+            dispositivos = dict(self._dispositivos)
+        conectado = None
+        for serial, status in dispositivos.items():
+            if not serial.startswith(f'{self.ip}:'):
+                continue
+            if status == 'device':
+                conectado = serial
+            elif status == 'offline':
+                subprocess.run(["adb", "disconnect", serial], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return conectado
+
+    async def _procurar(self) -> Optional[int]:
+        if self.porta and await adb_connect(self.ip, self.porta):
+            return self.porta
+
+        inicio = time.monotonic()
+        abertas = await sondar_portas(self.ip, range(ADB_PORTA_MIN, ADB_PORTA_MAX + 1))
+        logging.info(f"Portas abertas em {self.ip}: {abertas} ({time.monotonic() - inicio:.1f} s)")
+        if not abertas:
+            return None
+        resultados = await asyncio.gather(*(adb_connect(self.ip, p) for p in abertas))
+        for porta, conectou in zip(abertas, resultados):
+            if conectou:
+                return porta
+        return None
+
+    def procurar(self) -> bool:
+        """
+        Uma tentativa de conexão: porta em cache e, se falhar, sondagem da faixa inteira.
+        """
+        self.estado = EstadoDispositivo.PROCURANDO
+        self.tentativas += 1
+        porta = asyncio.run(self._procurar())
+        if porta is None:
+            self.falhas += 1
+            self._falhas_seguidas += 1
+            if 0 < ADB_REINICIAR_APOS_FALHAS <= self._falhas_seguidas:
+                self._falhas_seguidas = 0
+                reiniciar_servidor_adb()
+            return False
+        self._falhas_seguidas = 0
+        if porta != self.porta:
+            self.porta = porta
+            gravar_porta(self.ip, porta, self.cache_portas)
+        return True
+
+    def reconectar(self) -> None:
+        """
+        Desfaz a conexão ADB atual; o loop de `executar` percebe a queda e reconecta.
+        """
+        alvo = self.serial or (f'{self.ip}:{self.porta}' if self.porta else self.ip)
+        subprocess.run(["adb", "disconnect", alvo], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+
+    def _conectado(self, serial: str) -> None:
+        self.estado = EstadoDispositivo.CONECTADO
+        self.serial = serial
+        self._backoff = self.backoff_inicial
+        self.conexoes += 1
+        if self.desconectado_em is not None:
+            duracao = time.monotonic() - self.desconectado_em
+            self.tempo_reconexao.registrar(duracao)
+            logging.info(f"Dispositivo {serial} conectado após {duracao:.1f} s")
+            self.desconectado_em = None
+        if self.on_conectado:
+            self.on_conectado()
+
+    def _desconectado(self) -> None:
+        self.estado = EstadoDispositivo.DESCONECTADO
+        self.serial = None
+        self.desconectado_em = time.monotonic()
+        logging.warning(f"Dispositivo {self.ip} desconectado")
+        if self.on_desconectado:
+            self.on_desconectado()
+
+    def executar(self) -> None:
+        """
+        Loop da máquina de estados; bloqueia, então deve rodar em uma thread própria.
+        """
+        while True:
+            self._mudou.clear()
+            serial = self._serial_conectado()
+
+            if self.estado == EstadoDispositivo.CONECTADO:
+                if serial is None:
+                    self._desconectado()
+                    continue
+                self._mudou.wait()
+                continue
+
+            if serial is not None:
+                self._conectado(serial)
+                continue
+
+            if self.procurar():
+                # O track-devices confirma a conexão logo em seguida
+                self._mudou.wait(timeout=2.0)
+                continue
+
+            self.estado = EstadoDispositivo.AGUARDANDO
+            logging.info(f"Óculos {self.ip} não encontrado. Nova tentativa em {self._backoff:.1f} s")
+            self._mudou.wait(timeout=self._backoff)
+            self._backoff = min(self._backoff * 2, self.backoff_maximo)
+
+    def estatisticas(self) -> dict:
+        return {
+            'estado': self.estado,
+            'serial': self.serial,
+            'porta': self.porta,
+            'conexoes': self.conexoes,
+            'tentativas': self.tentativas,
+            'falhas': self.falhas,
+            'tempo_reconexao': self.tempo_reconexao.resumo(),
+        }
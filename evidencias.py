@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+# Configuração do gravador de evidências
+EVIDENCIA_FORMATO = os.getenv('EVIDENCIA_FORMATO', 'jpg')             # jpg, png ou webp
+EVIDENCIA_QUALIDADE = int(os.getenv('EVIDENCIA_QUALIDADE', '90'))     # qualidade JPEG/WebP (0-100)
+EVIDENCIA_FILA = int(os.getenv('EVIDENCIA_FILA', '32'))               # tamanho máximo da fila
+EVIDENCIA_WORKERS = int(os.getenv('EVIDENCIA_WORKERS', '2'))          # threads gravando em disco
+EVIDENCIA_POLITICA = os.getenv('EVIDENCIA_POLITICA', 'bloquear')      # bloquear, descartar_novo ou descartar_antigo
+EVIDENCIA_TIMEOUT = float(os.getenv('EVIDENCIA_TIMEOUT', '1.0'))      # espera máxima da política "bloquear" (s)
+
+POLITICAS = ('bloquear', 'descartar_novo', 'descartar_antigo')
+
+
+class GravadorEvidencias:
+    """
+    Gravação assíncrona dos quadros de evidência em `<diretorio_base>/<data>/<nome>.<formato>`.
+
+    `salvar` apenas enfileira o quadro (e, opcionalmente, uma função que desenha sobre ele);
+    o desenho e o `cv2.imwrite` acontecem em um pool de threads. Com a fila cheia,
+    a política define se quem chama espera até `timeout` ("bloquear"), se o quadro novo é
+    descartado ("descartar_novo") ou se o mais antigo dá lugar a ele ("descartar_antigo").
+    """
+
+    def __init__(self, diretorio_base: str = 'logs',
+                 formato: str = EVIDENCIA_FORMATO,
+                 qualidade: int = EVIDENCIA_QUALIDADE,
+                 tamanho_fila: int = EVIDENCIA_FILA,
+                 workers: int = EVIDENCIA_WORKERS,
+                 politica: str = EVIDENCIA_POLITICA,
+                 timeout: float = EVIDENCIA_TIMEOUT,
+                 on_salvo: Optional[Callable[[str, str], None]] = None):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de descarte inválida: {politica}. Opções: {', '.join(POLITICAS)}")
+        self.diretorio_base = diretorio_base
+        self.formato = formato.lower().lstrip('.')
+        self.parametros = self._parametros(self.formato, qualidade)
+        self.politica = politica
+        self.timeout = timeout
+        self.on_salvo = on_salvo
+
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+        self._diretorio_lock = threading.Lock()
+        self._data_atual: Optional[str] = None
+        self._diretorio_atual: Optional[str] = None
+
+        # Contadores para monitoramento
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.falhas = 0
+
+        self.threads = [threading.Thread(target=self._loop, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    @staticmethod
+    def _parametros(formato: str, qualidade: int):
+        if formato in ('jpg', 'jpeg'):
+            return [cv2.IMWRITE_JPEG_QUALITY, qualidade]
+        if formato == 'webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, qualidade]
+        if formato == 'png':
+            return [cv2.IMWRITE_PNG_COMPRESSION, 3]
+        raise ValueError(f"Formato de evidência não suportado: {formato}")
+
+    def diretorio(self) -> str:
+        """
+        Diretório do dia, criado apenas quando a data muda.
+        """
+        data = datetime.now().strftime('%Y-%m-%d')
+        with self._diretorio_lock:
+            if data != self._data_atual:
+                self._diretorio_atual = os.path.join(self.diretorio_base, data)
+                os.makedirs(self._diretorio_atual, exist_ok=True)
+                self._data_atual = data
+            return self._diretorio_atual
+
+    def salvar(self, nome: str, frame: np.ndarray,
+               desenhar: Optional[Callable[[np.ndarray], None]] = None, copiar: bool = False) -> bool:
+        """
+        Enfileira o quadro para gravação. Use `copiar=True` se o array puder ser reutilizado por quem chama.
+        Retorna False se o quadro foi descartado.
+        """
+        item = (nome, frame.copy() if copiar else frame, desenhar)
+        if self.politica == 'bloquear':
+            try:
+                self._fila.put(item, timeout=self.timeout)
+            except queue.Full:
+                return self._descartar(nome)
+        else:
+            try:
+                self._fila.put_nowait(item)
+            except queue.Full:
+                if self.politica == 'descartar_novo':
+                    return self._descartar(nome)
+                try:
+                    antigo = self._fila.get_nowait()
+                    self._fila.task_done()
+                    self._descartar(antigo[0])
+                except queue.Empty:
+                    pass
+                try:
+                    self._fila.put_nowait(item)
+                except queue.Full:
+                    return self._descartar(nome)
+        self.enfileirados += 1
+        return True
+
+    def _descartar(self, nome: str) -> bool:
+        self.descartados += 1
+        logging.error(f"Fila de evidências cheia. Quadro descartado: {nome}")
+        return False
+
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    def _loop(self) -> None:
+        while True:
+            nome, frame, desenhar = self._fila.get()
+            try:
+                if desenhar is not None:
+                    desenhar(frame)
+                nome_arquivo = f'{nome}.{self.formato}'
+                caminho_arquivo = os.path.join(self.diretorio(), nome_arquivo)
+                if not cv2.imwrite(caminho_arquivo, frame, self.parametros):
+                    raise IOError(f"cv2.imwrite falhou para {caminho_arquivo}")
+                self.gravados += 1
+                if self.on_salvo:
+                    self.on_salvo(nome_arquivo, caminho_arquivo)
+            except Exception:
+                self.falhas += 1
+                logging.exception("Erro ao salvar frame")
+            finally:
+                self._fila.task_done()
+
+    def aguardar(self) -> None:
+        """
+        Bloqueia até que todos os quadros enfileirados tenham sido gravados.
+        """
+        self._fila.join()
+
+
+class GravadorLinhasJson:
+    """
+    Gravação assíncrona de registros em JSON lines, em `<diretorio()>/<arquivo>`.
+
+    `registrar` só enfileira o dicionário; a serialização e o `write` acontecem em uma única
+    thread, o que mantém a ordem das linhas. Com a fila cheia, o registro novo é descartado.
+    `diretorio` é chamado a cada linha (ex.: `GravadorEvidencias.diretorio`, que troca de pasta por dia).
+    """
+
+    def __init__(self, diretorio: Callable[[], str], arquivo: str, tamanho_fila: int = EVIDENCIA_FILA):
+        self.diretorio = diretorio
+        self.arquivo = arquivo
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+
+        # Contadores para monitoramento
+        self.gravados = 0
+        self.descartados = 0
+        self.falhas = 0
+
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def registrar(self, registro: Dict) -> bool:
+        try:
+            self._fila.put_nowait(registro)
+            return True
+        except queue.Full:
+            self.descartados += 1
+            logging.error(f"Fila de {self.arquivo} cheia. Registro descartado: {registro}")
+            return False
+
+    def _loop(self) -> None:
+        while True:
+            registro = self._fila.get()
+            try:
+                with open(os.path.join(self.diretorio(), self.arquivo), 'a') as arquivo:
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                self.gravados += 1
+            except Exception:
+                self.falhas += 1
+                logging.exception(f"Erro ao gravar em {self.arquivo}")
+            finally:
+                self._fila.task_done()
+
+    def aguardar(self) -> None:
+        """
+        Bloqueia até que todos os registros enfileirados tenham sido gravados.
+        """
+        self._fila.join()
@@ -0,0 +1,98 @@
+"""
+Simulador do scrcpy para testar a captura sem os óculos.
+
+Aceita os mesmos argumentos que core_back.py passa ao scrcpy e reproduz um vídeo local em loop,
+no ritmo real, para o destino pedido: `--v4l2-sink=/dev/videoN` (requer v4l2loopback) ou
+`--record=<arquivo/FIFO> --record-format=mkv` (ingestão direta). Uso:
+
+    SCRCPY_COMANDO="python3 fake_scrcpy.py --video teste.mp4" python core_back.py
+
+`--falhar-apos N` encerra o processo com erro após N segundos, para exercitar o reinício pelo supervisor.
+Sem o binário do ffmpeg, `--record` é gravado pelo próprio OpenCV (MPEG-4 em mkv).
+"""
+import argparse
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+
+import cv2
+
+from supervisor_scrcpy import FFMPEG_COMANDO
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador do scrcpy a partir de um vídeo local.")
+    parser.add_argument('--video', required=True, help="Vídeo reproduzido no lugar da câmera do óculos")
+    parser.add_argument('--falhar-apos', type=float, default=0, help="Encerra após N segundos (0 = nunca)")
+    parser.add_argument('--v4l2-sink')
+    parser.add_argument('--record')
+    parser.add_argument('--record-format', default='mkv')
+    parser.add_argument('--camera-size', default='1920x1080')
+    args, ignorados = parser.parse_known_args()
+
+    comando = shlex.split(FFMPEG_COMANDO) + ['-loglevel', 'error', '-nostdin', '-re', '-stream_loop', '-1',
+                                             '-i', args.video]
+    if args.falhar_apos:
+        comando += ['-t', str(args.falhar_apos)]
+    largura, altura = args.camera_size.split('x')
+    comando += ['-vf', f'scale={largura}:{altura}', '-an']
+
+    if args.v4l2_sink:
+        comando += ['-pix_fmt', 'yuv420p', '-f', 'v4l2', args.v4l2_sink]
+    elif args.record:
+        comando += ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency', '-g', '15',
+                    '-f', 'matroska' if args.record_format == 'mkv' else args.record_format, '-y', args.record]
+    else:
+        print("ERROR: nenhum destino (--v4l2-sink ou --record) informado", flush=True)
+        sys.exit(1)
+
+    print(f"INFO: scrcpy simulado ({args.video}); ignorando {' '.join(ignorados) or 'nada'}", flush=True)
+    print("INFO: Device: [fake] RealWear Navigator", flush=True)
+    if shutil.which(comando[0]) is None:
+        if not args.record:
+            print(f"ERROR: {comando[0]} não encontrado para --v4l2-sink", flush=True)
+            sys.exit(1)
+        gravar_opencv(args.video, args.record, (int(largura), int(altura)), args.falhar_apos)
+    elif not args.falhar_apos:
+        os.execvp(comando[0], comando)
+    else:
+        subprocess.run(comando, stdin=subprocess.DEVNULL)
+    if args.falhar_apos:
+        print(f"ERROR: falha simulada após {args.falhar_apos:g}s", file=sys.stderr, flush=True)
+        sys.exit(1)
+
+
+def gravar_opencv(video: str, destino: str, tamanho, duracao: float = 0) -> None:
+    """
+    Reproduz `video` em loop, no ritmo real, gravando em `destino` com o FFmpeg do OpenCV.
+    """
+    cap = cv2.VideoCapture(video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 15
+    writer = cv2.VideoWriter(destino, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), fps, tamanho)
+    inicio = time.monotonic()
+    quadros = 0
+    try:
+        while not duracao or time.monotonic() - inicio < duracao:
+            ok, frame = cap.read()
+            if not ok:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = cap.read()
+                if not ok:
+                    break
+            writer.write(cv2.resize(frame, tamanho))
+            quadros += 1
+            atraso = inicio + quadros / fps - time.monotonic()
+            if atraso > 0:
+                time.sleep(atraso)
+    except BrokenPipeError:
+        pass
+    finally:
+        writer.release()
+        cap.release()
+
+
+if __name__ == '__main__':
+    main()
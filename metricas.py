@@ -0,0 +1,259 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Porta do endpoint /metrics (formato texto do Prometheus); vazio ou 0 desabilita
+METRICAS_PORTA = int(os.getenv('METRICAS_PORTA', '0') or '0')
+METRICAS_HOST = os.getenv('METRICAS_HOST', '127.0.0.1')
+
+
+def limites_exponenciais(minimo: float = 0.0001, maximo: float = 60.0, por_oitava: int = 2) -> List[float]:
+    """
+    Limites dos baldes em progressão geométrica (estilo HDR): erro relativo constante
+    de 0,1 ms a 1 min, com `por_oitava` baldes a cada vez que o valor dobra.
+    """
+    fator = 2 ** (1.0 / por_oitava)
+    limites = []
+    valor = minimo
+    while valor < maximo:
+        limites.append(round(valor, 6))
+        valor *= fator
+    limites.append(maximo)
+    return limites
+
+
+LIMITES_LATENCIA = limites_exponenciais()
+
+
+def _rotulos(rotulos: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    partes = [f'{chave}="{valor}"' for chave, valor in rotulos]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Contador:
+    """
+    Valor que só cresce. Com `funcao`, é lido na coleta a partir de um contador já existente
+    (ex.: `frame_buffer.dropped`), sem instrumentar o código de novo.
+    """
+    tipo = 'counter'
+
+    def __init__(self, funcao: Optional[Callable[[], float]] = None):
+        self._valor = 0.0
+        self._lock = threading.Lock()
+        self.funcao = funcao
+
+    def incrementar(self, valor: float = 1.0) -> None:
+        with self._lock:
+            self._valor += valor
+
+    def valor(self) -> float:
+        if self.funcao is None:
+            return self._valor
+        try:
+            return float(self.funcao())
+        except Exception:
+            return float('nan')
+
+    def amostras(self, nome: str, rotulos) -> List[str]:
+        return [f'{nome}{_rotulos(rotulos)} {self.valor()}']
+
+
+class Medidor:
+    """
+    Valor instantâneo. Com `funcao`, o valor é lido só na coleta (ex.: tamanho de uma fila).
+    """
+    tipo = 'gauge'
+
+    def __init__(self, funcao: Optional[Callable[[], float]] = None):
+        self._valor = 0.0
+        self.funcao = funcao
+
+    def definir(self, valor: float) -> None:
+        self._valor = valor
+
+    def valor(self) -> float:
+        if self.funcao is None:
+            return self._valor
+        try:
+            return float(self.funcao())
+        except Exception:
+            return float('nan')
+
+    def amostras(self, nome: str, rotulos) -> List[str]:
+        return [f'{nome}{_rotulos(rotulos)} {self.valor()}']
+
+
+class Histograma:
+    """
+    Histograma de latências (em segundos) com baldes fixos; `observar` custa uma busca binária.
+    """
+    tipo = 'histogram'
+
+    def __init__(self, limites: List[float] = LIMITES_LATENCIA):
+        self.limites = limites
+        self._contagens = [0] * (len(limites) + 1)
+        self._soma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float) -> None:
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self._contagens[indice] += 1
+            self._soma += valor
+
+    @contextmanager
+    def medir(self):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio)
+
+    def quantil(self, q: float) -> Optional[float]:
+        """
+        Estimativa do quantil pelo limite superior do balde (útil em logs; o Prometheus calcula o seu).
+        """
+        with self._lock:
+            contagens = list(self._contagens)
+        total = sum(contagens)
+        if total == 0:
+            return None
+        alvo = q * total
+        acumulado = 0
+        for limite, contagem in zip(self.limites + [float('inf')], contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+    def resumo(self) -> dict:
+        """
+        Mesmo formato de `EstatisticasLatencia.resumo` (n, média, p50 e p99 em ms), para relatórios.
+        """
+        with self._lock:
+            n = sum(self._contagens)
+            soma = self._soma
+        if n == 0:
+            return {'n': 0}
+        return {
+            'n': n,
+            'media_ms': round(soma / n * 1000.0, 2),
+            'p50_ms': round(self.quantil(0.5) * 1000.0, 2),
+            'p99_ms': round(self.quantil(0.99) * 1000.0, 2),
+        }
+
+    def amostras(self, nome: str, rotulos) -> List[str]:
+        with self._lock:
+            contagens = list(self._contagens)
+            soma = self._soma
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ['+Inf'], contagens):
+            acumulado += contagem
+            le = 'le="%s"' % limite
+            linhas.append(f'{nome}_bucket{_rotulos(rotulos, le)} {acumulado}')
+        linhas.append(f'{nome}_sum{_rotulos(rotulos)} {soma}')
+        linhas.append(f'{nome}_count{_rotulos(rotulos)} {acumulado}')
+        return linhas
+
+
+class RegistroMetricas:
+    """
+    Registro em memória de contadores, medidores e histogramas, identificados por nome e rótulos.
+    Pedir a mesma métrica duas vezes devolve a mesma instância.
+    """
+
+    def __init__(self):
+        self._familias: Dict[str, Tuple[str, type]] = {}
+        self._metricas: Dict[Tuple[str, tuple], object] = {}
+        self._lock = threading.Lock()
+
+    def _obter(self, classe, nome: str, ajuda: str, rotulos: Optional[Dict[str, str]], **kwargs):
+        chave_rotulos = tuple(sorted((k, _escapar(v)) for k, v in (rotulos or {}).items()))
+        with self._lock:
+            familia = self._familias.setdefault(nome, (ajuda, classe))
+            if familia[1] is not classe:
+                raise ValueError(f"Métrica {nome} já registrada como {familia[1].tipo}")
+            metrica = self._metricas.get((nome, chave_rotulos))
+            if metrica is None:
+                metrica = classe(**kwargs)
+                self._metricas[(nome, chave_rotulos)] = metrica
+            return metrica
+
+    def contador(self, nome: str, ajuda: str = '', rotulos: Optional[Dict[str, str]] = None,
+                 funcao: Optional[Callable[[], float]] = None) -> Contador:
+        contador = self._obter(Contador, nome, ajuda, rotulos)
+        if funcao is not None:
+            contador.funcao = funcao
+        return contador
+
+    def medidor(self, nome: str, ajuda: str = '', rotulos: Optional[Dict[str, str]] = None,
+                funcao: Optional[Callable[[], float]] = None) -> Medidor:
+        medidor = self._obter(Medidor, nome, ajuda, rotulos)
+        if funcao is not None:
+            medidor.funcao = funcao
+        return medidor
+
+    def histograma(self, nome: str, ajuda: str = '', rotulos: Optional[Dict[str, str]] = None,
+                   limites: List[float] = LIMITES_LATENCIA) -> Histograma:
+        return self._obter(Histograma, nome, ajuda, rotulos, limites=limites)
+
+    def exportar(self) -> str:
+        """
+        Todas as métricas no formato texto do Prometheus (versão 0.0.4).
+        """
+        with self._lock:
+            familias = dict(self._familias)
+            metricas = sorted(self._metricas.items(), key=lambda item: item[0])
+        linhas = []
+        nome_atual = None
+        for (nome, rotulos), metrica in metricas:
+            if nome != nome_atual:
+                ajuda, classe = familias[nome]
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} {classe.tipo}')
+                nome_atual = nome
+            linhas.extend(metrica.amostras(nome, rotulos))
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro padrão do processo
+METRICAS = RegistroMetricas()
+
+_servidor: Optional[threading.Thread] = None
+
+
+def iniciar_servidor_metricas(porta: int = METRICAS_PORTA, host: str = METRICAS_HOST,
+                              registro: RegistroMetricas = METRICAS) -> Optional[threading.Thread]:
+    """
+    Sobe o endpoint GET /metrics em uma thread (Flask). Não faz nada se `porta` for 0
+    ou se o servidor já estiver rodando.
+    """
+    global _servidor
+    if not porta or _servidor is not None:
+        return _servidor
+
+    from flask import Flask, Response
+
+    app = Flask('metricas')
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
+
+    _servidor = threading.Thread(target=app.run,
+                                 kwargs={'host': host, 'port': porta, 'threaded': True, 'use_reloader': False},
+                                 daemon=True)
+    _servidor.start()
+    logging.info(f"Métricas disponíveis em http://{host}:{porta}/metrics")
+    return _servidor
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+
+def estimar_tamanho_modelo(model, model_path: str) -> int:
+    """
+    Estima a memória ocupada pelo modelo (bytes dos parâmetros).
+    Se não for possível inspecionar os parâmetros, usa o tamanho do arquivo.
+    """
+    try:
+        return int(sum(p.numel() * p.element_size() for p in model.model.parameters()))
+    except Exception:
+        return os.path.getsize(model_path)
+
+
+def ler_configuracao_modelo(model_path: str) -> Dict:
+    """
+    Lê a configuração opcional do modelo em um JSON ao lado do `.pt` (ex.: ITEM.json),
+    com chaves como "imgsz" e "roi". Retorna um dicionário vazio se não existir.
+    """
+    caminho = os.path.splitext(model_path)[0] + '.json'
+    if not os.path.isfile(caminho):
+        return {}
+    try:
+        with open(caminho) as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        logging.exception(f"Erro ao ler configuração do modelo: {caminho}")
+        return {}
+
+
+class RegistroModelos:
+    """
+    Cache LRU de modelos YOLO indexado por nome e mtime do arquivo.
+
+    `carregador` recebe o caminho do `.pt` e devolve o modelo pronto (ver `backends`).
+    Modelos recentes ficam em memória até o limite de `orcamento_bytes`; o menos usado é
+    descartado primeiro. `preload` carrega em segundo plano, e `obter` aguarda um carregamento
+    já em andamento em vez de iniciar outro. Se o arquivo `.pt` mudar no disco, o mtime muda
+    e o modelo é recarregado.
+    """
+
+    def __init__(self, base_path: str, orcamento_bytes: int,
+                 carregador: Callable[[str], object],
+                 workers: int = 1):
+        self.base_path = base_path
+        self.orcamento_bytes = orcamento_bytes
+        self.carregador = carregador
+
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[Tuple[str, float], Tuple[object, int]]' = OrderedDict()
+        self._carregando: Dict[Tuple[str, float], Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='preload_modelo')
+
+        # Contadores para monitoramento
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tempo_ultimo_carregamento: Optional[float] = None
+
+    def caminho(self, model_name: str) -> str:
+        return os.path.join(self.base_path, f'{model_name}.pt')
+
+    def _chave(self, model_name: str) -> Tuple[str, float]:
+        return model_name, os.path.getmtime(self.caminho(model_name))
+
+    def _carregar(self, chave: Tuple[str, float]):
+        model_name, _ = chave
+        model_path = self.caminho(model_name)
+        inicio = time.monotonic()
+        try:
+            model = self.carregador(model_path)
+            tamanho = estimar_tamanho_modelo(model, model_path)
+            self.tempo_ultimo_carregamento = time.monotonic() - inicio
+            logging.info(f"Modelo {model_name} carregado em {self.tempo_ultimo_carregamento:.2f}s.")
+            with self._lock:
+                # Remove versões antigas do mesmo modelo
+                for antiga in [c for c in self._cache if c[0] == model_name and c != chave]:
+                    del self._cache[antiga]
+                self._cache[chave] = (model, tamanho)
+                self._cache.move_to_end(chave)
+                self._aplicar_orcamento()
+            return model
+        finally:
+            with self._lock:
+                self._carregando.pop(chave, None)
+
+    def _aplicar_orcamento(self) -> None:
+        total = sum(tamanho for _, tamanho in self._cache.values())
+        # Sempre mantém pelo menos o modelo mais recente, mesmo que exceda o orçamento
+        while total > self.orcamento_bytes and len(self._cache) > 1:
+            chave, (_, tamanho) = self._cache.popitem(last=False)
+            total -= tamanho
+            self.evictions += 1
+            logging.info(f"Modelo {chave[0]} removido do cache (orçamento de memória).")
+
+    def _agendar(self, chave: Tuple[str, float]) -> Optional[Future]:
+        """
+        Retorna o Future do carregamento da chave, iniciando-o se necessário.
+        Retorna None se o modelo já estiver no cache. Deve ser chamado com o lock adquirido.
+        """
+        if chave in self._cache:
+            return None
+        future = self._carregando.get(chave)
+        if future is None:
+            future = self._executor.submit(self._carregar, chave)
+            self._carregando[chave] = future
+        return future
+
+    def preload(self, model_name: str) -> None:
+        """
+        Agenda o carregamento do modelo em segundo plano, se ele ainda não estiver no cache.
+        """
+        try:
+            chave = self._chave(model_name)
+        except OSError:
+            logging.error(f"Arquivo do modelo não encontrado para pré-carregamento: {self.caminho(model_name)}")
+            return
+        with self._lock:
+            self._agendar(chave)
+
+    def obter(self, model_name: str):
+        """
+        Retorna o modelo, do cache se possível. Em caso de miss, aguarda o carregamento.
+        """
+        chave = self._chave(model_name)
+        with self._lock:
+            if chave in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(chave)
+                return self._cache[chave][0]
+            self.misses += 1
+            future = self._agendar(chave)
+        return future.result()
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'modelos': [nome for nome, _ in self._cache],
+                'bytes': sum(tamanho for _, tamanho in self._cache.values()),
+                'orcamento_bytes': self.orcamento_bytes,
+                'carregando': len(self._carregando),
+            }
@@ -0,0 +1,161 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from backends import YOLO_BACKEND, criar_backend
+from core_back import (YOLOProcessor, YOLO_MODEL_BASE_PATH, YOLO_MODEL_CACHE_MB, QUEUE_SEND, QUEUE_RECEIVE,
+                       IP_OCULOS, RABBITMQ_HOST, configurar_logging)
+from metricas import METRICAS, iniciar_servidor_metricas
+from modelos import RegistroModelos
+from previa import SAIR
+
+# Intervalo entre relatórios de FPS e latência por estação (s)
+INTERVALO_RELATORIO = 10
+
+
+class AgendadorInferencia:
+    """
+    Agendador compartilhado de várias estações (óculos RealWear) em um único host.
+
+    A cada ciclo, pega o quadro mais recente de cada estação, agrupa as que usam o mesmo
+    modelo (e a mesma resolução de entrada) e faz um único `predict` em lote por grupo.
+    Os resultados voltam para a estação de origem, que conta e publica na sua própria fila.
+    """
+
+    def __init__(self, estacoes: List[YOLOProcessor], backend, lote_maximo: int = 8):
+        self.estacoes = estacoes
+        self.backend = backend
+        self.lote_maximo = lote_maximo
+        self.lotes_executados = 0
+        self.tamanho_lote = METRICAS.histograma('gde_lote_quadros', 'Quadros por predict em lote',
+                                                limites=[float(n) for n in range(1, lote_maximo + 1)])
+
+    def coletar(self) -> Dict:
+        grupos = defaultdict(list)
+        for estacao in self.estacoes:
+            if not estacao.device_connected_event.is_set():
+                continue
+            model, class_ids, preprocessador = estacao.estado_modelo()
+            if model is None:
+                continue
+            quadro = estacao.frame_buffer.ler_mais_recente(timeout=0)
+            if quadro is None:
+                continue
+            grupos[(id(model), preprocessador.imgsz)].append((estacao, quadro, model, class_ids, preprocessador))
+        return grupos
+
+    def executar(self) -> None:
+        while True:
+            grupos = self.coletar()
+            if not grupos:
+                time.sleep(0.002)
+                continue
+
+            for itens in grupos.values():
+                for deslocamento in range(0, len(itens), self.lote_maximo):
+                    lote = itens[deslocamento:deslocamento + self.lote_maximo]
+                    _, _, model, _, preprocessador = lote[0]
+                    entradas = []
+                    for estacao, quadro, _, _, p in lote:
+                        t0 = time.perf_counter()
+                        entradas.append(p.preparar(quadro.frame))
+                        estacao.etapas['preprocessamento'].observar(time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                    try:
+                        results = self.backend.predict(model, entradas, conf=0.70, imgsz=preprocessador.imgsz)
+                    except Exception:
+                        logging.exception("Erro na inferência em lote")
+                        continue
+                    # O predict em lote é dividido igualmente entre os quadros do lote
+                    duracao = (time.perf_counter() - t0) / len(lote)
+                    for estacao, _, _, _, _ in lote:
+                        estacao.etapas['predict'].observar(duracao)
+                    self.tamanho_lote.observar(len(lote))
+                    self.lotes_executados += 1
+                    for (estacao, quadro, model, class_ids, p), result in zip(lote, results):
+                        try:
+                            estacao.avaliar_resultados(quadro, [result], model, class_ids, p)
+                        except Exception:
+                            logging.exception(f"Erro ao avaliar resultados da estação {estacao.janela}")
+
+
+def relatar(estacoes: List[YOLOProcessor], agendador: AgendadorInferencia) -> None:
+    """
+    Registra periodicamente FPS processado e latência captura→resultado de cada estação.
+    """
+    anteriores = {id(e): e.quadros_processados for e in estacoes}
+    while True:
+        time.sleep(INTERVALO_RELATORIO)
+        for estacao in estacoes:
+            processados = estacao.quadros_processados
+            fps = (processados - anteriores[id(estacao)]) / INTERVALO_RELATORIO
+            anteriores[id(estacao)] = processados
+            estacao.log_message(RABBITMQ_HOST, 'YOLO', {
+                'estacao': estacao.janela,
+                'fila': estacao.fila_envio,
+                'fps': round(fps, 1),
+                'latencia': estacao.latencia_inferencia.resumo(),
+                'quadros_descartados': estacao.frame_buffer.dropped,
+                'lotes': agendador.lotes_executados
+            }, "DESEMPENHO")
+
+
+def criar_estacoes(config: List[Dict]) -> List[YOLOProcessor]:
+    """
+    Cria as estações a partir da configuração, compartilhando backend e cache de modelos.
+
+    Cada item aceita: "nome", "video_device" (dispositivo v4l2 ou arquivo de vídeo),
+    "ip_oculos", "fila_envio" e "fila_recebimento".
+    """
+    backend = criar_backend(YOLO_BACKEND)
+    modelos = RegistroModelos(YOLO_MODEL_BASE_PATH, YOLO_MODEL_CACHE_MB * 1024 * 1024, backend.carregar_aquecido)
+    estacoes = []
+    for i, item in enumerate(config):
+        nome = item.get('nome', f'estacao{i + 1}')
+        estacoes.append(YOLOProcessor(
+            janela=f'GDE EMBALAGEM - {nome}',
+            video_device=item['video_device'],
+            ip_oculos=item.get('ip_oculos', IP_OCULOS),
+            fila_envio=item.get('fila_envio', f'{QUEUE_SEND}_{nome}'),
+            fila_recebimento=item.get('fila_recebimento', f'{QUEUE_RECEIVE}_{nome}'),
+            modelos=modelos,
+            backend=backend
+        ))
+    return estacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Várias estações de embalagem em um único host de inferência.")
+    parser.add_argument('config', help="Arquivo JSON com a lista de estações")
+    parser.add_argument('--lote-maximo', type=int, default=8, help="Máximo de quadros por predict")
+    args = parser.parse_args()
+
+    configurar_logging()
+    with open(args.config) as arquivo:
+        estacoes = criar_estacoes(json.load(arquivo))
+
+    threads = []
+    for estacao in estacoes:
+        threads.extend(estacao.iniciar_threads(processar=False))
+
+    agendador = AgendadorInferencia(estacoes, estacoes[0].backend, args.lote_maximo)
+    iniciar_servidor_metricas()
+    threading.Thread(target=relatar, args=(estacoes, agendador), daemon=True).start()
+    threading.Thread(target=agendador.executar, daemon=True).start()
+
+    try:
+        # Encerra com Ctrl+C ou com 'q' em uma das janelas de prévia
+        SAIR.wait()
+    except KeyboardInterrupt:
+        pass
+    logging.info("Encerrando a aplicação.")
+    for estacao in estacoes:
+        estacao.encerrar()
+
+
+if __name__ == '__main__':
+    main()
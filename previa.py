@@ -0,0 +1,242 @@
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from deteccoes import Deteccoes
+from metricas import METRICAS
+
+# "janela": prévia em uma janela do OpenCV; "headless": nenhuma janela (só MJPEG, se PREVIA_PORTA estiver definida)
+EXIBICAO = os.getenv('EXIBICAO', 'janela')
+PREVIA_FPS = float(os.getenv('PREVIA_FPS', '5'))            # taxa máxima de quadros da prévia, por estação
+PREVIA_LARGURA = int(os.getenv('PREVIA_LARGURA', '960'))     # largura da miniatura (px)
+PREVIA_QUALIDADE_JPEG = int(os.getenv('PREVIA_QUALIDADE_JPEG', '70'))
+# Porta do MJPEG (GET /previa/<n>, uma por estação na ordem de criação); vazio ou 0 desabilita
+PREVIA_PORTA = int(os.getenv('PREVIA_PORTA', '0') or '0')
+PREVIA_HOST = os.getenv('PREVIA_HOST', '127.0.0.1')
+
+# Pedido de saída pelo operador ('q' em qualquer janela de prévia)
+SAIR = threading.Event()
+
+_previas: List['PreviaDeteccoes'] = []
+_cond = threading.Condition()
+_thread: Optional[threading.Thread] = None
+_servidor: Optional[threading.Thread] = None
+
+
+def desenhar_deteccoes(frame: np.ndarray, deteccoes: Deteccoes, escala: float = 1.0) -> None:
+    """
+    Desenha caixas e rótulos no quadro; `escala` converte as caixas para o tamanho do quadro
+    (miniaturas) e ajusta a espessura e a fonte.
+    """
+    espessura = max(1, round(2 * escala))
+    fonte = 0.9 * max(escala, 0.5)
+    for (x1, y1, x2, y2), confidence, cls in zip((deteccoes.xyxy * escala).astype(int), deteccoes.conf,
+                                                 deteccoes.cls):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), espessura)
+        cv2.putText(frame, f'{deteccoes.names[cls]} {confidence:.2f}', (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, fonte, (0, 255, 0), espessura)
+
+
+class PreviaDeteccoes:
+    """
+    Prévia anotada de uma estação, fora do caminho da inferência.
+
+    A thread de detecção só chama `oferecer`, que no máximo `fps` vezes por segundo reduz o quadro
+    para uma miniatura e guarda as detecções; os demais quadros custam uma comparação de tempo.
+    Rotação, desenho, janela (`cv2.imshow`/`waitKey`) e JPEG do MJPEG ficam em uma única thread
+    de renderização compartilhada por todas as estações, já que o HighGUI não deve ser usado
+    de várias threads.
+    """
+
+    def __init__(self, nome: str, janela: bool = EXIBICAO != 'headless', fps: float = PREVIA_FPS,
+                 largura: int = PREVIA_LARGURA, rotacionar: bool = True):
+        self.nome = nome
+        self.janela = janela
+        self.rotacionar = rotacionar
+        self.intervalo = 1.0 / fps if fps > 0 else 0.0
+        self.largura = largura
+        self._proxima = 0.0
+        self._pendente = None
+        self._jpeg: Optional[bytes] = None
+        self._versao = 0
+        self._lock = threading.Lock()
+        self._novo_jpeg = threading.Condition()
+
+        rotulos = {'estacao': nome}
+        self.tempo_renderizacao = METRICAS.histograma('gde_previa_renderizacao_segundos',
+                                                      'Rotação, desenho, janela e JPEG de uma miniatura', rotulos)
+        self.renderizados = METRICAS.contador('gde_previa_quadros_total', 'Miniaturas renderizadas', rotulos)
+
+        with _cond:
+            self.indice = len(_previas)
+            _previas.append(self)
+        _iniciar_thread()
+
+    def oferecer(self, frame: np.ndarray, deteccoes: Deteccoes) -> None:
+        """
+        Chamado a cada quadro inferido. `frame` é o quadro original (rotacionado na prévia se
+        `rotacionar`) e pode ser reutilizado pela captura logo depois: a miniatura é uma cópia reduzida.
+        """
+        agora = time.monotonic()
+        if agora < self._proxima:
+            return
+        self._proxima = agora + self.intervalo
+        altura, largura = frame.shape[:2]
+        escala = min(1.0, self.largura / largura)
+        miniatura = cv2.resize(frame, (round(largura * escala), round(altura * escala)),
+                               interpolation=cv2.INTER_LINEAR)
+        with self._lock:
+            self._pendente = (miniatura, deteccoes, escala, None)
+        with _cond:
+            _cond.notify()
+
+    def mensagem(self, texto: str) -> None:
+        """
+        Mostra um aviso no lugar do vídeo (ex.: aguardando a conexão do óculos), respeitando a taxa da prévia.
+        """
+        agora = time.monotonic()
+        if agora < self._proxima:
+            return
+        self._proxima = agora + self.intervalo
+        with self._lock:
+            self._pendente = (None, None, 1.0, texto)
+        with _cond:
+            _cond.notify()
+
+    def _renderizar(self, codificar: bool) -> None:
+        with self._lock:
+            pendente, self._pendente = self._pendente, None
+        if pendente is None:
+            return
+        miniatura, deteccoes, escala, texto = pendente
+        with self.tempo_renderizacao.medir():
+            if texto is not None:
+                frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                cv2.putText(frame, texto, (50, frame.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            else:
+                # Mesma orientação das evidências: quadro rotacionado 180 graus
+                frame = cv2.rotate(miniatura, cv2.ROTATE_180) if self.rotacionar else miniatura
+                desenhar_deteccoes(frame, deteccoes, escala)
+            if self.janela:
+                cv2.imshow(self.nome, frame)
+            if codificar:
+                ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, PREVIA_QUALIDADE_JPEG])
+                if ok:
+                    with self._novo_jpeg:
+                        self._jpeg = jpeg.tobytes()
+                        self._versao += 1
+                        self._novo_jpeg.notify_all()
+        self.renderizados.incrementar()
+
+    def proximo_jpeg(self, versao: int, timeout: float = 5.0):
+        """
+        Espera um JPEG mais novo que `versao`. Retorna (versao, jpeg), com jpeg None no timeout.
+        """
+        with self._novo_jpeg:
+            if not self._novo_jpeg.wait_for(lambda: self._versao != versao, timeout=timeout):
+                return versao, None
+            return self._versao, self._jpeg
+
+    def fechar(self) -> None:
+        """
+        Remove a prévia; a janela é fechada pela thread de renderização na próxima volta.
+        """
+        with _cond:
+            if self in _previas:
+                _previas.remove(self)
+            _cond.notify()
+
+
+def _iniciar_thread() -> None:
+    global _thread
+    with _cond:
+        if _thread is None:
+            _thread = threading.Thread(target=_executar, name='previa', daemon=True)
+            _thread.start()
+
+
+def _executar() -> None:
+    janelas_abertas = set()
+    while True:
+        with _cond:
+            # Acorda pelo menos a cada 100 ms para manter as janelas respondendo
+            _cond.wait(timeout=0.1)
+            previas = list(_previas)
+        codificar = _servidor is not None
+        for previa in previas:
+            try:
+                previa._renderizar(codificar)
+            except Exception:
+                logging.exception(f"Erro ao renderizar a prévia de {previa.nome}")
+            if previa.janela:
+                janelas_abertas.add(previa.nome)
+        for nome in janelas_abertas - {p.nome for p in previas if p.janela}:
+            cv2.destroyWindow(nome)
+        janelas_abertas &= {p.nome for p in previas if p.janela}
+        if janelas_abertas and cv2.waitKey(1) & 0xFF == ord('q'):
+            logging.info("Saída pedida pelo operador ('q').")
+            SAIR.set()
+
+
+def iniciar_servidor_previa(porta: int = PREVIA_PORTA, host: str = PREVIA_HOST) -> Optional[threading.Thread]:
+    """
+    Sobe o MJPEG das prévias em uma thread (Flask): GET /previa/<n> (multipart/x-mixed-replace,
+    para um <img> do front-end) e GET /previa/<n>.jpg (último quadro). Não faz nada se `porta` for 0.
+    """
+    global _servidor
+    if not porta or _servidor is not None:
+        return _servidor
+
+    from flask import Flask, Response, abort
+
+    app = Flask('previa')
+
+    def obter(indice: int) -> PreviaDeteccoes:
+        with _cond:
+            if indice >= len(_previas):
+                abort(404)
+            return _previas[indice]
+
+    @app.route('/previa/<int:indice>')
+    def mjpeg(indice):
+        previa = obter(indice)
+
+        def gerar():
+            versao = -1
+            while True:
+                versao, jpeg = previa.proximo_jpeg(versao)
+                if jpeg is None:
+                    continue
+                yield (b'--quadro\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                       + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+        return Response(gerar(), mimetype='multipart/x-mixed-replace; boundary=quadro')
+
+    @app.route('/previa/<int:indice>.jpg')
+    def jpg(indice):
+        previa = obter(indice)
+        if previa._jpeg is None:
+            abort(404)
+        return Response(previa._jpeg, mimetype='image/jpeg')
+
+    _servidor = threading.Thread(target=app.run,
+                                 kwargs={'host': host, 'port': porta, 'threaded': True, 'use_reloader': False},
+                                 daemon=True)
+    _servidor.start()
+    logging.info(f"Prévia MJPEG disponível em http://{host}:{porta}/previa/0")
+    return _servidor
+
+
+def criar_previa(nome: str, rotacionar: bool = True) -> Optional[PreviaDeteccoes]:
+    """
+    Prévia conforme EXIBICAO e PREVIA_PORTA; None em modo headless sem MJPEG (nada é desenhado).
+    """
+    if EXIBICAO == 'headless' and not PREVIA_PORTA:
+        return None
+    iniciar_servidor_previa()
+    return PreviaDeteccoes(nome, rotacionar=rotacionar)
@@ -0,0 +1,184 @@
+import json
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Optional
+
+import pika
+from pika.exceptions import AMQPError, NackError, UnroutableError
+
+
+class PublicadorRabbitMQ:
+    """
+    Publicador RabbitMQ de longa duração.
+
+    Mantém uma conexão e um canal persistentes (com publisher confirms) e drena uma fila
+    de saída limitada em uma thread própria, de modo que `publicar` nunca bloqueia quem chama.
+    Em caso de queda, reconecta com backoff exponencial e reenvia a mensagem pendente.
+
+    `connection_factory` recebe um `pika.ConnectionParameters` e devolve um objeto com a
+    interface de `pika.BlockingConnection`; permite trocar o broker por um substituto em memória.
+    """
+
+    def __init__(self, host: str, user: str, password: str,
+                 tamanho_fila: int = 1000,
+                 backoff_inicial: float = 0.5,
+                 backoff_maximo: float = 30.0,
+                 on_enviada: Optional[Callable[[str, Dict], None]] = None,
+                 connection_factory: Optional[Callable] = None):
+        credentials = pika.PlainCredentials(user, password)
+        self.parameters = pika.ConnectionParameters(host=host, credentials=credentials, heartbeat=600)
+        self.host = host
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.on_enviada = on_enviada
+        self.connection_factory = connection_factory or pika.BlockingConnection
+
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+        self._connection = None
+        self._channel = None
+        self._filas_declaradas = set()
+
+        # Contadores para monitoramento
+        self.enviadas = 0
+        self.descartadas = 0
+        self.falhas = 0
+        self.conexoes = 0
+        self.reconexoes = 0
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def publicar(self, fila: str, message: Dict) -> bool:
+        """
+        Enfileira a mensagem para envio sem bloquear.
+        Se a fila de saída estiver cheia, descarta a mensagem mais antiga para abrir espaço.
+        """
+        item = (fila, message)
+        try:
+            self._fila.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        try:
+            descartada = self._fila.get_nowait()
+            self.descartadas += 1
+            logging.error(f"Fila de saída cheia. Mensagem descartada: {descartada}")
+        except queue.Empty:
+            pass
+
+        try:
+            self._fila.put_nowait(item)
+            return True
+        except queue.Full:
+            self.descartadas += 1
+            logging.error(f"Fila de saída cheia. Mensagem descartada: {item}")
+            return False
+
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    def _conectar(self) -> None:
+        self._connection = self.connection_factory(self.parameters)
+        self._channel = self._connection.channel()
+        self._channel.confirm_delivery()
+        self._filas_declaradas.clear()
+
+    def _fechar(self) -> None:
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def _garantir_conexao(self) -> bool:
+        """
+        Reconecta com backoff exponencial até conseguir ou até o publicador ser parado.
+        Qualquer erro ao abrir a conexão ou o canal (ex.: ChannelClosed no confirm_delivery) é
+        registrado e tentado de novo: a thread de envio nunca termina por causa dele.
+        """
+        espera = self.backoff_inicial
+        while self._connection is None or not self._connection.is_open:
+            if self.stop_event.is_set():
+                return False
+            try:
+                self._conectar()
+            except AMQPError as e:
+                logging.error(f"Erro de conexão com o RabbitMQ: {e!r}. Nova tentativa em {espera:.1f}s.")
+            except Exception:
+                logging.exception(f"Erro inesperado ao conectar ao RabbitMQ. Nova tentativa em {espera:.1f}s.")
+            else:
+                if self.conexoes:
+                    self.reconexoes += 1
+                    logging.info(f"Publicador reconectado ao RabbitMQ em {self.host}.")
+                self.conexoes += 1
+                continue
+            self._fechar()
+            self.stop_event.wait(espera)
+            espera = min(espera * 2, self.backoff_maximo)
+        return True
+
+    def _enviar(self, fila: str, message: Dict) -> None:
+        if fila not in self._filas_declaradas:
+            self._channel.queue_declare(queue=fila, durable=True)
+            self._filas_declaradas.add(fila)
+        self._channel.basic_publish(
+            exchange='',
+            routing_key=fila,
+            body=json.dumps(message),
+            properties=pika.BasicProperties(delivery_mode=2,)
+        )
+
+    def _loop(self) -> None:
+        pendente = None
+        while not self.stop_event.is_set() or pendente is not None or not self._fila.empty():
+            if pendente is None:
+                try:
+                    pendente = self._fila.get(timeout=1)
+                except queue.Empty:
+                    # Mantém o heartbeat da conexão ociosa em dia
+                    if self._connection is not None and self._connection.is_open:
+                        try:
+                            self._connection.process_data_events(time_limit=0)
+                        except AMQPError:
+                            self._fechar()
+                    continue
+
+            if not self._garantir_conexao():
+                break
+
+            fila, message = pendente
+            try:
+                self._enviar(fila, message)
+                self.enviadas += 1
+                pendente = None
+                if self.on_enviada:
+                    self.on_enviada(fila, message)
+            except (NackError, UnroutableError) as e:
+                # O broker recusou a mensagem; não adianta reenviar indefinidamente
+                self.falhas += 1
+                logging.error(f"Mensagem recusada pelo RabbitMQ: {e}")
+                pendente = None
+            except AMQPError as e:
+                self.falhas += 1
+                logging.error(f"Falha ao publicar mensagem, reconectando: {e}")
+                self._fechar()
+            except Exception:
+                self.falhas += 1
+                logging.exception("Erro ao enviar mensagem")
+                pendente = None
+
+        if pendente is not None:
+            logging.error(f"Publicador encerrado com mensagem pendente: {pendente}")
+        self._fechar()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """
+        Tenta drenar a fila de saída e encerra a conexão.
+        """
+        self.stop_event.set()
+        self.thread.join(timeout)
@@ -0,0 +1,161 @@
+import itertools
+import os
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from contagem import RastreadorIoU
+from deteccoes import Deteccoes
+
+# Parâmetros do rastreamento de defeitos
+DEFEITO_IOU = float(os.getenv('DEFEITO_IOU', '0.3'))                    # IoU mínimo para associar caixas entre quadros
+DEFEITO_MAX_FALHAS = int(os.getenv('DEFEITO_MAX_FALHAS', '15'))         # quadros sem detecção antes de encerrar o rastro
+DEFEITO_MIN_QUADROS = int(os.getenv('DEFEITO_MIN_QUADROS', '3'))        # quadros com o defeito antes do alerta
+DEFEITO_COOLDOWN_S = float(os.getenv('DEFEITO_COOLDOWN_S', '5'))        # intervalo mínimo entre alertas da mesma classe
+
+
+class RastroDefeito:
+    """
+    Um defeito físico acompanhado entre quadros, com o resumo usado no registro consolidado.
+    `numero` só é atribuído quando o rastro é confirmado (`min_quadros` quadros).
+    """
+
+    def __init__(self, classe: str, momento: float):
+        self.numero: Optional[int] = None
+        self.classe = classe
+        self.inicio = momento
+        self.fim = momento
+        self.quadros = 0
+        self.conf_max = 0.0
+        self.bbox: List[float] = []
+        self.alertado = False
+        self.momento_alerta: Optional[float] = None
+        self.agrupado_com: Optional[int] = None
+        self.arquivo: Optional[str] = None
+
+    def registrar(self, momento: float, bbox: np.ndarray, conf: float) -> None:
+        self.fim = momento
+        self.quadros += 1
+        if conf >= self.conf_max:
+            self.conf_max = conf
+            self.bbox = [round(float(v), 1) for v in bbox]
+
+    def resumo(self) -> Dict:
+        return {
+            'numero': self.numero,
+            'classe': self.classe,
+            'inicio': self.inicio,
+            'fim': self.fim,
+            'duracao_s': round(self.fim - self.inicio, 3),
+            'quadros': self.quadros,
+            'conf_max': round(self.conf_max, 3),
+            'bbox': self.bbox,
+            'alertado': self.alertado,
+            'agrupado_com': self.agrupado_com,
+            'arquivo': self.arquivo,
+        }
+
+
+class RastreadorDefeitos:
+    """
+    Transforma as caixas de defeito de cada quadro em defeitos físicos, para alertar uma vez por defeito.
+
+    Cada classe tem seu próprio RastreadorIoU (caixas de classes diferentes nunca se associam).
+    Um rastro vira defeito depois de `min_quadros` quadros, o que ignora caixas de um quadro só,
+    e sobrevive a até `max_falhas` quadros sem detecção. `atualizar` devolve os rastros que
+    acabaram de ser confirmados e devem gerar alerta; um rastro confirmado menos de
+    `cooldown_s` depois do último alerta da mesma classe é agrupado a ele, sem novo alerta.
+    Quando um rastro confirmado termina, `on_encerrado` recebe o rastro para o registro consolidado.
+    """
+
+    def __init__(self, iou_minimo: float = DEFEITO_IOU, max_falhas: int = DEFEITO_MAX_FALHAS,
+                 min_quadros: int = DEFEITO_MIN_QUADROS, cooldown_s: float = DEFEITO_COOLDOWN_S,
+                 on_encerrado: Optional[Callable[[RastroDefeito], None]] = None):
+        self.iou_minimo = iou_minimo
+        self.max_falhas = max_falhas
+        self.min_quadros = min_quadros
+        self.cooldown_s = cooldown_s
+        self.on_encerrado = on_encerrado
+        self._rastreadores: Dict[str, RastreadorIoU] = {}
+        self._rastros: Dict[str, Dict[int, RastroDefeito]] = {}
+        self._ultimo_alerta: Dict[str, RastroDefeito] = {}
+        self._numeros = itertools.count(1)
+
+        # Contadores para monitoramento
+        self.confirmados = 0
+        self.alertas = 0
+        self.agrupados = 0
+
+    def atualizar(self, deteccoes: Deteccoes, momento: float) -> List[RastroDefeito]:
+        """
+        Recebe só as caixas de defeito do quadro e retorna os defeitos que devem gerar alerta agora.
+        """
+        por_classe: Dict[str, List[int]] = {}
+        for cls_id in np.unique(deteccoes.cls):
+            por_classe.setdefault(deteccoes.names[int(cls_id)], []).append(int(cls_id))
+        alertar = []
+        # Classes sem caixa neste quadro também são atualizadas, para contar a falha dos seus rastros
+        for classe in set(por_classe) | set(self._rastros):
+            ids_classe = por_classe.get(classe)
+            if ids_classe:
+                daclasse = deteccoes.filtrar(np.isin(deteccoes.cls, ids_classe))
+            else:
+                daclasse = Deteccoes.vazia(deteccoes.names)
+            alertar.extend(self._atualizar_classe(classe, daclasse, momento))
+        return alertar
+
+    def _atualizar_classe(self, classe: str, deteccoes: Deteccoes, momento: float) -> List[RastroDefeito]:
+        rastreador = self._rastreadores.get(classe)
+        if rastreador is None:
+            rastreador = RastreadorIoU(self.iou_minimo, self.max_falhas, self.min_quadros)
+            self._rastreadores[classe] = rastreador
+        rastros = self._rastros.setdefault(classe, {})
+
+        ids = rastreador.atualizar(deteccoes.xyxy)
+        for id_rastro, bbox, conf in zip(ids, deteccoes.xyxy, deteccoes.conf):
+            rastro = rastros.get(int(id_rastro))
+            if rastro is None:
+                rastro = rastros[int(id_rastro)] = RastroDefeito(classe, momento)
+            rastro.registrar(momento, bbox, float(conf))
+
+        alertar = []
+        for id_rastro, acertos in zip(rastreador.ids, rastreador.acertos):
+            rastro = rastros[int(id_rastro)]
+            if rastro.numero is None and acertos >= self.min_quadros:
+                alertar.extend(self._confirmar(rastro, momento))
+
+        # Rastros que o RastreadorIoU removeu terminaram
+        vivos = set(int(i) for i in rastreador.ids)
+        for id_rastro in [i for i in rastros if i not in vivos]:
+            rastro = rastros.pop(id_rastro)
+            if rastro.numero is not None and self.on_encerrado:
+                self.on_encerrado(rastro)
+        if not rastros:
+            del self._rastros[classe]
+            del self._rastreadores[classe]
+        return alertar
+
+    def _confirmar(self, rastro: RastroDefeito, momento: float) -> List[RastroDefeito]:
+        rastro.numero = next(self._numeros)
+        self.confirmados += 1
+        anterior = self._ultimo_alerta.get(rastro.classe)
+        if anterior is not None and momento - anterior.momento_alerta < self.cooldown_s:
+            rastro.agrupado_com = anterior.numero
+            self.agrupados += 1
+            return []
+        rastro.alertado = True
+        rastro.momento_alerta = momento
+        self._ultimo_alerta[rastro.classe] = rastro
+        self.alertas += 1
+        return [rastro]
+
+    def encerrar(self) -> None:
+        """
+        Encerra todos os rastros abertos (fim da inspeção), entregando os confirmados a `on_encerrado`.
+        """
+        for rastros in self._rastros.values():
+            for rastro in rastros.values():
+                if rastro.numero is not None and self.on_encerrado:
+                    self.on_encerrado(rastro)
+        self._rastros.clear()
+        self._rastreadores.clear()
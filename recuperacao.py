@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+from captura import EstatisticasLatencia
+
+# Timeout de leitura aplicado ao procurar o primeiro quadro, para não ficar preso no select() do V4L2 (ms)
+CAPTURA_TIMEOUT_LEITURA_MS = int(os.getenv('CAPTURA_TIMEOUT_LEITURA_MS', '1000'))
+
+
+def aguardar_primeiro_quadro(dispositivo: str, timeout: float, fps: int = 15, intervalo: float = 0.1,
+                             abrir: Optional[Callable[[], cv2.VideoCapture]] = None) -> Optional[cv2.VideoCapture]:
+    """
+    Abre o dispositivo de vídeo e tenta ler até que chegue o primeiro quadro ou `timeout` se esgote.
+    Retorna a captura já aberta (pronta para uso) ou None. `abrir` substitui o `cv2.VideoCapture`
+    (ex.: ingestão direta do scrcpy).
+    """
+    parametros = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, CAPTURA_TIMEOUT_LEITURA_MS,
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, CAPTURA_TIMEOUT_LEITURA_MS]
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if abrir is not None or os.path.exists(dispositivo):
+            cap = abrir() if abrir else cv2.VideoCapture(dispositivo, cv2.CAP_ANY, parametros)
+            if cap.isOpened():
+                cap.set(cv2.CAP_PROP_FPS, fps)
+                while time.monotonic() < limite and cap.isOpened():
+                    ok, _ = cap.read()
+                    if ok:
+                        return cap
+            cap.release()
+        time.sleep(intervalo)
+    return None
+
+
+class RecuperacaoEscalonada:
+    """
+    Recuperação da captura em etapas, da mais barata para a mais cara.
+
+    Cada etapa é `(nome, acao, timeout)`: `acao(timeout)` tenta recuperar e retorna True se o
+    primeiro quadro chegou dentro do timeout. A primeira etapa que funcionar encerra a
+    recuperação. O tempo de cada etapa fica registrado em `tempos[nome]` (MTTR por etapa).
+
+    Se todas as etapas falharem, uma nova recuperação é agendada com backoff exponencial
+    (`backoff_inicial` até `backoff_maximo`), até uma dar certo ou `parar`. Um pedido que chega
+    enquanto uma recuperação está em andamento não é perdido: ela é executada de novo ao terminar.
+    """
+
+    def __init__(self, etapas: List[Tuple[str, Callable[[float], bool], float]],
+                 on_concluida: Optional[Callable[[Optional[str], float, Dict[str, float]], None]] = None,
+                 backoff_inicial: float = 1.0, backoff_maximo: float = 60.0):
+        self.etapas = etapas
+        self.on_concluida = on_concluida
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self._lock = threading.Lock()
+        self._em_andamento = False
+        self._pendente = False
+        self._parado = False
+        self._espera = backoff_inicial
+        self._timer: Optional[threading.Timer] = None
+
+        self.tempos: Dict[str, EstatisticasLatencia] = {nome: EstatisticasLatencia(100) for nome, _, _ in etapas}
+        self.tempo_total = EstatisticasLatencia(100)
+        self.sucessos: Dict[str, int] = {nome: 0 for nome, _, _ in etapas}
+        self.falhas = 0
+        self.execucoes = 0
+
+    def recuperar(self) -> Optional[str]:
+        """
+        Executa as etapas em ordem. Retorna o nome da etapa que recuperou a captura, ou None
+        (inclusive quando o pedido ficou para depois da recuperação em andamento).
+        """
+        with self._lock:
+            if self._parado:
+                return None
+            if self._em_andamento:
+                self._pendente = True
+                logging.info("Recuperação já em andamento; será executada de novo ao terminar.")
+                return None
+            self._em_andamento = True
+            if self._timer is not None:
+                # Pedido antes do agendado: o agendamento fica sem efeito
+                self._timer.cancel()
+                self._timer = None
+
+        recuperada = None
+        try:
+            recuperada = self._executar()
+        finally:
+            with self._lock:
+                self._em_andamento = False
+                pendente, self._pendente = self._pendente, False
+                if recuperada:
+                    self._espera = self.backoff_inicial
+                    if pendente:
+                        self._agendar(0)
+                elif not self._parado:
+                    # Sem recuperação, a estação nunca voltaria sozinha: tenta de novo mais tarde
+                    espera = 0 if pendente else self._espera
+                    self._espera = min(self._espera * 2, self.backoff_maximo)
+                    logging.warning(f"Nova tentativa de recuperação em {espera:.1f} s.")
+                    self._agendar(espera)
+        return recuperada
+
+    def _agendar(self, espera: float) -> None:
+        """
+        Agenda `recuperar` em outra thread. Chamar com o lock.
+        """
+        self._timer = threading.Timer(espera, self.recuperar)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _executar(self) -> Optional[str]:
+        self.execucoes += 1
+        inicio = time.monotonic()
+        duracoes: Dict[str, float] = {}
+        recuperada = None
+        for nome, acao, timeout in self.etapas:
+            inicio_etapa = time.monotonic()
+            try:
+                ok = acao(timeout)
+            except Exception:
+                logging.exception(f"Erro na etapa de recuperação '{nome}'")
+                ok = False
+            duracao = time.monotonic() - inicio_etapa
+            duracoes[nome] = round(duracao, 3)
+            self.tempos[nome].registrar(duracao)
+            logging.info(f"Recuperação: etapa '{nome}' {'recuperou' if ok else 'falhou'} em {duracao:.2f} s")
+            if ok:
+                recuperada = nome
+                self.sucessos[nome] += 1
+                break
+
+        total = time.monotonic() - inicio
+        if recuperada:
+            self.tempo_total.registrar(total)
+        else:
+            self.falhas += 1
+            logging.error(f"Recuperação falhou em todas as etapas após {total:.2f} s")
+        if self.on_concluida:
+            try:
+                self.on_concluida(recuperada, total, duracoes)
+            except Exception:
+                logging.exception("Erro ao notificar o fim da recuperação")
+        return recuperada
+
+    def parar(self) -> None:
+        """
+        Cancela a próxima tentativa agendada e ignora novos pedidos.
+        """
+        with self._lock:
+            self._parado = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def estatisticas(self) -> dict:
+        return {
+            'sucessos': dict(self.sucessos),
+            'falhas': self.falhas,
+            'total': self.tempo_total.resumo(),
+            'etapas': {nome: tempos.resumo() for nome, tempos in self.tempos.items()},
+        }
@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime
+from typing import Optional
+
+# Configuração dos logs em JSON lines: logs/<data>/<prefixo>_<data>.jsonl
+LOG_DIRETORIO = os.getenv('LOG_DIRETORIO', 'logs')
+LOG_NIVEL = os.getenv('LOG_NIVEL', 'INFO')
+LOG_NIVEL_CONSOLE = os.getenv('LOG_NIVEL_CONSOLE', 'INFO')
+LOG_MAX_MB = int(os.getenv('LOG_MAX_MB', '50'))          # tamanho máximo de cada arquivo antes de rotacionar
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', '10'))        # arquivos rotacionados mantidos por dia
+
+# Campos estáveis extraídos da mensagem registrada por `log_message`
+CAMPOS_MENSAGEM = {
+    'itemId': ('itemId',),
+    'count': ('count', 'quantity'),
+    'model': ('model',),
+    'latency': ('latencia_ms',),
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_manipulador: Optional[logging.Handler] = None
+
+
+class FormatadorJsonLinhas(logging.Formatter):
+    """
+    Um objeto JSON por linha, com campos estáveis para análise de throughput:
+    ts, level, thread, msg e, quando presentes, ip, queue, status, itemId, count, latency, model e data.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for campo in ('ip', 'queue', 'status'):
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                registro[campo] = valor
+        dados = getattr(record, 'dados', None)
+        if isinstance(dados, dict):
+            for campo, chaves in CAMPOS_MENSAGEM.items():
+                for chave in chaves:
+                    if chave in dados:
+                        registro[campo] = dados[chave]
+                        break
+            registro['data'] = dados
+        if record.exc_info:
+            registro['exc'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class ArquivoRotativoDiario(logging.handlers.RotatingFileHandler):
+    """
+    Arquivo em `<diretorio>/<data>/<prefixo>_<data>.jsonl`, que troca de pasta quando a data muda
+    (processos que passam da meia-noite) e rotaciona por tamanho dentro do dia (.1, .2, ...).
+    """
+
+    def __init__(self, diretorio: str, prefixo: str, max_bytes: int, backups: int):
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.data = datetime.now().strftime('%Y-%m-%d')
+        # Data do registro que pediu a troca de dia (shouldRollover → doRollover)
+        self._data_rolagem: Optional[str] = None
+        super().__init__(self._caminho(self.data), maxBytes=max_bytes, backupCount=backups,
+                         encoding='utf-8', delay=True)
+
+    def _caminho(self, data: str) -> str:
+        pasta = os.path.join(self.diretorio, data)
+        os.makedirs(pasta, exist_ok=True)
+        return os.path.abspath(os.path.join(pasta, f'{self.prefixo}_{data}.jsonl'))
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        # A data vem do registro, não do relógio: um registro atrasado (fila do listener) perto da
+        # meia-noite não troca de arquivo. Só uma data mais nova troca; registros do dia anterior
+        # que chegam depois da troca ficam no arquivo atual.
+        data = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d')
+        if data > self.data:
+            self._data_rolagem = data
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        data, self._data_rolagem = self._data_rolagem, None
+        if data is None:
+            super().doRollover()
+            return
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.data = data
+        self.baseFilename = self._caminho(data)
+
+
+class ManipuladorFila(logging.handlers.QueueHandler):
+    """
+    QueueHandler que só enfileira o registro: formatação, JSON e escrita ficam na thread do listener.
+    Como a fila é do próprio processo, o registro não precisa ser copiado nem serializado aqui.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configurar_logging(prefixo: str = 'rabbitmq_logs', diretorio: str = LOG_DIRETORIO,
+                       nivel: str = LOG_NIVEL, nivel_console: str = LOG_NIVEL_CONSOLE,
+                       max_mb: int = LOG_MAX_MB, backups: int = LOG_BACKUPS) -> None:
+    """
+    Liga o root logger a uma fila; um listener grava JSON lines com rotação e escreve no console.
+    Chamadas repetidas (várias estações no mesmo processo) não duplicam os handlers.
+    """
+    global _listener, _manipulador
+    if _listener is not None:
+        return
+
+    arquivo = ArquivoRotativoDiario(diretorio, prefixo, max_mb * 1024 * 1024, backups)
+    arquivo.setFormatter(FormatadorJsonLinhas())
+    arquivo.setLevel(nivel)
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    console.setLevel(nivel_console)
+
+    fila = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    raiz.setLevel(min(logging.getLevelName(nivel), logging.getLevelName(nivel_console)))
+    _manipulador = ManipuladorFila(fila)
+    raiz.addHandler(_manipulador)
+
+    _listener = logging.handlers.QueueListener(fila, arquivo, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(encerrar_logging)
+
+
+def encerrar_logging() -> None:
+    """
+    Esvazia a fila e fecha os arquivos (chamado automaticamente na saída do processo).
+    """
+    global _listener, _manipulador
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_manipulador)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _manipulador = None
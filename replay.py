@@ -0,0 +1,331 @@
+"""
+Replay offline do core_back: o YOLOProcessor real, alimentado por um vídeo (ou pasta de imagens)
+gravado e por um roteiro de mensagens da fila_recebimento, sem óculos, adb, scrcpy, v4l2loopback,
+GPU ou RabbitMQ. Os resultados publicados vão para um BrokerMemoria e são conferidos com o roteiro.
+
+Roteiro (JSON lines), um pedido por linha:
+
+    {"t": 0.0, "mensagem": {"itemId": "CAIXA", "quantity": 3, "model": "CAIXA"}, "esperado": 3}
+
+`t` é o instante de entrega em segundos desde o início (padrão 0: entregue logo, ativado quando o
+item anterior terminar) e `esperado` a contagem correta (padrão: `quantity`). A gravação só começa
+a ser reproduzida quando o primeiro pedido é ativado e confirmado, como no início de um pedido na
+estação (a câmera começa a mostrar a bandeja com o item já esperado). Uso:
+
+    YOLO_BACKEND=cpu python replay.py gravacao.mp4 roteiro.jsonl --ritmo sincronizado --json saida.json
+
+Ritmos da fonte: "tempo-real" (FPS do vídeo, como a câmera; mede descartes), "sincronizado"
+(cada quadro só depois que o anterior foi lido: determinístico, bom para CI) e "maximo".
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# O replay nunca abre janela; a prévia MJPEG continua disponível se PREVIA_PORTA for definida
+os.environ.setdefault('EXIBICAO', 'headless')
+
+import cv2
+import numpy as np
+
+from broker_memoria import BrokerMemoria
+from consumidor import FilaPedidos, ler_pedido
+from registro import configurar_logging
+
+RITMOS = ('tempo-real', 'sincronizado', 'maximo')
+
+
+class FonteReplay:
+    """
+    Vídeo ou pasta de imagens (.jpg/.png, em ordem de nome) com a interface de `cv2.VideoCapture`
+    usada pela captura (`isOpened`, `read(image)`, `get`, `set`, `release`).
+
+    No ritmo "sincronizado", `aguardar` (ex.: `FrameRingBuffer.aguardar_leitura`) é chamado antes
+    de cada quadro, então a inferência vê todos os quadros, um de cada vez. Ao fim da origem,
+    `esgotada` fica True e `read` passa a falhar (ou recomeça, com `repetir`). Enquanto `iniciada`
+    não for sinalizado, `read` espera (o replay libera a fonte ao ativar o primeiro pedido).
+    """
+
+    def __init__(self, origem: str, ritmo: str = 'tempo-real', fps: float = 0, repetir: bool = False,
+                 limite: int = 0):
+        if ritmo not in RITMOS:
+            raise ValueError(f"Ritmo desconhecido: {ritmo}. Opções: {', '.join(RITMOS)}")
+        self.origem = origem
+        self.ritmo = ritmo
+        self.repetir = repetir
+        self.limite = limite
+        self.aguardar = None
+        self.iniciada = threading.Event()
+        self.iniciada.set()
+        self.esgotada = False
+        self.lidos = 0
+
+        self._imagens: Optional[List[str]] = None
+        self._cap = None
+        if os.path.isdir(origem):
+            self._imagens = sorted(glob.glob(os.path.join(origem, '*.jpg')) + glob.glob(os.path.join(origem, '*.png')))
+            if not self._imagens:
+                raise IOError(f"Nenhuma imagem encontrada em {origem}.")
+            self.fps = fps or 15
+        else:
+            self._cap = cv2.VideoCapture(origem)
+            if not self._cap.isOpened():
+                raise IOError(f"Não foi possível abrir {origem}.")
+            self.fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or 15
+        self._indice = 0
+        self._proximo = time.monotonic()
+
+    def isOpened(self) -> bool:
+        return self._imagens is not None or (self._cap is not None and self._cap.isOpened())
+
+    def _ler(self, image: Optional[np.ndarray]):
+        if self.limite and self._indice >= self.limite:
+            return False, None
+        if self._imagens is not None:
+            if self._indice >= len(self._imagens):
+                return False, None
+            frame = cv2.imread(self._imagens[self._indice])
+            return frame is not None, frame
+        if image is not None:
+            return self._cap.read(image)
+        return self._cap.read()
+
+    def read(self, image: Optional[np.ndarray] = None):
+        self.iniciada.wait()
+        if self.ritmo == 'sincronizado' and self.aguardar is not None:
+            while not self.aguardar(0.5):
+                pass
+        elif self.ritmo == 'tempo-real':
+            espera = self._proximo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._proximo = max(self._proximo + 1.0 / self.fps, time.monotonic())
+
+        ok, frame = self._ler(image)
+        if not ok and self.repetir and self._indice:
+            self.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._ler(image)
+        if not ok:
+            self.esgotada = True
+            # Evita que a captura gire em falso depois do fim da origem
+            time.sleep(0.05)
+            return False, None
+        self._indice += 1
+        self.lidos += 1
+        return True, frame
+
+    def get(self, propriedade: int) -> float:
+        if propriedade == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self._cap.get(propriedade) if self._cap is not None else 0.0
+
+    def set(self, propriedade: int, valor: float) -> bool:
+        if propriedade == cv2.CAP_PROP_POS_FRAMES and self.repetir:
+            self._indice = int(valor)
+            if self._cap is not None:
+                self._cap.set(propriedade, valor)
+            return True
+        return False
+
+    def release(self) -> None:
+        if self._cap is not None:
+            self._cap.release()
+
+
+def ler_roteiro(caminho: str) -> List[Dict]:
+    roteiro = []
+    with open(caminho) as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha or linha.startswith('#'):
+                continue
+            item = json.loads(linha)
+            mensagem = item['mensagem']
+            roteiro.append({
+                't': float(item.get('t', 0.0)),
+                'mensagem': mensagem,
+                'esperado': item.get('esperado', mensagem.get('quantity')),
+            })
+    return roteiro
+
+
+def conferir(roteiro: List[Dict], resultados: List[Dict]) -> Dict:
+    """
+    Compara os resultados publicados, na ordem, com o item e a contagem esperados de cada pedido.
+    """
+    detalhes = []
+    for i, item in enumerate(roteiro):
+        resultado = resultados[i] if i < len(resultados) else None
+        esperado_item = str(item['mensagem'].get('itemId', '')).upper()
+        correto = (resultado is not None and resultado.get('itemId') == esperado_item
+                   and resultado.get('count') == item['esperado'])
+        detalhes.append({'itemId': esperado_item, 'esperado': item['esperado'],
+                         'recebido': None if resultado is None else resultado.get('count'), 'correto': correto})
+    return {
+        'pedidos': len(roteiro),
+        'respondidos': min(len(resultados), len(roteiro)),
+        'corretos': sum(1 for d in detalhes if d['correto']),
+        'extras': max(0, len(resultados) - len(roteiro)),
+        'detalhes': detalhes,
+    }
+
+
+def memoria_mb() -> Dict:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    atual = 0.0
+    try:
+        with open('/proc/self/statm') as arquivo:
+            atual = int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (OSError, ValueError, IndexError):
+        pass
+    return {'rss_mb': round(atual, 1), 'pico_rss_mb': round(pico, 1)}
+
+
+def executar_replay(origem: str, roteiro: List[Dict], ritmo: str = 'sincronizado', fps: float = 0,
+                    repetir: bool = False, limite: int = 0, timeout: float = 300.0,
+                    ocioso: float = 5.0, backend=None, modelos=None) -> Dict:
+    """
+    Roda o pipeline completo sobre a gravação e devolve o relatório (throughput, latências por etapa,
+    latência de decisão, memória e conferência das mensagens). `backend` e `modelos` substituem os
+    do YOLOProcessor (padrão: YOLO_BACKEND e YOLO_MODEL_BASE_PATH).
+    """
+    from core_back import YOLOProcessor
+
+    broker = BrokerMemoria()
+    fonte = FonteReplay(origem, ritmo, fps, repetir, limite)
+    # O primeiro quadro só é lido depois que o primeiro pedido foi ativado e confirmado
+    fila = FilaPedidos(on_confirmado=lambda pedido: fonte.iniciada.set())
+    if roteiro:
+        fonte.iniciada.clear()
+    processor = YOLOProcessor(janela='REPLAY', video_device=origem, fonte=lambda: fonte,
+                              connection_factory=broker.conexao, consumidor=fila,
+                              modelos=modelos, backend=backend)
+    fila.on_previsto = processor.modelos.preload
+    if ritmo == 'sincronizado':
+        fonte.aguardar = processor.frame_buffer.aguardar_leitura
+
+    # Modelos do roteiro carregados antes de começar: o tempo de carga fica fora do throughput
+    inicio_carga = time.monotonic()
+    for modelo in sorted({item['mensagem'].get('model') for item in roteiro} - {None}):
+        try:
+            processor.modelos.obter(modelo)
+        except OSError:
+            logging.error(f"Modelo {modelo} do roteiro não encontrado em {processor.modelos.base_path}.")
+    carga = time.monotonic() - inicio_carga
+
+    inicio = time.monotonic()
+    entregues: List[float] = []
+
+    def entregar():
+        for item in roteiro:
+            espera = inicio + item['t'] - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            fila.entregar(ler_pedido(json.dumps(item['mensagem']).encode()))
+            entregues.append(time.monotonic() - inicio)
+
+    processor.iniciar_threads()
+    threading.Thread(target=entregar, name='roteiro', daemon=True).start()
+
+    # Espera todos os resultados, o fim da origem sem novidades por `ocioso` segundos, ou o timeout
+    tempos_resultado: List[float] = []
+    ultimo_progresso = time.monotonic()
+    ultimos_quadros = 0
+    while len(tempos_resultado) < len(roteiro):
+        agora = time.monotonic()
+        if agora - inicio > timeout:
+            logging.error(f"Replay interrompido pelo timeout de {timeout:.0f} s.")
+            break
+        if broker.aguardar(processor.fila_envio, len(tempos_resultado) + 1, timeout=0.1):
+            tempos_resultado.append(time.monotonic() - inicio)
+            ultimo_progresso = time.monotonic()
+            continue
+        if processor.quadros_processados != ultimos_quadros:
+            ultimos_quadros = processor.quadros_processados
+            ultimo_progresso = agora
+        elif fonte.esgotada and agora - ultimo_progresso > ocioso:
+            logging.warning("Fonte esgotada antes de todos os pedidos serem respondidos.")
+            break
+    duracao = time.monotonic() - inicio
+
+    # Dá tempo ao publicador de entregar o que já estava na fila
+    time.sleep(0.2)
+    resultados = [json.loads(body) for body in broker.mensagens(processor.fila_envio)]
+    relatorio = {
+        'origem': origem,
+        'ritmo': ritmo,
+        'backend': processor.backend.nome,
+        'duracao_s': round(duracao, 2),
+        'carga_modelos_s': round(carga, 2),
+        'quadros_lidos': fonte.lidos,
+        'quadros_processados': processor.quadros_processados,
+        'quadros_descartados': processor.frame_buffer.dropped,
+        'fps': round(processor.quadros_processados / duracao, 2) if duracao > 0 else 0.0,
+        'etapas': {nome: histograma.resumo() for nome, histograma in processor.etapas.items()},
+        'latencia_decisao': processor.latencia_decisao.resumo(),
+        'latencia_inferencia': processor.latencia_inferencia.resumo(),
+        'modelos': processor.modelos.estatisticas(),
+        'memoria': memoria_mb(),
+        'mensagens': conferir(roteiro, resultados),
+        'tempos_resultado_s': [round(t, 3) for t in tempos_resultado],
+        'tempos_entrega_s': [round(t, 3) for t in entregues],
+    }
+    relatorio['modelos'].pop('modelos', None)
+
+    processor.encerrar()
+    return relatorio
+
+
+def imprimir_relatorio(relatorio: Dict) -> None:
+    mensagens = relatorio['mensagens']
+    print(f"{relatorio['origem']} ({relatorio['backend']}, {relatorio['ritmo']}): "
+          f"{relatorio['quadros_processados']} quadros em {relatorio['duracao_s']} s = {relatorio['fps']} FPS, "
+          f"{relatorio['quadros_descartados']} descartados")
+    print(f"{'etapa':<18} {'n':>7} {'média ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for nome, resumo in relatorio['etapas'].items():
+        if resumo.get('n'):
+            print(f"{nome:<18} {resumo['n']:>7} {resumo['media_ms']:>9.2f} {resumo['p50_ms']:>9.2f} "
+                  f"{resumo['p99_ms']:>9.2f}")
+    decisao = relatorio['latencia_decisao']
+    if decisao.get('n'):
+        print(f"{'decisão':<18} {decisao['n']:>7} {decisao['media_ms']:>9.1f} {decisao['p50_ms']:>9.1f} "
+              f"{decisao['p99_ms']:>9.1f}")
+    print(f"memória: {relatorio['memoria']['pico_rss_mb']} MB (pico RSS)")
+    print(f"mensagens: {mensagens['corretos']}/{mensagens['pedidos']} corretas, "
+          f"{mensagens['respondidos']} respondidas, {mensagens['extras']} extras")
+    for detalhe in mensagens['detalhes']:
+        if not detalhe['correto']:
+            print(f"  {detalhe['itemId']}: esperado {detalhe['esperado']}, recebido {detalhe['recebido']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay offline do core_back a partir de gravações.")
+    parser.add_argument('origem', help="Vídeo gravado ou pasta com imagens .jpg/.png")
+    parser.add_argument('roteiro', help="Mensagens da fila_recebimento em JSON lines")
+    parser.add_argument('--ritmo', choices=RITMOS, default='sincronizado')
+    parser.add_argument('--fps', type=float, default=0, help="FPS da fonte (padrão: o do vídeo, ou 15)")
+    parser.add_argument('--repetir', action='store_true', help="Reinicia a origem ao chegar ao fim")
+    parser.add_argument('--limite', type=int, default=0, help="Máximo de quadros lidos da origem (0 = todos)")
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--json', help="Grava o relatório neste arquivo")
+    args = parser.parse_args()
+
+    configurar_logging(prefixo='replay', nivel_console='WARNING')
+    relatorio = executar_replay(args.origem, ler_roteiro(args.roteiro), args.ritmo, args.fps, args.repetir,
+                                args.limite, args.timeout)
+    imprimir_relatorio(relatorio)
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    mensagens = relatorio['mensagens']
+    sys.exit(0 if mensagens['corretos'] == mensagens['pedidos'] else 1)
+
+
+if __name__ == '__main__':
+    main()
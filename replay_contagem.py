@@ -0,0 +1,78 @@
+import argparse
+import glob
+import os
+from typing import Dict, List
+
+from contagem import CONTAGEM_JANELA, CONTAGEM_MIN_QUADROS, EstimadorContagem, ler_sessao, replay
+
+# Mesmo limite do core_back (PROCESSING_LIMIT_FRAMES = FPS * PROCESSING_LIMIT_SECONDS)
+LIMITE_QUADROS = 15 * 5
+
+
+def replay_quadro_unico(sessao: Dict, limite_quadros: int) -> Dict:
+    """
+    Regra antiga: decide no primeiro quadro cuja contagem é igual à esperada,
+    ou envia a contagem do último quadro ao atingir o limite.
+    """
+    quadros = sessao['quadros']
+    esperado = sessao.get('quantity')
+    for i, quadro in enumerate(quadros):
+        contagem = len(quadro['xyxy'])
+        if contagem == esperado or i + 1 >= limite_quadros:
+            return {'contagem': contagem, 'quadro': i + 1, 'latencia_s': quadro['t'] - quadros[0]['t']}
+    return {'contagem': len(quadros[-1]['xyxy']) if quadros else None, 'quadro': len(quadros),
+            'latencia_s': quadros[-1]['t'] - quadros[0]['t'] if quadros else 0.0}
+
+
+def resumir(nome: str, resultados: List[Dict]) -> None:
+    latencias = [r['latencia_s'] for r in resultados]
+    avaliados = [r for r in resultados if r['real'] is not None]
+    acertos = sum(1 for r in avaliados if r['contagem'] == r['real'])
+    media = sum(latencias) / len(latencias) if latencias else 0.0
+    print(f"{nome:<14} latência média {media * 1000:8.0f} ms | máx {max(latencias, default=0) * 1000:8.0f} ms | "
+          f"acurácia {acertos}/{len(avaliados)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de sessões gravadas de contagem.")
+    parser.add_argument('sessoes', nargs='+', help="Arquivos .jsonl gravados ou pastas contendo-os")
+    parser.add_argument('--janela', type=int, default=CONTAGEM_JANELA)
+    parser.add_argument('--min-quadros', type=int, default=CONTAGEM_MIN_QUADROS)
+    parser.add_argument('--limite', type=int, default=LIMITE_QUADROS)
+    args = parser.parse_args()
+
+    arquivos = []
+    for caminho in args.sessoes:
+        if os.path.isdir(caminho):
+            arquivos.extend(sorted(glob.glob(os.path.join(caminho, '*.jsonl'))))
+        else:
+            arquivos.append(caminho)
+
+    estimador = EstimadorContagem(args.janela, args.min_quadros)
+    estabilizado, quadro_unico = [], []
+
+    print(f"{'sessão':<40} {'esp.':>4} {'real':>4} | {'estab.':>6} {'ms':>6} | {'único':>6} {'ms':>6}")
+    for arquivo in arquivos:
+        sessao = ler_sessao(arquivo)
+        if not sessao['quadros']:
+            continue
+        novo = replay(sessao, estimador, args.limite)
+        antigo = replay_quadro_unico(sessao, args.limite)
+        for r in (novo, antigo):
+            r['real'] = sessao['real']
+        estabilizado.append(novo)
+        quadro_unico.append(antigo)
+
+        real = '-' if sessao['real'] is None else sessao['real']
+        print(f"{os.path.basename(arquivo)[:40]:<40} {sessao.get('quantity'):>4} {real:>4} | "
+              f"{novo['contagem']:>6} {novo['latencia_s'] * 1000:>6.0f} | "
+              f"{antigo['contagem']:>6} {antigo['latencia_s'] * 1000:>6.0f}")
+
+    if estabilizado:
+        print()
+        resumir('estabilizado', estabilizado)
+        resumir('quadro único', quadro_unico)
+
+
+if __name__ == '__main__':
+    main()
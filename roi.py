@@ -0,0 +1,129 @@
+import os
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Resolução de entrada padrão dos modelos (mesmo img_size usado em treinar_modelos.py)
+YOLO_IMG_SIZE = int(os.getenv('YOLO_IMG_SIZE', '704'))
+
+# ROI fixa em frações do quadro já rotacionado: "x1,y1,x2,y2" (ex.: "0.2,0.1,0.8,0.9"); vazio usa o quadro inteiro
+ROI = os.getenv('ROI', '')
+
+# Aprende a ROI automaticamente a partir das detecções
+ROI_AUTO = os.getenv('ROI_AUTO', '0') == '1'
+
+
+def ler_roi(texto: str) -> Optional[Tuple[float, float, float, float]]:
+    if not texto:
+        return None
+    valores = tuple(float(v) for v in texto.split(','))
+    if len(valores) != 4:
+        raise ValueError(f"ROI inválida: {texto}. Use x1,y1,x2,y2 em frações do quadro.")
+    return valores
+
+
+class PreprocessadorROI:
+    """
+    Prepara a entrada do modelo em um único passo: recorte da ROI, redimensionamento para
+    `imgsz` e rotação de 180°, escrevendo em buffers pré-alocados.
+
+    O recorte é feito no quadro original (sem cópia) na região que corresponde à ROI do
+    quadro rotacionado, então só a área reduzida é redimensionada e invertida. As caixas
+    detectadas voltam para coordenadas do quadro rotacionado com `para_quadro`.
+
+    Com `auto=True`, a ROI é aprendida: a cada `intervalo_completo` quadros a inferência roda
+    no quadro inteiro e a união das detecções (suavizada e com margem) vira a nova ROI.
+    """
+
+    def __init__(self, imgsz: int = YOLO_IMG_SIZE, roi: Optional[Sequence[float]] = None, auto: bool = False,
+                 margem: float = 0.15, suavizacao: float = 0.2, intervalo_completo: int = 30):
+        self.imgsz = imgsz
+        self.roi_fixa = tuple(roi) if roi else None
+        self.auto = auto
+        self.margem = margem
+        self.suavizacao = suavizacao
+        self.intervalo_completo = intervalo_completo
+
+        self._roi_aprendida: Optional[np.ndarray] = None   # xyxy em pixels do quadro rotacionado
+        self._quadros = 0
+        self._completo = True
+
+        self._redimensionado: Optional[np.ndarray] = None
+        self._saida: Optional[np.ndarray] = None
+        self.escala = 1.0
+        self.deslocamento = (0, 0)
+
+    def _roi_pixels(self, largura: int, altura: int) -> Tuple[int, int, int, int]:
+        if self.auto:
+            self._completo = self._roi_aprendida is None or self._quadros % self.intervalo_completo == 0
+            if not self._completo:
+                x1, y1, x2, y2 = self._roi_aprendida
+                return int(x1), int(y1), int(x2), int(y2)
+        if self.roi_fixa:
+            fx1, fy1, fx2, fy2 = self.roi_fixa
+            return int(fx1 * largura), int(fy1 * altura), int(fx2 * largura), int(fy2 * altura)
+        return 0, 0, largura, altura
+
+    def preparar(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Retorna a entrada do modelo (ROI rotacionada e redimensionada) para o quadro bruto da câmera.
+        O array retornado é reutilizado na próxima chamada.
+        """
+        altura, largura = frame.shape[:2]
+        x1, y1, x2, y2 = self._roi_pixels(largura, altura)
+        self._quadros += 1
+
+        # ROI do quadro rotacionado em 180° corresponde à região espelhada do quadro original
+        recorte = frame[altura - y2:altura - y1, largura - x2:largura - x1]
+
+        escala = min(1.0, self.imgsz / max(recorte.shape[0], recorte.shape[1]))
+        tamanho = (max(1, round(recorte.shape[1] * escala)), max(1, round(recorte.shape[0] * escala)))
+        forma = (tamanho[1], tamanho[0], frame.shape[2])
+        if self._saida is None or self._saida.shape != forma:
+            self._redimensionado = np.empty(forma, dtype=frame.dtype)
+            self._saida = np.empty(forma, dtype=frame.dtype)
+
+        if escala < 1.0:
+            cv2.resize(recorte, tamanho, dst=self._redimensionado, interpolation=cv2.INTER_AREA)
+            cv2.flip(self._redimensionado, -1, dst=self._saida)
+        else:
+            cv2.flip(recorte, -1, dst=self._saida)
+
+        self.escala = tamanho[0] / recorte.shape[1]
+        self.deslocamento = (x1, y1)
+        return self._saida
+
+    def para_quadro(self, xyxy: np.ndarray) -> np.ndarray:
+        """
+        Converte caixas da entrada do modelo para coordenadas do quadro rotacionado completo.
+        """
+        if len(xyxy) == 0:
+            return xyxy
+        dx, dy = self.deslocamento
+        return xyxy / self.escala + np.array([dx, dy, dx, dy], dtype=xyxy.dtype)
+
+    def aprender(self, xyxy_quadro: np.ndarray, largura: int, altura: int) -> None:
+        """
+        Atualiza a ROI aprendida com as detecções (em coordenadas do quadro) de uma passada completa.
+        """
+        if not self.auto or not self._completo or len(xyxy_quadro) == 0:
+            return
+        uniao = np.array([xyxy_quadro[:, 0].min(), xyxy_quadro[:, 1].min(),
+                          xyxy_quadro[:, 2].max(), xyxy_quadro[:, 3].max()], dtype=np.float64)
+        margem_x = (uniao[2] - uniao[0]) * self.margem
+        margem_y = (uniao[3] - uniao[1]) * self.margem
+        uniao += np.array([-margem_x, -margem_y, margem_x, margem_y])
+
+        if self._roi_aprendida is None:
+            roi = uniao
+        else:
+            roi = (1 - self.suavizacao) * self._roi_aprendida + self.suavizacao * uniao
+            # Nunca encolhe a ponto de cortar as detecções atuais
+            roi[:2] = np.minimum(roi[:2], uniao[:2])
+            roi[2:] = np.maximum(roi[2:], uniao[2:])
+
+        # Alinha em múltiplos de 32 px para evitar realocar buffers a cada pequena variação
+        roi[:2] = np.floor(roi[:2] / 32) * 32
+        roi[2:] = np.ceil(roi[2:] / 32) * 32
+        self._roi_aprendida = np.clip(roi, 0, [largura, altura, largura, altura])
@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from captura import EstatisticasLatencia
+
+# Tempo máximo sem um quadro válido antes de considerar a captura travada (ms)
+CAPTURA_TRAVAMENTO_MS = int(os.getenv('CAPTURA_TRAVAMENTO_MS', '2000'))
+
+# Quadros seguidos idênticos ou pretos que indicam fluxo congelado ou câmera tampada/desligada
+CAPTURA_MAX_DUPLICADOS = int(os.getenv('CAPTURA_MAX_DUPLICADOS', '30'))
+CAPTURA_MAX_PRETOS = int(os.getenv('CAPTURA_MAX_PRETOS', '30'))
+
+# Brilho médio (0-255) abaixo do qual o quadro é considerado preto
+CAPTURA_LIMIAR_PRETO = float(os.getenv('CAPTURA_LIMIAR_PRETO', '8'))
+
+
+class MonitorSaudeCaptura:
+    """
+    Saúde da captura medida no próprio loop de leitura, sem depender das mensagens do OpenCV.
+
+    A thread de captura chama `inicio_leitura` antes e `registrar` depois de cada `cap.read`.
+    Quadros idênticos ao anterior ou pretos não contam como quadros válidos. Uma thread de
+    vigilância verifica, a cada `intervalo`, há quanto tempo não chega um quadro válido; como
+    um `cap.read` travado nunca retorna, essa verificação é feita fora do loop de captura.
+
+    Acima de `travamento_ms`, ou com `max_duplicados`/`max_pretos` quadros seguidos, chama
+    `on_falha(motivo)` uma única vez e se desarma até o próximo `armar`. `on_falha` roda na thread
+    de vigilância (ou na de captura) e deve só sinalizar: a recuperação fica com outra thread.
+    """
+
+    def __init__(self, on_falha: Callable[[str], None],
+                 travamento_ms: int = CAPTURA_TRAVAMENTO_MS,
+                 max_duplicados: int = CAPTURA_MAX_DUPLICADOS,
+                 max_pretos: int = CAPTURA_MAX_PRETOS,
+                 limiar_preto: float = CAPTURA_LIMIAR_PRETO,
+                 intervalo: float = 0.1,
+                 passo_amostra: int = 16):
+        self.on_falha = on_falha
+        self.travamento = travamento_ms / 1000.0
+        self.max_duplicados = max_duplicados
+        self.max_pretos = max_pretos
+        self.limiar_preto = limiar_preto
+        self.intervalo = intervalo
+        self.passo_amostra = passo_amostra
+
+        self._lock = threading.Lock()
+        self._armado = False
+        self._ultimo_valido = 0.0
+        self._leitura_desde: Optional[float] = None
+        self._amostra: Optional[np.ndarray] = None
+        self._duplicados = 0
+        self._pretos = 0
+
+        # Métricas
+        self.latencia_leitura = EstatisticasLatencia()
+        self.intervalo_quadros = EstatisticasLatencia()
+        self.quadros = 0
+        self.quadros_duplicados = 0
+        self.quadros_pretos = 0
+        self.leituras_falhas = 0
+        self.falhas = 0
+
+        self.thread = threading.Thread(target=self._vigiar, daemon=True)
+        self.thread.start()
+
+    def armar(self) -> None:
+        """
+        Começa a vigiar (câmera recém-aberta); o prazo de travamento conta a partir daqui.
+        """
+        with self._lock:
+            self._armado = True
+            self._ultimo_valido = time.monotonic()
+            self._leitura_desde = None
+            self._amostra = None
+            self._duplicados = 0
+            self._pretos = 0
+
+    def desarmar(self) -> None:
+        with self._lock:
+            self._armado = False
+
+    def inicio_leitura(self) -> None:
+        self._leitura_desde = time.monotonic()
+
+    def registrar(self, ok: bool, frame: Optional[np.ndarray]) -> bool:
+        """
+        Registra o resultado de um `cap.read`. Retorna True se o quadro é válido (novo e não preto).
+        """
+        agora = time.monotonic()
+        if self._leitura_desde is not None:
+            self.latencia_leitura.registrar(agora - self._leitura_desde)
+            self._leitura_desde = None
+
+        if not ok or frame is None:
+            self.leituras_falhas += 1
+            return False
+
+        # Amostra esparsa: suficiente para notar quadro repetido ou preto sem varrer a imagem toda
+        amostra = frame[::self.passo_amostra, ::self.passo_amostra]
+        motivo = None
+        with self._lock:
+            duplicado = self._amostra is not None and self._amostra.shape == amostra.shape \
+                and np.array_equal(self._amostra, amostra)
+            preto = float(amostra.mean()) < self.limiar_preto
+            if self._amostra is None or self._amostra.shape != amostra.shape:
+                self._amostra = amostra.copy()
+            else:
+                np.copyto(self._amostra, amostra)
+
+            self._duplicados = self._duplicados + 1 if duplicado else 0
+            self._pretos = self._pretos + 1 if preto else 0
+            self.quadros_duplicados += duplicado
+            self.quadros_pretos += preto
+            valido = not duplicado and not preto
+            if valido:
+                self.intervalo_quadros.registrar(agora - self._ultimo_valido)
+                self._ultimo_valido = agora
+                self.quadros += 1
+
+            if self._armado:
+                if self._duplicados >= self.max_duplicados:
+                    motivo = f"{self._duplicados} quadros repetidos seguidos"
+                elif self._pretos >= self.max_pretos:
+                    motivo = f"{self._pretos} quadros pretos seguidos"
+                if motivo:
+                    self._armado = False
+        if motivo:
+            self._falhar(motivo)
+        return valido
+
+    def _vigiar(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            motivo = None
+            with self._lock:
+                if not self._armado:
+                    continue
+                parado = time.monotonic() - self._ultimo_valido
+                if parado >= self.travamento:
+                    leitura = self._leitura_desde
+                    if leitura is not None:
+                        motivo = f"leitura bloqueada há {(time.monotonic() - leitura) * 1000:.0f} ms"
+                    else:
+                        motivo = f"nenhum quadro válido há {parado * 1000:.0f} ms"
+                    self._armado = False
+            if motivo:
+                self._falhar(motivo)
+
+    def _falhar(self, motivo: str) -> None:
+        self.falhas += 1
+        logging.warning(f"Captura travada: {motivo}. {self.estatisticas()}")
+        try:
+            self.on_falha(motivo)
+        except Exception:
+            logging.exception("Erro ao tratar falha de captura")
+
+    def estatisticas(self) -> dict:
+        return {
+            'quadros': self.quadros,
+            'duplicados': self.quadros_duplicados,
+            'pretos': self.quadros_pretos,
+            'leituras_falhas': self.leituras_falhas,
+            'falhas': self.falhas,
+            'latencia_leitura': self.latencia_leitura.resumo(),
+            'intervalo_quadros': self.intervalo_quadros.resumo(),
+        }
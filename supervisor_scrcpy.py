@@ -0,0 +1,265 @@
+import ctypes
+import logging
+import os
+import select
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# Comando do scrcpy; para testes sem óculos, use o simulador: "python3 fake_scrcpy.py --video teste.mp4"
+SCRCPY_COMANDO = os.getenv('SCRCPY_COMANDO', 'scrcpy')
+FFMPEG_COMANDO = os.getenv('FFMPEG_COMANDO', 'ffmpeg')
+
+# Opções do demuxer/decoder do FFmpeg na ingestão direta (formato de OPENCV_FFMPEG_CAPTURE_OPTIONS)
+SCRCPY_FFMPEG_OPCOES = os.getenv('SCRCPY_FFMPEG_OPCOES', 'fflags;nobuffer|flags;low_delay|probesize;32768')
+
+# Como o vídeo chega ao processo: "v4l2" (scrcpy -> v4l2loopback -> OpenCV) ou
+# "direta" (scrcpy grava o H.264 em um FIFO, decodificado neste processo sem passar pelo v4l2loopback)
+SCRCPY_INGESTAO = os.getenv('SCRCPY_INGESTAO', 'v4l2')
+
+_PR_SET_PDEATHSIG = 1
+
+
+def _morrer_com_o_pai() -> None:
+    """
+    Executado no filho antes do exec: recebe SIGTERM se o processo pai morrer (mesmo com SIGKILL),
+    então nenhum scrcpy fica órfão.
+    """
+    try:
+        ctypes.CDLL('libc.so.6', use_errno=True).prctl(_PR_SET_PDEATHSIG, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+class SupervisorScrcpy:
+    """
+    Dono do processo do scrcpy: no máximo uma instância por supervisor, reiniciada com backoff
+    se terminar sozinha e encerrada de forma limpa em `parar`.
+
+    Todos os processos são lançados pela mesma thread do supervisor, que vive tanto quanto o
+    programa: o PR_SET_PDEATHSIG está ligado à thread que fez o fork, então lançar a partir de
+    threads temporárias mataria o scrcpy junto com elas.
+
+    A saída do scrcpy (stdout e stderr) é lida em uma thread: as últimas linhas ficam em
+    `ultimas_linhas` e as de erro são contadas em `erros`, para diagnóstico e métricas de saúde.
+    """
+
+    def __init__(self, nome: str = 'scrcpy', comando: str = SCRCPY_COMANDO, env: Optional[dict] = None,
+                 backoff_inicial: float = 0.5, backoff_maximo: float = 10.0, execucao_estavel: float = 10.0):
+        self.nome = nome
+        self.comando = shlex.split(comando)
+        self.env = env
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.execucao_estavel = execucao_estavel
+
+        self.processo: Optional[subprocess.Popen] = None
+        self.argumentos: Optional[List[str]] = None
+        self._ativo = False
+        self._pedido = False   # início/reinício pedido por `iniciar`, sem esperar o backoff
+        self._cond = threading.Condition()
+        self._backoff = backoff_inicial
+
+        # Saúde e métricas
+        self.ultimas_linhas = deque(maxlen=50)
+        self.ultimo_erro: Optional[str] = None
+        self.erros = 0
+        self.inicios = 0
+        self.reinicios = 0
+
+        self.thread = threading.Thread(target=self._executar, daemon=True)
+        self.thread.start()
+
+    def rodando(self) -> bool:
+        processo = self.processo
+        return processo is not None and processo.poll() is None
+
+    def iniciar(self, argumentos: Sequence[str]) -> None:
+        """
+        Garante uma instância rodando com estes argumentos; se os argumentos mudaram, reinicia.
+        """
+        argumentos = list(argumentos)
+        with self._cond:
+            if self._ativo and self.rodando() and argumentos == self.argumentos:
+                return
+            self.argumentos = argumentos
+            self._ativo = True
+            self._pedido = True
+            self._backoff = self.backoff_inicial
+            antigo = self.processo
+            self._cond.notify_all()
+        self._encerrar_processo(antigo)
+
+    def parar(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._ativo = False
+            self._pedido = False
+            antigo = self.processo
+            self._cond.notify_all()
+        self._encerrar_processo(antigo, timeout)
+
+    def _executar(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ativo and self._pedido)
+                self._pedido = False
+                try:
+                    processo = self._lancar()
+                except OSError:
+                    logging.exception(f"Não foi possível iniciar o {self.nome}")
+                    processo = None
+
+            inicio = time.monotonic()
+            codigo = processo.wait() if processo else None
+            duracao = time.monotonic() - inicio
+
+            with self._cond:
+                if not self._ativo or self._pedido:
+                    # Encerrado por `parar` ou substituído por um novo `iniciar`
+                    continue
+                if duracao >= self.execucao_estavel:
+                    self._backoff = self.backoff_inicial
+                espera = self._backoff
+                self._backoff = min(self._backoff * 2, self.backoff_maximo)
+                logging.warning(f"{self.nome} terminou (código {codigo}) após {duracao:.1f} s. "
+                                f"Reiniciando em {espera:.1f} s. Última saída: {self.ultimo_erro or '-'}")
+                if self._cond.wait_for(lambda: not self._ativo or self._pedido, timeout=espera):
+                    continue
+                self.reinicios += 1
+                self._pedido = True
+
+    def _lancar(self) -> subprocess.Popen:
+        processo = subprocess.Popen(
+            self.comando + self.argumentos,
+            env=self.env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors='replace',
+            preexec_fn=_morrer_com_o_pai
+        )
+        self.processo = processo
+        self.inicios += 1
+        logging.info(f"{self.nome} iniciado (pid {processo.pid})")
+        threading.Thread(target=self._ler_saida, args=(processo,), daemon=True).start()
+        return processo
+
+    def _ler_saida(self, processo: subprocess.Popen) -> None:
+        for linha in processo.stdout:
+            linha = linha.rstrip()
+            if not linha:
+                continue
+            self.ultimas_linhas.append(linha)
+            if linha.startswith('ERROR'):
+                self.erros += 1
+                self.ultimo_erro = linha
+                logging.warning(f"{self.nome}: {linha}")
+            else:
+                logging.debug(f"{self.nome}: {linha}")
+
+    def _encerrar_processo(self, processo: Optional[subprocess.Popen], timeout: float = 2.0) -> None:
+        if processo is None or processo.poll() is not None:
+            return
+        processo.terminate()
+        try:
+            processo.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+        logging.info(f"{self.nome} encerrado (pid {processo.pid})")
+
+    def estatisticas(self) -> dict:
+        return {
+            'rodando': self.rodando(),
+            'inicios': self.inicios,
+            'reinicios': self.reinicios,
+            'erros': self.erros,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+def criar_fifo(caminho: str) -> str:
+    if os.path.exists(caminho) and not os.path.isfile(caminho):
+        return caminho
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    os.mkfifo(caminho)
+    return caminho
+
+
+class CapturaDireta:
+    """
+    Decodifica no próprio processo (FFmpeg embutido no OpenCV) o vídeo gravado pelo scrcpy em um
+    FIFO (`--record=<fifo> --record-format=mkv`, ou seja, o H.264 do óculos sem recodificação),
+    com a mesma interface do `cv2.VideoCapture` usada pela captura (`isOpened`, `read(image)`,
+    `get`, `set`, `release`). `read(image)` decodifica direto no buffer recebido (o slot do
+    FrameRingBuffer), sem processo nem pipe intermediário.
+
+    Abrir um FIFO bloqueia até alguém escrever nele; por isso a abertura só acontece depois que
+    o scrcpy começa a gravar (até `timeout`). Sem escritor a tempo, a captura fica fechada
+    (`isOpened()` False). O timeout de leitura e o EOF quando o scrcpy termina evitam que `read` trave.
+    """
+
+    def __init__(self, fifo: str, fps: float = 15, timeout: float = 1.0, opcoes: str = SCRCPY_FFMPEG_OPCOES):
+        self.fifo = fifo
+        self.fps = fps
+        self.cap = cv2.VideoCapture()
+        _aguardar_escritor(fifo, timeout, lambda: self._abrir(opcoes, timeout))
+
+    def _abrir(self, opcoes: str, timeout: float) -> None:
+        parametros = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(timeout * 1000),
+                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(timeout * 1000)]
+        # As opções de baixa latência do FFmpeg só valem para esta abertura
+        with _opcoes_lock:
+            anterior = os.environ.get('OPENCV_FFMPEG_CAPTURE_OPTIONS')
+            os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = opcoes
+            try:
+                self.cap.open(self.fifo, cv2.CAP_FFMPEG, parametros)
+            finally:
+                if anterior is None:
+                    del os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS']
+                else:
+                    os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = anterior
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def read(self, image: Optional[np.ndarray] = None):
+        return self.cap.read(image)
+
+    def get(self, propriedade: int) -> float:
+        if propriedade == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self.cap.get(propriedade)
+
+    def set(self, propriedade: int, valor: float) -> bool:
+        return False
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+_opcoes_lock = threading.Lock()
+
+
+def _aguardar_escritor(fifo: str, timeout: float, abrir) -> bool:
+    """
+    Espera dados no FIFO (sem bloquear na abertura) e chama `abrir` com o FIFO ainda aberto aqui,
+    para que a abertura feita pelo FFmpeg encontre o escritor e não bloqueie.
+    """
+    fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        if not select.select([fd], [], [], timeout)[0]:
+            return False
+        abrir()
+        return True
+    finally:
+        os.close(fd)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from captura import FrameRingBuffer
+
+
+def quadro(valor):
+    return np.full((4, 4, 3), valor, dtype=np.uint8)
+
+
+def test_slot_reservado_pelo_leitor_nunca_e_sobrescrito():
+    buffer = FrameRingBuffer(capacidade=3, shape=(4, 4, 3))
+    buffer.escrever(quadro(1))
+    lido = buffer.ler_mais_recente(timeout=0)
+    assert lido.seq == 1
+
+    # O escritor continua publicando enquanto o leitor processa o quadro reservado
+    for valor in range(2, 20):
+        indice = buffer.slot_escrita()
+        assert buffer.buffer(indice) is not lido.frame
+        buffer.escrever(quadro(valor))
+    assert (lido.frame == 1).all()
+
+    proximo = buffer.ler_mais_recente(timeout=0)
+    assert proximo.seq == 19
+    assert (proximo.frame == 19).all()
+
+
+def test_dropped_conta_quadros_publicados_e_nunca_lidos():
+    buffer = FrameRingBuffer(capacidade=3, shape=(4, 4, 3))
+    for valor in range(5):
+        buffer.escrever(quadro(valor))
+    # Só o último dos cinco será lido
+    assert buffer.dropped == 4
+    assert buffer.ler_mais_recente(timeout=0).seq == 5
+
+    buffer.escrever(quadro(5))
+    assert buffer.ler_mais_recente(timeout=0).seq == 6
+    assert buffer.dropped == 4
+    assert buffer.capturados == 6
+    assert buffer.ler_mais_recente(timeout=0) is None
+
+
+def test_leitura_direta_no_slot():
+    buffer = FrameRingBuffer(capacidade=3, shape=(4, 4, 3))
+    indice = buffer.slot_escrita()
+    buffer.buffer(indice)[:] = 7
+    buffer.publicar(indice, buffer.buffer(indice), timestamp=12.5)
+    lido = buffer.ler_mais_recente(timeout=0)
+    assert lido.frame is buffer.buffer(indice)
+    assert lido.timestamp == 12.5
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from consumidor import FilaPedidos, ler_pedido
+
+
+def mensagem(**campos) -> bytes:
+    return json.dumps(campos).encode()
+
+
+def test_pedido_valido():
+    pedido = ler_pedido(mensagem(itemId='CAIXA 1', quantity=3, model='CAIXA', fileName='f.jpg'), (1, 7))
+    assert pedido.item_id == 'caixa 1'
+    assert pedido.quantidade == 3
+    assert pedido.modelo == 'CAIXA'
+    assert pedido.arquivo == 'f.jpg'
+    assert pedido.entrega == (1, 7)
+
+
+@pytest.mark.parametrize('quantidade', [0, -1, True, False, '3', 2.5, None])
+def test_quantidade_invalida(quantidade):
+    with pytest.raises(ValueError):
+        ler_pedido(mensagem(itemId='CAIXA', quantity=quantidade))
+
+
+@pytest.mark.parametrize('body', [b'{', b'\xff', b'[1, 2]', mensagem(quantity=3), mensagem(itemId=5, quantity=3)])
+def test_mensagem_invalida(body):
+    with pytest.raises(ValueError):
+        ler_pedido(body)
+
+
+def test_fila_avisa_confirmacao():
+    confirmados = []
+    fila = FilaPedidos(on_confirmado=confirmados.append)
+    fila.entregar(ler_pedido(mensagem(itemId='CAIXA', quantity=1)))
+    pedido = fila.obter(timeout=1)
+    fila.confirmar(pedido)
+    assert confirmados == [pedido]
+    assert fila.confirmados == 1
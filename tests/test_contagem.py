@@ -0,0 +1,54 @@
+import numpy as np
+
+from contagem import EstimadorContagem, replay
+
+CAIXAS = np.array([[0, 0, 10, 10], [20, 0, 30, 10], [40, 0, 50, 10]], dtype=np.float32)
+VAZIO = np.zeros((0, 4), dtype=np.float32)
+
+
+def contar(estimador: EstimadorContagem, quadros, esperado: int):
+    """
+    Alimenta o estimador quadro a quadro e retorna (decisão, quadro) da primeira decisão, ou (None, None).
+    """
+    for i, xyxy in enumerate(quadros):
+        estimador.adicionar(xyxy)
+        decisao = estimador.decidir(esperado)
+        if decisao is not None:
+            return decisao, i + 1
+    return None, None
+
+
+def test_bandeja_vazia_no_inicio_nao_decide_zero():
+    estimador = EstimadorContagem()
+    decisao, quadro = contar(estimador, [VAZIO] * 12 + [CAIXAS] * 10, esperado=3)
+    assert decisao == 3
+    assert quadro > 12
+
+
+def test_bandeja_incompleta_estavel_nao_decide_antes_do_limite():
+    estimador = EstimadorContagem()
+    assert contar(estimador, [CAIXAS[:2]] * 40, esperado=3) == (None, None)
+
+
+def test_quantidade_esperada_estavel_decide_logo():
+    estimador = EstimadorContagem(min_quadros_esperado=3)
+    assert contar(estimador, [CAIXAS] * 10, esperado=3) == (3, 3)
+
+
+def test_decisao_forcada_usa_a_moda_da_janela():
+    estimador = EstimadorContagem(janela=9)
+    for xyxy in [VAZIO] * 4 + [CAIXAS[:2]] * 9:
+        estimador.adicionar(xyxy)
+    assert estimador.decidir(3) is None
+    assert estimador.forcar_decisao() == 2
+
+
+def test_decisao_forcada_sem_quadros_e_zero():
+    assert EstimadorContagem().forcar_decisao() == 0
+
+
+def test_replay_de_sessao_forca_no_limite():
+    quadros = [{'t': i / 15, 'xyxy': CAIXAS[:2].tolist(), 'conf': [0.9, 0.9]} for i in range(30)]
+    resultado = replay({'quadros': quadros, 'quantity': 3}, EstimadorContagem(), limite_quadros=20)
+    assert resultado['contagem'] == 2
+    assert resultado['quadro'] == 20
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from modelos import RegistroModelos
+
+
+@pytest.fixture
+def pasta_modelos(tmp_path):
+    # estimar_tamanho_modelo usa o tamanho do arquivo quando o modelo não tem parâmetros
+    for nome, tamanho in (('A', 100), ('B', 100), ('C', 100)):
+        (tmp_path / f'{nome}.pt').write_bytes(b'\0' * tamanho)
+    return str(tmp_path)
+
+
+class CarregadorContado:
+    def __init__(self, liberar: threading.Event = None):
+        self.chamadas = []
+        self.liberar = liberar
+        self.lock = threading.Lock()
+
+    def __call__(self, model_path):
+        with self.lock:
+            self.chamadas.append(model_path)
+        if self.liberar is not None:
+            self.liberar.wait(5)
+        return object()
+
+
+def test_lru_descarta_o_menos_usado_pelo_orcamento_de_bytes(pasta_modelos):
+    carregador = CarregadorContado()
+    registro = RegistroModelos(pasta_modelos, orcamento_bytes=250, carregador=carregador)
+
+    a = registro.obter('A')
+    registro.obter('B')
+    # A passa a ser o mais recente; C estoura o orçamento e derruba B
+    assert registro.obter('A') is a
+    registro.obter('C')
+
+    estatisticas = registro.estatisticas()
+    assert estatisticas['modelos'] == ['A', 'C']
+    assert estatisticas['bytes'] == 200
+    assert registro.evictions == 1
+    assert registro.hits == 1
+
+    registro.obter('B')
+    assert registro.estatisticas()['modelos'] == ['C', 'B']
+    assert len(carregador.chamadas) == 4
+
+
+def test_modelo_acima_do_orcamento_continua_no_cache(pasta_modelos):
+    registro = RegistroModelos(pasta_modelos, orcamento_bytes=50, carregador=CarregadorContado())
+    registro.obter('A')
+    assert registro.estatisticas()['modelos'] == ['A']
+
+
+def test_preloads_concorrentes_carregam_uma_vez(pasta_modelos):
+    liberar = threading.Event()
+    carregador = CarregadorContado(liberar)
+    registro = RegistroModelos(pasta_modelos, orcamento_bytes=1000, carregador=carregador, workers=4)
+
+    threads = [threading.Thread(target=registro.preload, args=('A',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registro.estatisticas()['carregando'] == 1
+
+    resultados = []
+    leitores = [threading.Thread(target=lambda: resultados.append(registro.obter('A'))) for _ in range(4)]
+    for leitor in leitores:
+        leitor.start()
+    liberar.set()
+    for leitor in leitores:
+        leitor.join(5)
+
+    assert len(carregador.chamadas) == 1
+    assert len(resultados) == 4 and all(modelo is resultados[0] for modelo in resultados)
+    assert registro.estatisticas()['carregando'] == 0
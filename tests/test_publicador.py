@@ -0,0 +1,95 @@
+import json
+import time
+
+from broker_memoria import BrokerMemoria
+from publicador import PublicadorRabbitMQ
+
+FILA = 'contagem'
+
+
+def aguardar(condicao, timeout: float = 5.0) -> bool:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.01)
+    return condicao()
+
+
+def corpos(broker):
+    return [json.loads(m)['n'] for m in broker.mensagens(FILA)]
+
+
+def criar_publicador(broker, **kwargs):
+    kwargs.setdefault('backoff_inicial', 0.02)
+    kwargs.setdefault('backoff_maximo', 0.2)
+    return PublicadorRabbitMQ('memoria', 'guest', 'guest', connection_factory=broker.conexao, **kwargs)
+
+
+def test_reconecta_com_backoff_ate_o_broker_voltar():
+    broker = BrokerMemoria()
+    broker.disponivel = False
+    tentativas = []
+    conexao = broker.conexao
+
+    def factory(parameters):
+        tentativas.append(time.monotonic())
+        return conexao(parameters)
+
+    publicador = PublicadorRabbitMQ('memoria', 'guest', 'guest', backoff_inicial=0.02, backoff_maximo=0.2,
+                                    connection_factory=factory)
+    try:
+        publicador.publicar(FILA, {'n': 1})
+        assert aguardar(lambda: len(tentativas) >= 5)
+        assert broker.mensagens(FILA) == []
+        intervalos = [b - a for a, b in zip(tentativas, tentativas[1:5])]
+        # Cada espera é pelo menos o dobro da anterior (com folga para o agendador)
+        assert all(depois >= antes * 1.5 for antes, depois in zip(intervalos, intervalos[1:]))
+
+        broker.disponivel = True
+        assert broker.aguardar(FILA, 1)
+        assert corpos(broker) == [1]
+        assert publicador.conexoes == 1
+        assert publicador.reconexoes == 0
+    finally:
+        publicador.parar()
+
+
+def test_publica_depois_de_queda_da_conexao():
+    broker = BrokerMemoria()
+    publicador = criar_publicador(broker)
+    try:
+        publicador.publicar(FILA, {'n': 1})
+        assert broker.aguardar(FILA, 1)
+
+        broker.derrubar()
+        publicador.publicar(FILA, {'n': 2})
+        assert broker.aguardar(FILA, 2)
+        assert corpos(broker) == [1, 2]
+        assert publicador.reconexoes == 1
+        assert publicador.enviadas == 2
+    finally:
+        publicador.parar()
+
+
+def test_fila_cheia_descarta_a_mensagem_mais_antiga():
+    broker = BrokerMemoria()
+    broker.disponivel = False
+    enviadas = []
+    publicador = criar_publicador(broker, tamanho_fila=3, on_enviada=lambda fila, m: enviadas.append(m['n']))
+    try:
+        # A primeira mensagem sai da fila e fica pendente na thread de envio, aguardando o broker
+        publicador.publicar(FILA, {'n': 0})
+        assert aguardar(lambda: publicador.pendentes() == 0)
+
+        for n in range(1, 6):
+            assert publicador.publicar(FILA, {'n': n})
+        assert publicador.pendentes() == 3
+        assert publicador.descartadas == 2
+
+        broker.disponivel = True
+        assert broker.aguardar(FILA, 4)
+        assert corpos(broker) == [0, 3, 4, 5]
+        assert aguardar(lambda: enviadas == [0, 3, 4, 5])
+    finally:
+        publicador.parar()
@@ -0,0 +1,57 @@
+import numpy as np
+
+from deteccoes import Deteccoes
+from rastreio_defeitos import RastreadorDefeitos
+
+NAMES = {0: 'risco', 1: 'amassado'}
+
+
+def deteccoes(*caixas):
+    """
+    Monta as detecções de um quadro a partir de tuplas (x1, y1, x2, y2, classe).
+    """
+    if not caixas:
+        return Deteccoes.vazia(NAMES)
+    dados = np.array(caixas, dtype=np.float32)
+    return Deteccoes(dados[:, :4], np.full(len(caixas), 0.9, dtype=np.float32),
+                     dados[:, 4].astype(np.int64), NAMES)
+
+
+def test_um_alerta_por_defeito_fisico_ao_longo_dos_quadros():
+    encerrados = []
+    rastreador = RastreadorDefeitos(min_quadros=3, max_falhas=2, cooldown_s=0, on_encerrado=encerrados.append)
+
+    alertas = []
+    # O mesmo risco em 30 quadros, com pequenos deslocamentos e uma falha de detecção no meio
+    for i in range(30):
+        caixas = () if i == 10 else ((100 + i, 100, 150 + i, 140, 0),)
+        alertas.extend(rastreador.atualizar(deteccoes(*caixas), momento=i / 15))
+
+    assert len(alertas) == 1
+    assert alertas[0].classe == 'risco' and alertas[0].numero == 1
+
+    # Caixas de um quadro só não viram defeito
+    rastreador.atualizar(deteccoes((400, 400, 450, 450, 1)), momento=2.1)
+    for i in range(3):
+        rastreador.atualizar(deteccoes(), momento=2.2 + i / 15)
+
+    rastreador.encerrar()
+    assert [r.numero for r in encerrados] == [1]
+    assert encerrados[0].quadros == 29
+    assert rastreador.alertas == 1 and rastreador.confirmados == 1
+
+
+def test_defeitos_da_mesma_classe_dentro_do_cooldown_sao_agrupados():
+    rastreador = RastreadorDefeitos(min_quadros=2, max_falhas=1, cooldown_s=5)
+    alertas = []
+    for i in range(3):
+        alertas.extend(rastreador.atualizar(deteccoes((0, 0, 50, 50, 0)), momento=i * 0.1))
+    # Outro risco, em outro lugar, logo depois
+    for i in range(3):
+        alertas.extend(rastreador.atualizar(deteccoes((300, 300, 350, 350, 0)), momento=1 + i * 0.1))
+    # Classe diferente não entra no cooldown do risco
+    for i in range(3):
+        alertas.extend(rastreador.atualizar(deteccoes((300, 300, 350, 350, 1)), momento=2 + i * 0.1))
+
+    assert [(r.classe, r.numero) for r in alertas] == [('risco', 1), ('amassado', 3)]
+    assert rastreador.agrupados == 1
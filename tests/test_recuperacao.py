@@ -0,0 +1,72 @@
+import threading
+import time
+
+from recuperacao import RecuperacaoEscalonada
+
+
+def aguardar(condicao, timeout: float = 5.0) -> bool:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_todas_as_etapas_falham_e_a_recuperacao_e_repetida():
+    chamadas = []
+    concluidas = []
+    etapas = [(nome, lambda timeout, nome=nome: chamadas.append(nome) or False, 0.1)
+              for nome in ('reabrir_v4l2', 'reiniciar_scrcpy', 'reconectar_adb')]
+    recuperacao = RecuperacaoEscalonada(etapas, on_concluida=lambda etapa, total, d: concluidas.append(etapa),
+                                        backoff_inicial=0.02, backoff_maximo=0.05)
+    try:
+        assert recuperacao.recuperar() is None
+        assert aguardar(lambda: recuperacao.execucoes >= 3)
+        assert chamadas[:6] == ['reabrir_v4l2', 'reiniciar_scrcpy', 'reconectar_adb'] * 2
+        assert set(concluidas) == {None}
+    finally:
+        recuperacao.parar()
+
+
+def test_recuperacao_para_de_repetir_depois_do_sucesso():
+    tentativas = []
+
+    def etapa(timeout):
+        tentativas.append(1)
+        return len(tentativas) >= 3
+
+    recuperacao = RecuperacaoEscalonada([('reabrir_v4l2', etapa, 0.1)], backoff_inicial=0.02)
+    recuperacao.recuperar()
+    assert aguardar(lambda: recuperacao.sucessos['reabrir_v4l2'] == 1)
+    time.sleep(0.2)
+    assert len(tentativas) == 3
+    recuperacao.parar()
+
+
+def test_pedido_durante_a_recuperacao_nao_e_perdido():
+    liberar = threading.Event()
+    em_etapa = threading.Event()
+
+    def etapa(timeout):
+        em_etapa.set()
+        liberar.wait(5)
+        return True
+
+    recuperacao = RecuperacaoEscalonada([('reabrir_v4l2', etapa, 0.1)], backoff_inicial=10)
+    primeira = threading.Thread(target=recuperacao.recuperar)
+    primeira.start()
+    assert em_etapa.wait(5)
+    assert recuperacao.recuperar() is None  # Fica para depois da recuperação em andamento
+    liberar.set()
+    primeira.join(5)
+    assert aguardar(lambda: recuperacao.execucoes == 2)
+    recuperacao.parar()
+
+
+def test_parar_cancela_a_tentativa_agendada():
+    recuperacao = RecuperacaoEscalonada([('reabrir_v4l2', lambda timeout: False, 0.1)], backoff_inicial=0.1)
+    recuperacao.recuperar()
+    recuperacao.parar()
+    time.sleep(0.3)
+    assert recuperacao.execucoes == 1
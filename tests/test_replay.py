@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+# core_back importa o ultralytics (backends.py), mesmo com o backend substituído abaixo
+pytest.importorskip('ultralytics')
+
+from replay import conferir, executar_replay  # noqa: E402  (replay deixa a prévia em headless)
+from modelos import RegistroModelos  # noqa: E402
+
+
+class _Caixas:
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class _Resultado:
+    def __init__(self, data: np.ndarray):
+        self.boxes = _Caixas(data)
+
+
+class _Modelo:
+    names = {0: 'caixa'}
+
+
+class BackendTresCaixas:
+    """
+    Backend de inferência determinístico: três caixas da classe 'caixa' em todo quadro.
+    """
+    nome = 'teste'
+    device = None
+
+    def carregar(self, model_path: str) -> _Modelo:
+        return _Modelo()
+
+    carregar_aquecido = carregar
+
+    def predict(self, model, source, **kwargs):
+        data = np.array([[10, 10, 60, 60, 0.9, 0], [100, 10, 150, 60, 0.9, 0], [200, 10, 250, 60, 0.9, 0]],
+                        dtype=np.float32)
+        quadros = source if isinstance(source, list) else [source]
+        return [_Resultado(data) for _ in quadros]
+
+
+@pytest.fixture
+def gravacao(tmp_path):
+    caminho = str(tmp_path / 'gravacao.avi')
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'MJPG'), 15, (320, 240))
+    for i in range(40):
+        escritor.write(np.full((240, 320, 3), 60 + i, dtype=np.uint8))
+    escritor.release()
+    return caminho
+
+
+def test_replay_responde_pelo_broker_em_memoria(tmp_path, gravacao, monkeypatch):
+    # Logs e evidências do YOLOProcessor ficam na pasta temporária
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'CAIXA.pt').write_bytes(b'')
+    backend = BackendTresCaixas()
+    modelos = RegistroModelos(str(tmp_path), 64 * 1024 * 1024, backend.carregar_aquecido)
+    roteiro = [
+        {'t': 0.0, 'mensagem': {'itemId': 'CAIXA', 'quantity': 3, 'model': 'CAIXA'}, 'esperado': 3},
+        {'t': 0.0, 'mensagem': {'itemId': 'CAIXA', 'quantity': 3}, 'esperado': 3},
+    ]
+    relatorio = executar_replay(gravacao, roteiro, ritmo='sincronizado', timeout=60, ocioso=2,
+                                backend=backend, modelos=modelos)
+
+    mensagens = relatorio['mensagens']
+    assert mensagens['corretos'] == 2, json.dumps(mensagens)
+    assert mensagens['extras'] == 0
+    assert relatorio['quadros_processados'] > 0
+
+
+def test_conferir_aponta_resposta_errada():
+    roteiro = [{'mensagem': {'itemId': 'caixa'}, 'esperado': 3}]
+    resultado = conferir(roteiro, [{'itemId': 'CAIXA', 'count': 2}])
+    assert resultado['corretos'] == 0
+    assert resultado['detalhes'][0]['recebido'] == 2
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from recuperacao import aguardar_primeiro_quadro
+from supervisor_scrcpy import CapturaDireta, SupervisorScrcpy, criar_fifo
+
+FAKE_SCRCPY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fake_scrcpy.py')
+
+
+def criar_clipe(caminho, quadros=30, tamanho=(320, 240)):
+    writer = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'mp4v'), 15, tamanho)
+    for i in range(quadros):
+        frame = np.full((tamanho[1], tamanho[0], 3), i * 8 % 256, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+
+
+def esperar(condicao, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_supervisor_com_fake_scrcpy_entrega_quadros_e_detecta_queda(tmp_path):
+    clipe = str(tmp_path / 'clipe.mp4')
+    criar_clipe(clipe)
+    fifo = criar_fifo(str(tmp_path / 'scrcpy.mkv'))
+    supervisor = SupervisorScrcpy('fake', comando=f'{sys.executable} {FAKE_SCRCPY} --video {clipe} --falhar-apos 2',
+                                  backoff_inicial=0.1, execucao_estavel=100)
+    supervisor.iniciar([f'--record={fifo}', '--record-format=mkv', '--camera-size=320x240'])
+    cap = None
+    try:
+        cap = aguardar_primeiro_quadro(fifo, 10, abrir=lambda: CapturaDireta(fifo))
+        assert cap is not None
+
+        # Decodifica direto no buffer recebido, como no slot do FrameRingBuffer
+        slot = np.empty((240, 320, 3), dtype=np.uint8)
+        ok, frame = cap.read(slot)
+        assert ok and frame.shape == (240, 320, 3)
+        assert np.shares_memory(frame, slot)
+
+        assert esperar(lambda: supervisor.reinicios >= 1)
+        assert supervisor.erros >= 1
+        assert 'falha simulada' in supervisor.ultimo_erro
+        assert any('Device: [fake]' in linha for linha in supervisor.ultimas_linhas)
+    finally:
+        supervisor.parar()
+        if cap is not None:
+            cap.release()
+
+
+def test_captura_direta_sem_escritor_fica_fechada(tmp_path):
+    fifo = criar_fifo(str(tmp_path / 'scrcpy.mkv'))
+    cap = CapturaDireta(fifo, timeout=0.2)
+    assert not cap.isOpened()
+    assert cap.get(cv2.CAP_PROP_FPS) == 15